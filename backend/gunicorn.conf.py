@@ -0,0 +1,8 @@
+# Picked up automatically by gunicorn when started from this directory.
+
+
+def post_worker_init(worker):
+    # load the autocomplete index from its Redis snapshot before taking traffic
+    from travel.autocomplete import warm
+
+    warm()
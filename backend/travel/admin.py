@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.utils.html import format_html
 import nested_admin
 
+from .documents import schedule_document_rebuild
+
 from .models import (
     Destination, Category, Itinerary, DayPlan, BudgetBreakdown,
     BudgetCategory, BudgetItem, Tag, Attraction, Restaurant, Experience,
@@ -90,6 +92,11 @@ class ItineraryAdmin(nested_admin.NestedModelAdmin):
     # filter_horizontal = ("categories", "tags")
     inlines = [DayPlanInline, BudgetBreakdownInline]
 
+    def save_related(self, request, form, formsets, change):
+        # nested day/attraction/restaurant inlines are saved here, after the itinerary itself
+        super().save_related(request, form, formsets, change)
+        schedule_document_rebuild(form.instance.id)
+
 
 
 # --- CUSTOM LIST FILTERS ---
@@ -0,0 +1,112 @@
+"""
+Async (ASGI) fast path for cache-first read endpoints.
+
+Under uvicorn a cache hit is one awaited Redis GET on the event loop, so a worker
+holds thousands of in-flight hits instead of one per thread. Anything that needs
+more than the cached bytes (a miss, a stale SWR entry to refresh, an authenticated
+user, a bad cursor...) is handed to the regular sync DRF view, so behaviour stays
+identical. Enabled by ASYNC_READ_VIEWS (see urls.py); only worth it when serving
+travelplanner.asgi.
+"""
+import asyncio
+import time
+import weakref
+
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework_orjson.renderers import ORJSONRenderer
+
+from . import autocomplete, views
+from .cache_serializer import CompressedRedisSerializer
+from .cache_utils import SWR_STATS_KEY, count_swr
+from .conditional import apply_validators, not_modified
+from .rendered import rendered_response
+
+_renderer = ORJSONRenderer()
+_serializer = CompressedRedisSerializer()
+_clients = weakref.WeakKeyDictionary()  # event loop -> client (connections are loop-bound)
+
+
+def _client():
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        _clients[loop] = aioredis.Redis.from_url(settings.REDIS_URL)
+    return _clients[loop]
+
+
+async def _cache_get(key):
+    # same bytes django.core.cache wrote: versioned key + our serializer
+    try:
+        raw = await _client().get(cache.make_key(key))
+    except redis.RedisError:
+        return None
+    return None if raw is None else _serializer.loads(raw)
+
+
+async def _fresh_swr_entry(name, key):
+    entry = await _cache_get(key)
+    if entry is None or "etag" not in entry or entry["soft_expires"] <= time.time():
+        return None  # miss / stale -> the sync view computes or schedules the refresh
+    pending = count_swr(name, "hit")  # counted in process; written once per flush interval
+    if pending:
+        try:
+            pipe = _client().pipeline(transaction=False)
+            for field, count in pending.items():
+                pipe.hincrby(SWR_STATS_KEY, field, count)
+            await pipe.execute()
+        except redis.RedisError:
+            pass
+    return entry
+
+
+def _json(value):
+    return HttpResponse(_renderer.render(value), content_type="application/json")
+
+
+# the DRF views, run in the sync thread as usual
+_destination_list = sync_to_async(views.destination_list_api)
+_recommended_destinations = sync_to_async(views.recommended_destinations_api)
+_search_suggestions = sync_to_async(views.search_suggestions)
+
+
+@csrf_exempt  # like the DRF views it stands in for
+async def destination_list_api(request):
+    if request.method != "GET":
+        return await _destination_list(request)
+    entry = await _fresh_swr_entry("destination_list", f"destinations:{request.get_full_path()}")
+    if entry is None:
+        return await _destination_list(request)
+    if not_modified(request, entry["etag"], entry["last_modified"]):
+        response = HttpResponseNotModified()
+    else:
+        response = _json(entry["value"])
+    return apply_validators(response, "destination_list", entry["etag"], entry["last_modified"])
+
+
+@csrf_exempt
+async def search_suggestions(request):
+    query = request.GET.get("q", "").strip().lower()
+    # pure in-memory lookup once the autocomplete index is loaded; loading it is sync work
+    if request.method != "GET" or not query or not autocomplete.is_loaded():
+        return await _search_suggestions(request)
+    return _json(views.format_suggestions(autocomplete.suggest(query, views.SUGGESTION_LIMIT)))
+
+
+@csrf_exempt
+async def recommended_destinations_api(request):
+    # authenticated users need JWT auth + per-user data: leave that to DRF
+    if request.method != "GET" or "Authorization" in request.headers:
+        return await _recommended_destinations(request)
+    try:
+        limit = min(max(int(request.GET.get("limit", 5)), 1), 20)
+    except ValueError:
+        limit = 5
+    blob = await _cache_get(f"recommendations:global:destinations:rendered:{limit}")
+    if blob is None:
+        return await _recommended_destinations(request)
+    return rendered_response(request, blob)
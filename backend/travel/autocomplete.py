@@ -0,0 +1,253 @@
+"""
+In-memory, typo-tolerant prefix autocomplete for search suggestions.
+
+Built from the search index (SearchDocument) ordered by popularity prior, so an
+entry's position doubles as its popularity rank. Each worker holds:
+
+* a sorted array of word-start suffixes of every normalized title ("baga beach
+  shack" -> "baga beach shack", "beach shack", "shack") searched with bisect, so
+  "bea" and "baga bea" are both plain prefix lookups, plus one of whole titles for
+  the title-start tier. A prefix maps to one contiguous slice of each, so every
+  match is ranked, however common the prefix;
+* the top entries per 1-2 character prefix, since those ranges are huge;
+* a deletion index (edit distance 1, SymSpell style) over word prefixes, used
+  when the typed prefix has a typo ("bech" -> "beac").
+
+The structure is rebuilt from a compact zlib'd snapshot in Redis, so worker
+start (gunicorn post_worker_init -> `warm`) doesn't touch Postgres. Writes
+reindex the search rows, then `schedule_refresh` rebuilds the snapshot once per
+burst and drops every worker's copy through the L1 invalidation channel.
+"""
+import unicodedata
+import zlib
+from bisect import bisect_left
+
+import orjson
+import redis
+from django.conf import settings
+
+from . import local_cache
+from .cache_utils import get_redis
+from .models import SearchDocument
+
+SNAPSHOT_KEY = "autocomplete:snapshot"
+SCHEDULED_KEY = "autocomplete:refresh:scheduled"
+ENTITY_TYPES = [choice.value for choice in SearchDocument.EntityTypes]
+FUZZY_PREFIX_LENGTHS = (4, 7)
+SHORT_PREFIX_TOP = 20
+RANGE_END = chr(0x10FFFF)  # sorts after anything a normalized key can continue with
+
+_index_cache = local_cache.local_cache("autocomplete", maxsize=1, ttl=settings.AUTOCOMPLETE_TTL)
+
+
+def normalize(text):
+    # lowercase, accents stripped, anything non-alphanumeric becomes a single space
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch if ch.isalnum() else " " for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.split())
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a, b):
+    # Damerau-Levenshtein distance <= 1
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    for i in range(len(b)):
+        if b[:i] + b[i + 1:] == a:
+            return True
+    return False
+
+
+class AutocompleteIndex:
+    def __init__(self, entries):
+        # entries: [(entity_type, id, slug, title, image)], most popular first
+        self.entries = entries
+        self.titles = [normalize(entry[3]) for entry in entries]
+        pairs = []
+        vocabulary = set()
+        short = {}  # (entity_type, 1-2 chars) -> most popular entries with a word starting so
+        for idx, title in enumerate(self.titles):
+            words = title.split()
+            for start in range(len(words)):
+                pairs.append((" ".join(words[start:]), idx))
+            for word in words:
+                vocabulary.add(word)
+                for n in (1, 2):
+                    if len(word) >= n:
+                        bucket = short.setdefault((entries[idx][0], word[:n]), [])
+                        if len(bucket) < SHORT_PREFIX_TOP and (not bucket or bucket[-1] != idx):
+                            bucket.append(idx)
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.refs = [idx for _, idx in pairs]
+        by_title = sorted((title, idx) for idx, title in enumerate(self.titles))
+        self.title_keys = [title for title, _ in by_title]
+        self.title_refs = [idx for _, idx in by_title]
+        self.short = short
+
+        # deletes of each n-char word prefix -> that prefix plus one char, so a typo that
+        # inserts or drops a letter ("mnali" / "manaali") still lines up with the word
+        self.fuzzy = {}
+        for word in vocabulary:
+            for n in FUZZY_PREFIX_LENGTHS:
+                prefix = word[:n]
+                for variant in _deletes(prefix) | {prefix}:
+                    self.fuzzy.setdefault(variant, set()).add(word[:n + 1])
+                if len(word) <= n:
+                    break
+
+    @staticmethod
+    def _range(keys, refs, term):
+        # every key starting with `term` is in [term, term + RANGE_END)
+        return refs[bisect_left(keys, term):bisect_left(keys, term + RANGE_END)]
+
+    def _prefix(self, term):
+        return set(self._range(self.keys, self.refs, term))
+
+    def _corrections(self, token):
+        """
+        Word prefixes within one edit of the token's first n chars (n from
+        FUZZY_PREFIX_LENGTHS), the exact one included. Returns (n, prefixes).
+        """
+        candidates = [n for n in FUZZY_PREFIX_LENGTHS if n <= len(token)]
+        if not candidates:
+            return 0, set()  # too short to guess at
+        n = candidates[-1]
+        head = token[:n]
+        options = set()
+        for variant in _deletes(head) | {head}:
+            options |= self.fuzzy.get(variant, set())
+
+        corrections = set()
+        for longer in options:
+            # the typed n chars correspond to n-1, n or n+1 chars of the real word
+            for k in (n, n + 1, n - 1):
+                prefix = longer[:k]
+                if _within_one_edit(head, prefix):
+                    corrections.add(prefix)
+                    break
+        return n, corrections
+
+    def _fuzzy(self, term):
+        head, _, last = term.rpartition(" ")
+        n, prefixes = self._corrections(last)
+        found = set()
+        for prefix in prefixes:
+            # corrected start + what was typed after it; the tail may hold the typo
+            # too, so fall back to the corrected start alone
+            for candidate in (prefix + last[n:], prefix):
+                if candidate == last:
+                    continue
+                hits = self._prefix(f"{head} {candidate}" if head else candidate)
+                if hits:
+                    found |= hits
+                    break
+        return found
+
+    def search(self, query, limit):
+        """
+        Top `limit` per entity type: title-start matches first, then any word,
+        then typo corrections; popularity breaks ties within each tier.
+        """
+        term = normalize(query)
+        if not term:
+            return {entity_type: [] for entity_type in ENTITY_TYPES}
+
+        if len(term) <= 2 and " " not in term:
+            matched = [idx for entity_type in ENTITY_TYPES for idx in self.short.get((entity_type, term), [])]
+            ranked = sorted(matched, key=lambda idx: (not self.titles[idx].startswith(term), idx))
+        else:
+            starts = set(self._range(self.title_keys, self.title_refs, term))
+            matches = self._prefix(term)
+            ranked = sorted(starts) + sorted(matches - starts)
+            if len(matches) < limit:
+                ranked += sorted(self._fuzzy(term) - matches)
+
+        grouped = {entity_type: [] for entity_type in ENTITY_TYPES}
+        open_groups = len(grouped)
+        for idx in ranked:
+            entity_type, entity_id, slug, title, image = self.entries[idx]
+            group = grouped[entity_type]
+            if len(group) < limit:
+                group.append((entity_id, slug, title, image))
+                if len(group) == limit:
+                    open_groups -= 1
+                    if not open_groups:
+                        break
+        return grouped
+
+
+# ---- snapshot ----
+def build_snapshot():
+    """Read the search index, store the compressed snapshot in Redis and return it."""
+    entries = list(
+        SearchDocument.objects.order_by("-popularity", "entity_type", "entity_id")
+        .values_list("entity_type", "entity_id", "slug", "title", "image")
+    )
+    blob = zlib.compress(orjson.dumps(entries), 6)
+    try:
+        get_redis().set(SNAPSHOT_KEY, blob)
+    except redis.RedisError:
+        pass
+    return entries
+
+
+def _load():
+    try:
+        blob = get_redis().get(SNAPSHOT_KEY)
+    except redis.RedisError:
+        blob = None
+    entries = orjson.loads(zlib.decompress(blob)) if blob else build_snapshot()
+    return AutocompleteIndex([tuple(entry) for entry in entries])
+
+
+def get_index():
+    return _index_cache.get("index", _load)
+
+
+def suggest(query, limit):
+    return get_index().search(query, limit)
+
+
+def is_loaded():
+    # async views only use the index when it is already in memory
+    return _index_cache.peek("index") is not None
+
+
+def warm():
+    try:
+        get_index()
+    except Exception:
+        pass  # first request loads it instead
+
+
+def refresh():
+    get_redis().delete(SCHEDULED_KEY)  # writes from here on open a new window
+    build_snapshot()
+    local_cache.invalidate("autocomplete")
+
+
+def schedule_refresh():
+    """Rebuild the snapshot once per AUTOCOMPLETE_REFRESH_DELAY window of writes."""
+    from .tasks import refresh_autocomplete  # tasks -> views -> ... imports this module
+
+    delay = settings.AUTOCOMPLETE_REFRESH_DELAY
+    try:
+        if not get_redis().set(SCHEDULED_KEY, 1, nx=True, ex=delay * 2):
+            return
+        refresh_autocomplete.apply_async(countdown=delay)
+    except Exception:
+        pass  # the L1 TTL still bounds staleness
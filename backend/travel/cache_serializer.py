@@ -0,0 +1,81 @@
+"""
+Compressing serializer for the Django Redis cache (CACHES OPTIONS "serializer").
+
+Values are pickled as usual; pickles of at least CACHE_COMPRESS_MIN_BYTES are
+compressed with lz4 when it is installed, zlib otherwise, and kept only if that
+saves at least 10%. A short header marks the codec, so plain pickles written
+before this was enabled still load. Original vs stored bytes are counted per
+codec in this process (`codec_stats`, shown by /api/cache/stats/).
+"""
+import pickle
+import threading
+import zlib
+
+from django.conf import settings
+from django.core.cache.backends.redis import RedisSerializer
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # optional; zlib is always there
+    lz4_frame = None
+
+ZLIB_HEADER = b"Z1:"
+LZ4_HEADER = b"L1:"
+MIN_GAIN = 0.9  # compressed must be <= 90% of the pickle to be worth the CPU
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(codec, original, stored):
+    with _stats_lock:
+        row = _stats.setdefault(codec, {"values": 0, "original_bytes": 0, "stored_bytes": 0})
+        row["values"] += 1
+        row["original_bytes"] += original
+        row["stored_bytes"] += stored
+
+
+def codec_stats():
+    with _stats_lock:
+        return {
+            codec: {**row, "ratio": round(row["stored_bytes"] / row["original_bytes"], 4)}
+            for codec, row in _stats.items()
+            if row["original_bytes"]
+        }
+
+
+class CompressedRedisSerializer(RedisSerializer):
+    def __init__(self, protocol=None):
+        super().__init__(protocol)
+        self.min_bytes = settings.CACHE_COMPRESS_MIN_BYTES
+
+    def dumps(self, obj):
+        if type(obj) is int:
+            return obj  # keep incr()/decr() working
+        codec, original, packed = self.encode(obj)
+        _record(codec, original, len(packed))
+        return packed
+
+    def encode(self, obj):
+        """(codec, pickled size, bytes to store) without touching the stats."""
+        data = pickle.dumps(obj, self.protocol)
+        if self.min_bytes is None or len(data) < self.min_bytes:
+            return "none", len(data), data
+
+        if lz4_frame is not None:
+            codec, packed = "lz4", LZ4_HEADER + lz4_frame.compress(data)
+        else:
+            codec, packed = "zlib", ZLIB_HEADER + zlib.compress(data, 6)
+        if len(packed) > len(data) * MIN_GAIN:
+            # already-compressed payloads (gzipped rendered bodies etc.)
+            return "skipped", len(data), data
+        return codec, len(data), packed
+
+    def loads(self, data):
+        if data.startswith(ZLIB_HEADER):
+            return pickle.loads(zlib.decompress(data[len(ZLIB_HEADER):]))
+        if data.startswith(LZ4_HEADER):
+            if lz4_frame is None:
+                raise RuntimeError("cache value is lz4-compressed but lz4 is not installed")
+            return pickle.loads(lz4_frame.decompress(data[len(LZ4_HEADER):]))
+        return super().loads(data)
@@ -1,14 +1,294 @@
+import math
+import threading
+import time
+
+import redis
+from django.conf import settings
 from django.core.cache import cache
+from django.db import connection
+
+_redis_client = None
+
+
+def get_redis():
+    # Raw client for the bits the Django cache API can't express (lists, sets, locks).
+    # redis-py resets its pool after fork, so one module-level client is safe under gunicorn.
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+
+TAG_PREFIX = "cachetag:"
+TAG_REGISTRY = "cachetags"  # every tag ever used, so maintenance never has to SCAN the keyspace
+
+
+def _tag_key(tag):
+    return f"{TAG_PREFIX}{tag}"
+
+
+TAG_TTL_MARGIN = 300  # a tag set outlives its longest-lived entry by this much
+
+# SADD the key under every tag, stretch each tag set's TTL to cover the entry
+# (never shortening it; a never-expiring entry makes the set persistent), then SET
+# the entry: one atomic step, so an invalidate_tags MULTI either sees the key in
+# the set or runs before the entry exists.
+# KEYS: cache key, tag registry, tag sets...  ARGV: payload, entry ttl, tag ttl (-1 = none), key, tags...
+_SET_TAGGED_LUA = """
+local entry_ttl = tonumber(ARGV[2])
+local tag_ttl = tonumber(ARGV[3])
+for i = 3, #KEYS do
+    local existed = redis.call('EXISTS', KEYS[i])
+    redis.call('SADD', KEYS[i], ARGV[4])
+    if tag_ttl < 0 then
+        redis.call('PERSIST', KEYS[i])
+    else
+        local current = redis.call('TTL', KEYS[i])
+        if existed == 0 or (current >= 0 and current < tag_ttl) then
+            redis.call('EXPIRE', KEYS[i], tag_ttl)
+        end
+    end
+end
+redis.call('SADD', KEYS[2], unpack(ARGV, 5))
+if entry_ttl < 0 then
+    redis.call('SET', KEYS[1], ARGV[1])
+else
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', entry_ttl)
+end
+return 1
+"""
+_set_tagged = None
+
+
+def cache_set(key, value, timeout, tags=()):
+    """
+    cache.set plus registering `key` under each invalidation tag (a Redis set per tag),
+    so invalidate_tags can delete exactly the affected entries. Tag sets expire
+    TAG_TTL_MARGIN after the longest-lived entry in them.
+    """
+    global _set_tagged
+    tags = sorted(set(tags))
+    serializer = getattr(getattr(cache, "_cache", None), "_serializer", None)
+    if not tags or serializer is None:  # untagged, or not the Redis backend
+        cache.set(key, value, timeout=timeout)
+        return
+
+    backend_timeout = cache.get_backend_timeout(timeout)
+    if backend_timeout == 0:
+        cache.delete(key)
+        return
+    entry_ttl = None if backend_timeout is None else max(1, math.ceil(backend_timeout))
+    if _set_tagged is None:
+        _set_tagged = get_redis().register_script(_SET_TAGGED_LUA)
+    _set_tagged(
+        keys=[cache.make_key(key), TAG_REGISTRY, *(_tag_key(tag) for tag in tags)],
+        args=[
+            serializer.dumps(value),
+            -1 if backend_timeout is None else entry_ttl,
+            -1 if backend_timeout is None else entry_ttl + TAG_TTL_MARGIN,
+            key,
+            *tags,
+        ],
+    )
 
-def clear_destination_cache():
-    # Clear all cached destination list responses
-    # We prefix all keys with "destinations:" so we can nuke them safely
-    keys = cache.keys("destinations:*") if hasattr(cache, "keys") else []
+
+def invalidate_tags(*tags):
+    """
+    Delete every entry registered under any of `tags`. Cost is the number of
+    entries under those tags. Returns the deleted keys (so callers can re-warm them).
+    """
+    tags = set(tags)
+    if not tags:
+        return []
+    # SMEMBERS + DEL in one MULTI so a concurrent cache_set lands in a fresh set
+    pipe = get_redis().pipeline(transaction=True)
+    for tag in tags:
+        pipe.smembers(_tag_key(tag))
+        pipe.delete(_tag_key(tag))
+    results = pipe.execute()
+
+    keys = set()
+    for members in results[::2]:
+        keys.update(m.decode() if isinstance(m, bytes) else m for m in members)
+    keys = sorted(keys)
     if keys:
         cache.delete_many(keys)
-        
-        
+    return keys
+
+
+def prune_tags(batch=500):
+    """
+    Drop expired keys from the tag sets (entries that timed out on their own).
+    Walks only the registered tags, never the whole keyspace.
+    """
+    client = get_redis()
+    removed = 0
+    for raw_tag in client.sscan_iter(TAG_REGISTRY, count=batch):
+        tag = raw_tag.decode() if isinstance(raw_tag, bytes) else raw_tag
+        tag_key = _tag_key(tag)
+        members = [m.decode() if isinstance(m, bytes) else m for m in client.smembers(tag_key)]
+        if not members:
+            client.srem(TAG_REGISTRY, tag)
+            continue
+        for start in range(0, len(members), batch):
+            chunk = members[start:start + batch]
+            # EXISTS on the backend key (same Redis as the cache) instead of fetching payloads
+            pipe = client.pipeline(transaction=False)
+            for key in chunk:
+                pipe.exists(cache.make_key(key))
+            dead = [key for key, exists in zip(chunk, pipe.execute()) if not exists]
+            if dead:
+                removed += client.srem(tag_key, *dead)
+    return removed
+
+
+def clear_destination_cache(destination_id=None):
+    # Model writes go through invalidation.py; this is the manual "drop it now" hammer
+    if destination_id is None:
+        invalidate_tags("destinations")
+    else:
+        invalidate_tags(f"destination:{destination_id}")
+
+
 def clear_recommendations_cache():
-    keys = cache.keys("recommendations:*") if hasattr(cache, "keys") else []
-    if keys:
-        cache.delete_many(keys)
\ No newline at end of file
+    invalidate_tags("recommendations")
+
+
+def clear_user_recommendations(user_ids):
+    # One MULTI for every user touched by a write/batch instead of two deletes per row
+    invalidate_tags(*(f"user:{user_id}" for user_id in set(user_ids)))
+
+
+# ---- stale-while-revalidate ----
+SWR_STATS_KEY = "cache:swr:stats"
+SWR_LOCK_TTL = 30  # seconds a refresher may hold the lock
+
+
+SWR_STATS_FLUSH_INTERVAL = 10  # seconds between adding this process's counts to the shared hash
+
+# outcomes are counted in process and written in one pipeline per interval, so a hit
+# costs no Redis round trip beyond the GET
+_swr_pending = {}
+_swr_pending_lock = threading.Lock()
+_swr_flushed_at = 0.0
+
+
+def count_swr(name, outcome):
+    """
+    Count one outcome locally. Once per SWR_STATS_FLUSH_INTERVAL this hands back
+    the accumulated {field: n} for the caller to write (sync or async client).
+    """
+    global _swr_flushed_at
+    now = time.monotonic()
+    with _swr_pending_lock:
+        field = f"{name}:{outcome}"
+        _swr_pending[field] = _swr_pending.get(field, 0) + 1
+        if now - _swr_flushed_at < SWR_STATS_FLUSH_INTERVAL:
+            return None
+        _swr_flushed_at = now
+        return _take_swr_counts()
+
+
+def _take_swr_counts():
+    pending = dict(_swr_pending)
+    _swr_pending.clear()
+    return pending
+
+
+def _flush_swr_counts(pending):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for field, count in pending.items():
+            pipe.hincrby(SWR_STATS_KEY, field, count)
+        pipe.execute()
+    except redis.RedisError:
+        pass  # stats are best effort
+
+
+def _swr_count(name, outcome):
+    pending = count_swr(name, outcome)
+    if pending:
+        _flush_swr_counts(pending)
+
+
+def _swr_store(key, value, tags, soft_ttl, hard_ttl, previous=None):
+    from .conditional import make_entry  # conditional imports this module
+
+    entry = make_entry(value, previous)
+    entry["soft_expires"] = time.time() + soft_ttl
+    if tags is not None:
+        cache_set(key, entry, timeout=hard_ttl, tags=tags)
+    return entry
+
+
+def _swr_refresh(name, key, compute, soft_ttl, hard_ttl, lock_key, previous):
+    try:
+        value, tags = compute()
+        _swr_store(key, value, tags, soft_ttl, hard_ttl, previous)
+        _swr_count(name, "refresh")
+    except Exception:
+        _swr_count(name, "refresh_error")
+    finally:
+        get_redis().delete(lock_key)
+        connection.close()  # this thread's own DB connection
+
+
+def _merge_tags(tags, computed_tags):
+    return None if computed_tags is None else set(tags) | set(computed_tags)
+
+
+def swr_get_entry(name, key, compute, soft_ttl, hard_ttl, tags=()):
+    """
+    Stale-while-revalidate read. `compute()` returns (value, tags); tags None
+    means serve the value but don't cache it (e.g. partial results).
+    Fresh entry -> served. Past soft_ttl -> the stale value is served while one
+    process (Redis NX lock) recomputes it on a background thread. Missing (past
+    hard_ttl or invalidated) -> computed inline.
+    Returns the envelope: {"value", "etag", "last_modified", "soft_expires"}.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        _swr_count(name, "miss")
+        value, computed_tags = compute()
+        return _swr_store(key, value, _merge_tags(tags, computed_tags), soft_ttl, hard_ttl)
+
+    if entry["soft_expires"] > time.time():
+        _swr_count(name, "hit")
+        return entry
+
+    _swr_count(name, "stale")
+    lock_key = f"swr:lock:{key}"
+    try:
+        acquired = get_redis().set(lock_key, 1, nx=True, ex=SWR_LOCK_TTL)
+    except redis.RedisError:
+        acquired = False
+    if acquired:
+        def refresh():
+            value, computed_tags = compute()
+            return value, _merge_tags(tags, computed_tags)
+
+        threading.Thread(
+            target=_swr_refresh, args=(name, key, refresh, soft_ttl, hard_ttl, lock_key, entry), daemon=True
+        ).start()
+    return entry
+
+
+def swr_get(name, key, compute, soft_ttl, hard_ttl, tags=()):
+    return swr_get_entry(name, key, compute, soft_ttl, hard_ttl, tags)["value"]
+
+
+def swr_stats():
+    # {"destination_list": {"hit": n, "stale": n, "miss": n, ...}, ...}
+    with _swr_pending_lock:
+        pending = _take_swr_counts()
+    if pending:
+        _flush_swr_counts(pending)  # this process's counts since the last flush
+    stats = {}
+    for field, count in get_redis().hgetall(SWR_STATS_KEY).items():
+        field = field.decode() if isinstance(field, bytes) else field
+        name, _, outcome = field.rpartition(":")
+        stats.setdefault(name, {})[outcome] = int(count)
+    for counts in stats.values():
+        served = counts.get("hit", 0) + counts.get("stale", 0) + counts.get("miss", 0)
+        counts["hit_ratio"] = round((counts.get("hit", 0) + counts.get("stale", 0)) / served, 4) if served else None
+    return stats
@@ -0,0 +1,128 @@
+"""
+Conditional GET support (ETag / Last-Modified / 304) for the read APIs.
+
+Validators are computed once, when a payload is cached (`make_entry`) or from a
+version counter, and stored next to it. A request whose If-None-Match (or
+If-Modified-Since) still matches is answered with 304 straight from that metadata,
+without touching Postgres or re-serializing the body. Cache-Control per endpoint
+comes from settings.API_CACHE_CONTROL.
+"""
+import hashlib
+import time
+
+import orjson
+import redis
+from django.conf import settings
+from django.http import HttpResponseBase
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache_utils import get_redis
+
+
+def payload_etag(value):
+    # strong validator: same bytes the renderer would produce -> same tag
+    body = orjson.dumps(value, default=str, option=orjson.OPT_SORT_KEYS)
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def make_entry(value, previous=None):
+    """
+    Cache envelope {"value", "etag", "last_modified"}. Last-Modified only moves
+    when the content actually changed, so a refresh that yields identical data
+    keeps clients' validators valid.
+    """
+    etag = payload_etag(value)
+    if previous and previous.get("etag") == etag:
+        last_modified = previous["last_modified"]
+    else:
+        last_modified = int(time.time())
+    return {"value": value, "etag": etag, "last_modified": last_modified}
+
+
+def _opaque(tag):
+    # weak comparison (RFC 9110 8.8.3.2): nginx turns our ETags into W/"..." when it gzips
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(request, etag, last_modified=None):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+        if if_none_match.strip() == "*":
+            return True
+        return _opaque(etag) in [_opaque(t) for t in if_none_match.split(",")]
+    if last_modified is not None:
+        since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+        return since is not None and int(last_modified) <= since
+    return False
+
+
+def conditional_response(request, endpoint, value=None, etag=None, last_modified=None, loader=None):
+    """
+    304 if the client's validators match, else 200 with `value` (or `loader()`,
+    which is only called when the body is actually needed). A loader may also
+    return a ready HttpResponse, e.g. pre-rendered bytes (rendered.py).
+    """
+    if not_modified(request, etag, last_modified):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        body = loader() if loader is not None else value
+        response = body if isinstance(body, HttpResponseBase) else Response(body)
+        if response.status_code >= 300:
+            return response  # errors (e.g. a 404 from the loader) get no validators / Cache-Control
+    return apply_validators(response, endpoint, etag, last_modified)
+
+
+def apply_validators(response, endpoint, etag, last_modified=None):
+    # ETag / Last-Modified / per-endpoint Cache-Control on any HttpResponse
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(int(last_modified))
+    cache_control = settings.API_CACHE_CONTROL.get(endpoint)
+    if cache_control:
+        response["Cache-Control"] = cache_control
+    return response
+
+
+def entry_response(request, endpoint, entry):
+    return conditional_response(request, endpoint, entry["value"], entry["etag"], entry["last_modified"])
+
+
+# ---- version counters for data that isn't cached as a whole payload ----
+# Expiry only costs clients one full response: the next version is a new timestamp.
+VERSION_TTL = 7 * 24 * 3600
+
+
+def version_key(name):
+    return f"version:{name}"
+
+
+def bump_version(name):
+    # time-based rather than INCR, so a Redis flush can't make an old ETag valid again
+    try:
+        get_redis().set(version_key(name), time.time_ns(), ex=VERSION_TTL)
+    except redis.RedisError:
+        pass
+
+
+def current_version(name, exists=None):
+    """
+    Version for `name`, initialised on first read. `exists` (callable) is checked
+    before a new counter is created, so probing ids that don't exist leaves no
+    keys behind; returns None then, and also if Redis is unavailable (callers
+    skip validators rather than risk a wrong 304).
+    """
+    try:
+        client = get_redis()
+        value = client.get(version_key(name))
+        if value is None:
+            if exists is not None and not exists():
+                return None
+            client.set(version_key(name), time.time_ns(), nx=True, ex=VERSION_TTL)
+            value = client.get(version_key(name))
+    except redis.RedisError:
+        return None
+    return int(value) if value is not None else None
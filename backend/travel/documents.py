@@ -0,0 +1,291 @@
+"""
+Materialized itinerary detail documents.
+
+The nested detail JSON (days -> attractions/restaurants/experiences/budget) is
+built by one SQL statement on write and upserted into ItineraryDocument with a
+bumped version, so `itinerary_detail_api` is a single indexed fetch and can use
+the version as its ETag. Edits that bypass the itinerary serializer (admin,
+day plans, stops) are queued by signals and rebuilt by a debounced task.
+"""
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .cache_utils import cache_set, get_redis
+from .models import DayPlan, Itinerary, ItineraryDocument
+from .rendered import cache_rendered
+
+VALIDATORS_TTL = 3600
+PENDING_KEY = "itinerary_docs:pending"
+SCHEDULED_KEY = "itinerary_docs:scheduled"
+
+# Same shape the detail endpoint always returned; built and upserted in Postgres.
+DOCUMENT_UPSERT_SQL = """
+    WITH itinerary_base AS (
+        SELECT i.id, i.title, i.slug, i.short_description,
+               i.duration_days, i.duration_nights,
+               i.total_budget, i.thumbnail,
+               i.highlighted_places, i.popularity_score
+        FROM travel_itinerary i
+        WHERE i.id = %s
+        LIMIT 1
+    )
+    INSERT INTO travel_itinerarydocument (itinerary_id, slug, version, document, updated_at)
+    SELECT base.id, base.slug, 1, row_to_json(base)::jsonb || jsonb_build_object(
+        'categories', (
+            SELECT COALESCE(json_agg(json_build_object('id', c.id, 'name', c.name, 'slug', c.slug)), '[]'::json)
+            FROM travel_itinerary_categories ic
+            JOIN travel_category c ON c.id = ic.category_id
+            WHERE ic.itinerary_id = base.id
+        ),
+        'tags', (
+            SELECT COALESCE(json_agg(json_build_object('id', t.id, 'name', t.name, 'slug', t.slug)), '[]'::json)
+            FROM travel_itinerary_tags it
+            JOIN travel_tag t ON t.id = it.tag_id
+            WHERE it.itinerary_id = base.id
+        ),
+        'budget_breakdown', (
+            SELECT to_json(bb)
+            FROM (
+                SELECT stay, travel, food, misc
+                FROM travel_budgetbreakdown bb
+                WHERE bb.itinerary_id = base.id
+                LIMIT 1
+            ) bb
+        ),
+        'days', (
+            SELECT COALESCE(json_agg(
+                json_build_object(
+                    'day_number', d.day_number,
+                    'title', d.title,
+                    'description', d.description,
+                    'locations', d.locations,
+                    'route', d.route - 'signature',
+                    'attractions', (
+                        SELECT COALESCE(json_agg(
+                            json_build_object(
+                                'id', a.id,
+                                'name', a.name,
+                                'description', a.description,
+                                'image', a.image,
+                                'estimated_cost', a.estimated_cost,
+                                'latitude', a.latitude,
+                                'longitude', a.longitude,
+                                'google_place_id', a.google_place_id,
+                                'address', a.address
+                            )
+                        ORDER BY a.id), '[]'::json)
+                        FROM travel_attraction a
+                        WHERE a.day_plan_id = d.id
+                    ),
+                    'restaurants', (
+                        SELECT COALESCE(json_agg(
+                            json_build_object(
+                                'id', r.id,
+                                'name', r.name,
+                                'cuisine', r.cuisine,
+                                'description', r.description,
+                                'image', r.image,
+                                'estimated_cost', r.estimated_cost,
+                                'latitude', r.latitude,
+                                'longitude', r.longitude,
+                                'google_place_id', r.google_place_id,
+                                'address', r.address
+                            )
+                        ORDER BY r.id), '[]'::json)
+                        FROM travel_restaurant r
+                        WHERE r.day_plan_id = d.id
+                    ),
+                    'experiences', (
+                        SELECT COALESCE(json_agg(
+                            json_build_object(
+                                'id', e.id,
+                                'name', e.name,
+                                'description', e.description,
+                                'image', e.image,
+                                'estimated_cost', e.estimated_cost
+                            )
+                        ORDER BY e.id), '[]'::json)
+                        FROM travel_experience e
+                        WHERE e.day_plan_id = d.id
+                    ),
+                    'budget', (
+                        SELECT to_json(db)
+                        FROM (
+                            SELECT attractions_cost, restaurants_cost, experiences_cost,
+                                   total_cost, estimated_cost,
+                                   duration_minutes, start_time, end_time
+                            FROM travel_daybudget db
+                            WHERE db.day_plan_id = d.id
+                            LIMIT 1
+                        ) db
+                    )
+                )
+            ORDER BY d.day_number), '[]'::json)
+            FROM travel_dayplan d
+            WHERE d.itinerary_id = base.id
+        )
+    ), NOW()
+    FROM itinerary_base base
+    WHERE TRUE  -- keeps ON CONFLICT from parsing as a join condition
+    ON CONFLICT (itinerary_id) DO UPDATE SET
+        slug = EXCLUDED.slug,
+        document = EXCLUDED.document,
+        version = travel_itinerarydocument.version + 1,
+        updated_at = EXCLUDED.updated_at
+    RETURNING version, slug
+    """
+
+
+def rebuild_itinerary_document(itinerary_id):
+    """
+    Rebuild one itinerary's document. Returns the new version, or None if the
+    itinerary no longer exists (its document is removed by the cascade).
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        # a renamed itinerary may have freed a slug another document still holds
+        cursor.execute(
+            """
+            DELETE FROM travel_itinerarydocument d
+            USING travel_itinerary i
+            WHERE i.id = %s AND d.slug = i.slug AND d.itinerary_id <> i.id
+            """,
+            [itinerary_id],
+        )
+        cursor.execute(DOCUMENT_UPSERT_SQL, [itinerary_id])
+        row = cursor.fetchone()
+    if not row:
+        return None
+    cache.delete_many([validators_key(row[1]), body_key(row[1])])
+    return row[0]
+
+
+def schedule_document_rebuild(itinerary_id):
+    # after commit so the statement sees the nested rows written in the same transaction
+    transaction.on_commit(lambda: rebuild_itinerary_document(itinerary_id))
+
+
+# ---- debounced rebuilds for edits outside the itinerary serializer ----
+def queue_document_rebuild(itinerary_ids=(), day_plan_ids=()):
+    """
+    Rebuild the documents of these itineraries (or of the itineraries owning
+    these day plans) once per DOCUMENT_REBUILD_DEBOUNCE window, after commit.
+    Used by the signals on day plans and their stops, e.g. admin edits.
+    """
+    members = {f"itinerary:{i}" for i in itinerary_ids if i} | {f"day:{d}" for d in day_plan_ids if d}
+    if members:
+        transaction.on_commit(lambda: _enqueue(members))
+
+
+def _enqueue(members):
+    from .tasks import rebuild_pending_documents  # tasks -> views -> ... imports this module
+
+    debounce = settings.DOCUMENT_REBUILD_DEBOUNCE
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.sadd(PENDING_KEY, *members)
+        pipe.set(SCHEDULED_KEY, 1, nx=True, ex=debounce * 2)
+        _, first_in_window = pipe.execute()
+    except redis.RedisError:
+        for itinerary_id in _itinerary_ids(members):
+            rebuild_itinerary_document(itinerary_id)
+        return
+
+    if first_in_window:
+        try:
+            rebuild_pending_documents.apply_async(countdown=debounce)
+        except Exception:
+            get_redis().delete(SCHEDULED_KEY)  # the next write schedules it again
+
+
+def _itinerary_ids(members):
+    itinerary_ids, day_ids = set(), set()
+    for member in members:
+        kind, _, pk = (member.decode() if isinstance(member, bytes) else member).partition(":")
+        (itinerary_ids if kind == "itinerary" else day_ids).add(int(pk))
+    if day_ids:
+        # a day plan deleted meanwhile queued its itinerary itself
+        itinerary_ids.update(DayPlan.objects.filter(id__in=day_ids).values_list("itinerary_id", flat=True))
+    return sorted(itinerary_ids)
+
+
+def pop_pending_documents():
+    """
+    Itinerary ids queued so far. The schedule flag is cleared first so writes
+    that race with the flush open a new window instead of being dropped.
+    """
+    client = get_redis()
+    client.delete(SCHEDULED_KEY)
+    pipe = client.pipeline(transaction=True)
+    pipe.smembers(PENDING_KEY)
+    pipe.delete(PENDING_KEY)
+    members, _ = pipe.execute()
+    return _itinerary_ids(members)
+
+
+def get_itinerary_document(slug):
+    """
+    (document, version) by slug, building it on first read for itineraries that
+    predate the document table. None if there is no such itinerary.
+    """
+    row = ItineraryDocument.objects.filter(slug=slug).values_list("document", "version").first()
+    if row:
+        return row
+    itinerary_id = Itinerary.objects.filter(slug=slug).values_list("id", flat=True).first()
+    if itinerary_id is None or rebuild_itinerary_document(itinerary_id) is None:
+        return None
+    return ItineraryDocument.objects.filter(itinerary_id=itinerary_id).values_list("document", "version").first()
+
+
+def validators_key(slug):
+    return f"itinerary_doc_meta:{slug}"
+
+
+def body_key(slug):
+    return f"itinerary_doc_body:{slug}"
+
+
+def document_validators(slug):
+    """
+    {"etag", "last_modified"} for the detail endpoint, cached so a revalidating
+    client gets its 304 without a query. Dropped on rebuild and with the
+    itinerary's cache tag. None if there is no such itinerary.
+    """
+    key = validators_key(slug)
+    meta = cache.get(key)
+    if meta is not None:
+        return meta
+
+    row = ItineraryDocument.objects.filter(slug=slug).values_list("itinerary_id", "version", "updated_at").first()
+    if row is None:
+        if get_itinerary_document(slug) is None:
+            return None
+        row = ItineraryDocument.objects.filter(slug=slug).values_list("itinerary_id", "version", "updated_at").first()
+    itinerary_id, version, updated_at = row
+    meta = {
+        "etag": f'"itinerary-{itinerary_id}-v{version}"',
+        "last_modified": int(updated_at.timestamp()),
+    }
+    cache_set(key, meta, timeout=VALIDATORS_TTL, tags=[f"itinerary:{itinerary_id}"])
+    return meta
+
+
+def document_blob(slug, etag):
+    """
+    Rendered detail JSON (rendered.py) for the document version `etag` names.
+    A blob left over from an older version is re-rendered rather than served.
+    """
+    key = body_key(slug)
+    blob = cache.get(key)
+    if blob is not None and blob.get("etag") == etag:
+        return blob
+
+    found = get_itinerary_document(slug)
+    if found is None:
+        return None
+    document, version = found
+    return cache_rendered(
+        key, document, timeout=VALIDATORS_TTL, tags=[f"itinerary:{document['id']}"],
+        etag=f'"itinerary-{document["id"]}-v{version}"',
+    )
@@ -0,0 +1,155 @@
+"""
+Ingestion for destination view/dwell/click events.
+
+Requests only validate and enqueue. In "buffered" mode (settings.EVENT_INGEST_MODE)
+events are appended to a Redis list and `tasks.flush_destination_events` drains it
+with bulk_create; in "sync" mode (or if Redis is down) they are bulk inserted right away.
+"""
+import json
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from django.contrib.auth import get_user_model
+
+from .cache_utils import get_redis, clear_user_recommendations
+from .models import Destination, DestinationView
+from .trending import record_activity
+
+EVENT_BUFFER_KEY = "events:destination:buffer"
+ACTION_TYPES = {choice for choice, _ in DestinationView.ACTION_CHOICES}
+
+
+def event_context(request):
+    """
+    Per-request part of an event (who/where/when), resolved once even when a
+    request carries many events. Stamped with request time so buffered rows keep
+    the time they happened, not the time they were flushed.
+    """
+    session_id = request.session.session_key or request.session.create()
+    return {
+        "user_id": request.user.id if request.user.is_authenticated else None,
+        "session_id": session_id,
+        "ip_address": request.META.get("REMOTE_ADDR"),
+        "created_at": timezone.now().isoformat(),
+    }
+
+
+def build_event(context, destination_id, action_type, dwell_time=0, click_target=None):
+    # Plain dict so it can go through the Redis buffer as JSON
+    return {
+        **context,
+        "destination_id": destination_id,
+        "action_type": action_type,
+        "dwell_time": dwell_time,
+        "click_target": click_target,
+    }
+
+
+def record_events(events):
+    if not events:
+        return
+    if settings.EVENT_INGEST_MODE == "buffered":
+        try:
+            get_redis().rpush(EVENT_BUFFER_KEY, *[json.dumps(e) for e in events])
+            return
+        except redis.RedisError:
+            pass  # don't drop events because the buffer is unavailable
+    write_events(events)
+
+
+def _is_valid(event):
+    return (
+        isinstance(event, dict)
+        and isinstance(event.get("destination_id"), int)
+        and event.get("action_type") in ACTION_TYPES
+    )
+
+
+def _created_at(event):
+    try:
+        parsed = parse_datetime(event["created_at"]) if event.get("created_at") else None
+    except (TypeError, ValueError):
+        parsed = None
+    return parsed or timezone.now()
+
+
+def write_events(events):
+    """
+    Insert a batch of events with one bulk_create, fold them into the hourly
+    trending counters, and invalidate recommendations once per user in the batch
+    (bulk_create skips the post_save signal).
+
+    Events that can never be written (malformed, deleted destination) are dropped
+    and deleted users become anonymous, so the only error left to raise is the
+    database write itself.
+    """
+    events = [e for e in events if _is_valid(e)]
+    if not events:
+        return 0
+
+    # Destinations / users can be deleted while events sit in the buffer
+    dest_ids = {e["destination_id"] for e in events}
+    existing = set(Destination.objects.filter(id__in=dest_ids).values_list("id", flat=True))
+    user_ids = {e["user_id"] for e in events if e.get("user_id")}
+    users = set(get_user_model().objects.filter(id__in=user_ids).values_list("id", flat=True)) if user_ids else set()
+
+    rows = [
+        DestinationView(
+            destination_id=e["destination_id"],
+            user_id=e.get("user_id") if e.get("user_id") in users else None,
+            session_id=e.get("session_id"),
+            ip_address=e.get("ip_address"),
+            action_type=e["action_type"],
+            dwell_time=e.get("dwell_time") or 0,
+            click_target=e.get("click_target"),
+            created_at=_created_at(e),
+        )
+        for e in events
+        if e["destination_id"] in existing
+    ]
+    with transaction.atomic():
+        DestinationView.objects.bulk_create(rows, batch_size=500)
+        record_activity(rows)
+
+    # rows are committed: from here on a failure must not make the caller retry them
+    try:
+        clear_user_recommendations(users)
+    except Exception:
+        pass  # best effort; recommendation caches also expire on their own
+    return len(rows)
+
+
+def drain_event_buffer(batch_size=None):
+    """
+    Pop up to `batch_size` events off the buffer and write them.
+    LRANGE + LTRIM run in one MULTI so concurrent flushers never share events.
+    Returns how many events were popped.
+    """
+    batch_size = batch_size or settings.EVENT_FLUSH_BATCH_SIZE
+    client = get_redis()
+    pipe = client.pipeline()
+    pipe.lrange(EVENT_BUFFER_KEY, 0, batch_size - 1)
+    pipe.ltrim(EVENT_BUFFER_KEY, batch_size, -1)
+    raw, _ = pipe.execute()
+    if not raw:
+        return 0
+
+    events = []
+    for item in raw:
+        try:
+            events.append(json.loads(item))
+        except ValueError:
+            continue  # a malformed entry must not block the queue
+
+    try:
+        write_events(events)
+    except Exception:
+        # only the DB write raises (invalid events are dropped, invalidation is
+        # best effort): put the batch back at the head, in order, for the next flush
+        client.lpush(EVENT_BUFFER_KEY, *reversed(raw))
+        raise
+    return len(raw)
@@ -0,0 +1,59 @@
+"""
+Concurrent per-entity queries for the search endpoints.
+
+`fan_out` runs independent ORM branches (destinations / itineraries / attractions)
+on a shared thread pool, each thread with its own DB connection, and waits at most
+SEARCH_FANOUT_DEADLINE seconds. Branches that are still running then are reported
+as missing so the endpoint can answer with partial results instead of the sum of all
+query latencies. On Postgres every branch also gets a statement_timeout just past
+the deadline (SET LOCAL in the branch's transaction), so an abandoned query
+doesn't keep its pool thread busy.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+_executor = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.SEARCH_FANOUT_WORKERS, thread_name_prefix="search-fanout")
+    return _executor
+
+
+def _run_branch(fn, timeout_ms):
+    # same lifecycle as a request: reuse the thread's connection within CONN_MAX_AGE
+    close_old_connections()
+    try:
+        # SET LOCAL inside a transaction: safe behind a transaction-mode pooler
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL statement_timeout = %s", [timeout_ms])
+            return fn()
+    finally:
+        close_old_connections()
+
+
+def fan_out(branches, deadline=None):
+    """
+    Run {name: callable} concurrently. Returns (results, missing): results maps
+    each finished branch to its return value, missing lists the branches that
+    missed the deadline. An exception in a finished branch is raised here.
+    """
+    deadline = settings.SEARCH_FANOUT_DEADLINE if deadline is None else deadline
+    timeout_ms = int(deadline * 1000) + 250
+    futures = {name: _pool().submit(_run_branch, fn, timeout_ms) for name, fn in branches.items()}
+    wait(futures.values(), timeout=deadline)
+
+    results, missing = {}, []
+    for name, future in futures.items():
+        if future.done():
+            results[name] = future.result()  # re-raises, like the sequential code did
+        else:
+            future.cancel()  # no-op if already running; statement_timeout ends it
+            missing.append(name)
+    return results, missing
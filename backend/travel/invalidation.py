@@ -0,0 +1,122 @@
+"""
+Dependency-aware cache invalidation for model writes.
+
+Signal handlers ask the planner which cache tags a write can affect (the
+destination's own entries, its country list, the trending list, its itinerary
+pages...) and queue those tags in a Redis set. The first write in a burst schedules
+`tasks.flush_cache_invalidations` CACHE_INVALIDATION_DEBOUNCE seconds later, so ten
+gallery uploads become one invalidation plus one refresh of just the pages that
+were dropped.
+"""
+import redis
+from django.conf import settings
+
+from .cache_utils import get_redis, invalidate_tags
+from .models import Destination, Location
+
+PENDING_KEY = "invalidation:pending"
+SCHEDULED_KEY = "invalidation:scheduled"
+DESTINATION_LIST_PREFIX = "destinations:/api/destinations/"
+
+
+def snapshot_destination(instance):
+    # pre_save: the fields whose change moves a destination between cached lists
+    if not instance.pk:
+        return None
+    return Destination.objects.filter(pk=instance.pk).values("name", "slug", "is_trending", "location_id").first()
+
+
+def _country_tags(location_ids):
+    countries = Location.objects.filter(id__in=[i for i in location_ids if i]).values_list("country", flat=True)
+    return {f"destinations:country:{c}" for c in countries if c}
+
+
+def destination_tags(instance, previous=None, created=False, deleted=False):
+    """
+    Cache tags a destination write can affect. Pages that show the destination are
+    tagged with it; list membership only changes for create/delete or when the
+    trending flag, country or name (search) moved.
+    """
+    tags = {f"destination:{instance.id}", f"destination_itineraries:{instance.slug}"}
+    if created or deleted:
+        # ordering is by id/score, so a new or removed row shifts every list page
+        return tags | {"destinations", "search"}
+
+    if previous is None:
+        tags |= {"destinations:trending", "destinations:search", "search"} | _country_tags([instance.location_id])
+        return tags
+
+    if previous["slug"] != instance.slug:
+        tags.add(f"destination_itineraries:{previous['slug']}")
+    if previous["is_trending"] != instance.is_trending:
+        tags.add("destinations:trending")
+    if previous["name"] != instance.name:
+        tags |= {"destinations:search", "search"}
+    if previous["location_id"] != instance.location_id:
+        tags |= _country_tags([previous["location_id"], instance.location_id])
+    return tags
+
+
+def destination_image_tags(instance):
+    # images only show up inside entries that already carry the destination tag
+    return {f"destination:{instance.destination_id}"}
+
+
+def itinerary_tags(instance, category_slugs=()):
+    return {
+        f"itinerary:{instance.id}",
+        f"destination_itineraries:{instance.destination.slug}",
+        *(f"category:{slug}" for slug in category_slugs),
+    }
+
+
+def queue_invalidation(tags):
+    """
+    Add `tags` to the pending set and make sure one flush is scheduled for the
+    current debounce window. Falls back to invalidating right away if Redis or the
+    broker is unavailable.
+    """
+    tags = set(tags)
+    if not tags:
+        return
+    from .tasks import flush_cache_invalidations  # tasks -> views -> ... imports this module
+
+    debounce = settings.CACHE_INVALIDATION_DEBOUNCE
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.sadd(PENDING_KEY, *tags)
+        pipe.set(SCHEDULED_KEY, 1, nx=True, ex=debounce * 2)
+        _, first_in_window = pipe.execute()
+    except redis.RedisError:
+        invalidate_tags(*tags)
+        return
+
+    if first_in_window:
+        try:
+            flush_cache_invalidations.apply_async(countdown=debounce)
+        except Exception:
+            get_redis().delete(SCHEDULED_KEY)
+            invalidate_tags(*tags)
+
+
+def flush_pending():
+    """
+    Invalidate everything queued so far. Returns the deleted cache keys.
+    The schedule flag is cleared first so writes that race with the flush
+    open a new window instead of being dropped.
+    """
+    client = get_redis()
+    client.delete(SCHEDULED_KEY)
+    pipe = client.pipeline(transaction=True)
+    pipe.smembers(PENDING_KEY)
+    pipe.delete(PENDING_KEY)
+    members, _ = pipe.execute()
+    tags = [m.decode() if isinstance(m, bytes) else m for m in members]
+    return invalidate_tags(*tags)
+
+
+def destination_pages_to_refresh(keys, limit=None):
+    # only list pages are worth re-warming; counts/search/etc. refill on demand
+    limit = limit or settings.CACHE_REFRESH_LIMIT
+    pages = sorted(k for k in keys if k.startswith(DESTINATION_LIST_PREFIX))
+    return pages[:limit]
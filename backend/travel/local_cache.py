@@ -0,0 +1,153 @@
+"""
+Per-process L1 cache for near-static reference data (slug -> id maps, category
+metadata, the Cloudinary URL prefix).
+
+Each gunicorn worker keeps a small LRU with a TTL in memory, so hot lookups cost no
+DB or Redis round-trip. Writes call `invalidate(name)`, which clears the local copy
+and publishes on L1_CHANNEL; a daemon thread in every other process applies it.
+The TTL bounds staleness if a message is ever missed (e.g. Redis blip).
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+
+from .cache_utils import get_redis
+
+L1_CHANNEL = "cache:l1:invalidate"
+_MISSING = object()
+
+
+class LocalCache:
+    def __init__(self, name, maxsize=1024, ttl=300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """
+        Value for `key`, calling `loader()` on a miss. None results are cached too,
+        so repeated lookups of an unknown slug don't hit the DB either.
+        """
+        _ensure_listener()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[1] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            self._data[key] = (value, now + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def replace(self, key, value):
+        # swap in a new value for a live entry, keeping its expiry; no-op once it's gone
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data[key] = (value, entry[1])
+
+    def peek(self, key):
+        # cached value or None, without loading or touching the stats
+        entry = self._data.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def clear(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+        }
+
+
+_caches = {}
+
+
+def local_cache(name, maxsize=1024, ttl=300):
+    if name not in _caches:
+        _caches[name] = LocalCache(name, maxsize=maxsize, ttl=ttl)
+    return _caches[name]
+
+
+def invalidate(name, key=None):
+    """
+    Drop `key` (or everything) from the named L1 cache in this process and,
+    through pub/sub, in every other worker.
+    """
+    if name in _caches:
+        _caches[name].clear(key)
+    try:
+        get_redis().publish(L1_CHANNEL, json.dumps({"cache": name, "key": key, "pid": os.getpid()}))
+    except redis.RedisError:
+        pass  # other workers fall back to the TTL
+
+
+def stats():
+    # this worker's counters only; every process has its own L1
+    return {"pid": os.getpid(), "caches": {name: c.stats() for name, c in _caches.items()}}
+
+
+# ---- cross-process invalidation listener ----
+_listener = {"pid": None}
+_listener_lock = threading.Lock()
+
+
+def _apply(message):
+    try:
+        data = json.loads(message["data"])
+    except (TypeError, ValueError):
+        return
+    if data.get("pid") == os.getpid():
+        return  # already applied locally
+    cache = _caches.get(data.get("cache"))
+    if cache is not None:
+        cache.clear(data.get("key"))
+
+
+def _listen():
+    while True:
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(L1_CHANNEL)
+            # anything published while we were disconnected is lost, so start clean
+            for cache in _caches.values():
+                cache.clear()
+            for message in pubsub.listen():
+                _apply(message)
+        except redis.RedisError:
+            time.sleep(5)
+
+
+def _ensure_listener():
+    # started lazily (and again after fork: threads don't survive it)
+    if _listener["pid"] == os.getpid():
+        return
+    with _listener_lock:
+        if _listener["pid"] != os.getpid():
+            _listener["pid"] = os.getpid()
+            threading.Thread(target=_listen, name="l1-invalidation", daemon=True).start()
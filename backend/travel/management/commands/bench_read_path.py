@@ -0,0 +1,121 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)  # chunk + CRLF
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection == "keep-alive" if status_line.startswith(b"HTTP/1.0") else connection != "close"
+    return status, keep_alive
+
+
+async def _worker(host, port, request, remaining, latencies, errors):
+    reader = writer = None
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+            if status >= 400:
+                errors.append(status)
+            else:
+                latencies.append(time.perf_counter() - started)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError) as exc:
+            errors.append(type(exc).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _run(url, total, concurrency):
+    parts = urlsplit(url)
+    if parts.scheme != "http":
+        raise CommandError("only plain http:// targets are supported (bench the app server, not the proxy)")
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        "Accept: application/json\r\nConnection: keep-alive\r\n\r\n"
+    ).encode()
+
+    latencies, errors, remaining = [], [], [total]
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(parts.hostname, parts.port or 80, request, remaining, latencies, errors)
+        for _ in range(concurrency)
+    ))
+    return time.perf_counter() - started, latencies, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare read-path throughput of a sync (WSGI) and an async (ASGI) server, e.g. "
+        "gunicorn travelplanner.wsgi on :8000 vs gunicorn travelplanner.asgi -k "
+        "uvicorn.workers.UvicornWorker with ASYNC_READ_VIEWS=1 on :8001. Warm the cache first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sync-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--async-url", default="http://127.0.0.1:8001")
+        parser.add_argument(
+            "--path", action="append", dest="paths",
+            help="Endpoint to hit (repeatable). Default: the three async fast-path endpoints",
+        )
+        parser.add_argument("--requests", type=int, default=5000, help="Requests per endpoint per server")
+        parser.add_argument("--concurrency", type=int, default=200, help="Concurrent keep-alive connections")
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or [
+            "/api/destinations/",
+            "/api/search/suggestions/?q=go",
+            "/api/recommendations/destinations/",
+        ]
+        self.stdout.write(f"{'endpoint':<40} {'server':<6} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for path in paths:
+            for label, base in (("sync", options["sync_url"]), ("async", options["async_url"])):
+                elapsed, latencies, errors = asyncio.run(
+                    _run(base.rstrip("/") + path, options["requests"], options["concurrency"])
+                )
+                if latencies:
+                    latencies.sort()
+                    p50 = statistics.median(latencies) * 1000
+                    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+                else:
+                    p50 = p99 = 0
+                self.stdout.write(
+                    f"{path[:40]:<40} {label:<6} {len(latencies) / elapsed:>9.0f} "
+                    f"{p50:>8.1f} {p99:>8.1f} {len(errors):>7}"
+                )
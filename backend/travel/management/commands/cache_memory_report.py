@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from travel.cache_utils import get_redis
+
+
+def key_prefix(key, depth):
+    # ":1:destinations:/api/..." -> "destinations:/api/..." -> first `depth` parts
+    parts = key.split(":")
+    if len(parts) > 2 and parts[0] == "" and parts[1].isdigit():
+        parts = parts[2:]  # Django's KEY_PREFIX/VERSION
+    return ":".join(parts[:depth])
+
+
+class Command(BaseCommand):
+    help = "Report Redis memory usage grouped by key prefix (SCAN + MEMORY USAGE, non-blocking)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--match", default="*", help="SCAN MATCH pattern (default: everything)")
+        parser.add_argument("--depth", type=int, default=2, help="Colon-separated parts that form a prefix")
+        parser.add_argument("--top", type=int, default=30, help="Show the N biggest prefixes")
+        parser.add_argument("--samples", type=int, default=5, help="MEMORY USAGE SAMPLES for nested types")
+        parser.add_argument("--batch", type=int, default=500, help="Keys per SCAN/pipeline round")
+
+    def handle(self, *args, **options):
+        client = get_redis()
+        totals = defaultdict(lambda: [0, 0])  # prefix -> [keys, bytes]
+        scanned = 0
+
+        batch = []
+        for key in client.scan_iter(match=options["match"], count=options["batch"]):
+            batch.append(key)
+            if len(batch) >= options["batch"]:
+                scanned += self._measure(client, batch, totals, options)
+                batch = []
+        if batch:
+            scanned += self._measure(client, batch, totals, options)
+
+        total_bytes = sum(b for _, b in totals.values())
+        rows = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:options["top"]]
+
+        self.stdout.write(f"{'prefix':<60} {'keys':>9} {'bytes':>14} {'avg':>10} {'share':>7}")
+        for prefix, (keys, size) in rows:
+            share = size / total_bytes * 100 if total_bytes else 0
+            self.stdout.write(f"{prefix[:60]:<60} {keys:>9} {size:>14,} {size // keys:>10,} {share:>6.1f}%")
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} keys in {len(totals)} prefixes, {total_bytes:,} bytes total"
+        ))
+
+    def _measure(self, client, keys, totals, options):
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key, samples=options["samples"])
+        for key, size in zip(keys, pipe.execute()):
+            if size is None:
+                continue  # expired between SCAN and MEMORY USAGE
+            row = totals[key_prefix(key.decode(errors="replace"), options["depth"])]
+            row[0] += 1
+            row[1] += size
+        return len(keys)
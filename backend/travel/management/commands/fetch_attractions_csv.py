@@ -1,8 +1,11 @@
 import csv
-import requests
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
 from django.core.management.base import BaseCommand
 
+from travel.osm_enrichment import Fetcher, ResponseCache
+
 OVERPASS_URL = "http://overpass-api.de/api/interpreter"
 NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse"
 WIKIDATA_URL = "https://www.wikidata.org/w/api.php"
@@ -25,56 +28,107 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("region", type=str, help="Region name (e.g., Goa, Delhi)")
         parser.add_argument("--output", type=str, default="attractions.csv")
+        parser.add_argument("--cache", type=str, default="osm_cache.sqlite3", help="SQLite response cache; reruns read from it")
+        parser.add_argument("--max-age-days", type=float, default=30, help="Refetch cached responses older than this")
+        parser.add_argument("--refresh-overpass", action="store_true", help="Refetch the element list even if cached")
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--coord-precision", type=int, default=2,
+                            help="Decimals coordinates are rounded to for reverse geocoding (2 ~ 1 km, plenty at city zoom)")
+        parser.add_argument("--nominatim-rate", type=float, default=1.0, help="Requests/second (Nominatim policy: 1)")
+        parser.add_argument("--wiki-rate", type=float, default=10.0, help="Requests/second per Wikidata/Wikipedia host")
+        # base URLs are overridable, e.g. to run against a local stub server
+        parser.add_argument("--overpass-url", default=OVERPASS_URL)
+        parser.add_argument("--nominatim-url", default=NOMINATIM_URL)
+        parser.add_argument("--wikidata-url", default=WIKIDATA_URL)
+        parser.add_argument("--wikipedia-url", default=WIKIPEDIA_SUMMARY_URL, help="With a {title} placeholder")
 
     def reverse_geocode(self, lat, lon):
-        try:
-            params = {"lat": lat, "lon": lon, "format": "json", "zoom": 10, "addressdetails": 1}
-            r = requests.get(NOMINATIM_URL, params=params, headers={"User-Agent": "travista-bot"})
-            if r.status_code == 200:
-                addr = r.json().get("address", {})
-                return (
-                    addr.get("city") or addr.get("town") or addr.get("village") or "",
-                    addr.get("state", ""),
-                    addr.get("country", "")
-                )
-        except Exception:
-            pass
-        return ("", "", "")
+        params = {"lat": lat, "lon": lon, "format": "json", "zoom": 10, "addressdetails": 1}
+        data = self.fetcher.get_json(self.urls["nominatim"], params)
+        addr = (data or {}).get("address", {})
+        return (
+            addr.get("city") or addr.get("town") or addr.get("village") or "",
+            addr.get("state", ""),
+            addr.get("country", "")
+        )
 
     def get_wikipedia_summary(self, wikidata_id):
-        try:
-            # Step 1: Get sitelinks from Wikidata
-            params = {"action": "wbgetentities", "ids": wikidata_id, "format": "json", "props": "sitelinks"}
-            r = requests.get(WIKIDATA_URL, params=params, headers={"User-Agent": "travista-bot"})
-            if r.status_code != 200:
-                return ""
-            data = r.json()
-            sitelinks = data.get("entities", {}).get(wikidata_id, {}).get("sitelinks", {})
-            if "enwiki" not in sitelinks:
-                return ""
-            title = sitelinks["enwiki"]["title"]
-
-            # Step 2: Fetch summary from Wikipedia
-            summary_url = WIKIPEDIA_SUMMARY_URL.format(title=title.replace(" ", "_"))
-            r = requests.get(summary_url, headers={"User-Agent": "travista-bot"})
-            if r.status_code == 200:
-                return r.json().get("extract", "")
-        except Exception:
-            pass
-        return ""
+        # Step 1: Get sitelinks from Wikidata
+        params = {"action": "wbgetentities", "ids": wikidata_id, "format": "json", "props": "sitelinks"}
+        data = self.fetcher.get_json(self.urls["wikidata"], params) or {}
+        sitelinks = data.get("entities", {}).get(wikidata_id, {}).get("sitelinks", {})
+        if "enwiki" not in sitelinks:
+            return ""
+        title = sitelinks["enwiki"]["title"]
+
+        # Step 2: Fetch summary from Wikipedia
+        summary = self.fetcher.get_json(self.urls["wikipedia"].format(title=title.replace(" ", "_")))
+        return (summary or {}).get("extract", "")
+
+    def enrich(self, jobs, workers):
+        """Run {key: callable} on the pool; {key: result}. Per-host limiters pace the requests."""
+        results = {}
+        if not jobs:
+            return results
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="osm-enrich") as pool:
+            futures = {pool.submit(fn): key for key, fn in jobs.items()}
+            for done, future in enumerate(as_completed(futures), 1):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception:
+                    results[key] = None  # not cached either, so a rerun retries it
+                if done % 100 == 0 or done == len(futures):
+                    self.stdout.write(f"  {done}/{len(futures)} lookups done")
+        return results
 
     def handle(self, *args, **options):
         region = options["region"]
         output_file = options["output"]
         query = QUERY_TEMPLATE.format(region=region)
+        precision = options["coord_precision"]
+        self.urls = {
+            "nominatim": options["nominatim_url"],
+            "wikidata": options["wikidata_url"],
+            "wikipedia": options["wikipedia_url"],
+        }
+        wiki_rate = options["wiki_rate"]
+        cache = ResponseCache(options["cache"], max_age=options["max_age_days"] * 86400)
+        self.fetcher = Fetcher(cache, rates={
+            urlparse(options["nominatim_url"]).netloc: options["nominatim_rate"],
+            urlparse(options["wikidata_url"]).netloc: wiki_rate,
+            urlparse(options["wikipedia_url"]).netloc: wiki_rate,
+        })
 
         self.stdout.write(self.style.NOTICE(f"Fetching attractions for {region}..."))
-        response = requests.post(OVERPASS_URL, data={"data": query})
-        if response.status_code != 200:
-            self.stderr.write(f"Error fetching OSM data: {response.status_code}")
+        data = self.fetcher.request_json(
+            "POST", options["overpass_url"], data={"data": query}, refresh=options["refresh_overpass"]
+        )
+        if data is None:
+            self.stderr.write("Error fetching OSM data")
+            cache.close()
             return
 
-        elements = response.json().get("elements", [])
+        elements = [el for el in data.get("elements", []) if el.get("tags", {}).get("name")]
+
+        # one lookup per rounded coordinate / wikidata id, however many elements share it
+        geocode_jobs, wiki_jobs = {}, {}
+        for el in elements:
+            tags = el["tags"]
+            located = el.get("lat") is not None and el.get("lon") is not None
+            if located and not (tags.get("addr:city") and tags.get("addr:state") and tags.get("addr:country")):
+                point = (round(el.get("lat"), precision), round(el.get("lon"), precision))
+                geocode_jobs.setdefault(point, lambda p=point: self.reverse_geocode(*p))
+            wikidata_id = tags.get("wikidata", "")
+            if wikidata_id and not (tags.get("description") or tags.get("note")):
+                wiki_jobs.setdefault(wikidata_id, lambda w=wikidata_id: self.get_wikipedia_summary(w))
+
+        self.stdout.write(
+            f"{len(elements)} named elements: {len(geocode_jobs)} places to geocode, "
+            f"{len(wiki_jobs)} Wikipedia summaries"
+        )
+        places = self.enrich(geocode_jobs, options["workers"])
+        summaries = self.enrich(wiki_jobs, options["workers"])
 
         with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
             writer = csv.writer(csvfile)
@@ -86,10 +140,6 @@ class Command(BaseCommand):
 
             for el in elements:
                 tags = el.get("tags", {})
-                name = tags.get("name")
-                if not name:
-                    continue
-
                 lat, lon = el.get("lat"), el.get("lon")
 
                 # Try OSM tags first
@@ -98,20 +148,19 @@ class Command(BaseCommand):
                 country = tags.get("addr:country", "")
 
                 # Fallback: reverse geocode
-                if not (city and state and country):
-                    city, state, country = self.reverse_geocode(lat, lon)
-                    time.sleep(1)  # Nominatim rate-limit
+                if not (city and state and country) and lat is not None and lon is not None:
+                    point = (round(lat, precision), round(lon, precision))
+                    city, state, country = places.get(point) or ("", "", "")
 
                 # Description (OSM + Wikipedia)
                 desc = tags.get("description", "") or tags.get("note", "")
                 wikidata_id = tags.get("wikidata", "")
                 if not desc and wikidata_id:
-                    desc = self.get_wikipedia_summary(wikidata_id)
-                    time.sleep(0.5)  # be gentle
+                    desc = summaries.get(wikidata_id) or ""
 
                 writer.writerow([
                     el.get("id"),
-                    name,
+                    tags["name"],
                     lat,
                     lon,
                     city,
@@ -123,4 +172,8 @@ class Command(BaseCommand):
                     str(tags)
                 ])
 
-        self.stdout.write(self.style.SUCCESS(f"✅ Saved {len(elements)} attractions to {output_file}"))
+        cache.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Saved {len(elements)} attractions to {output_file} "
+            f"(cache: {self.fetcher.hits} hits, {self.fetcher.misses} fetched)"
+        ))
@@ -0,0 +1,285 @@
+import csv
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from travel import autocomplete, nearby, search_index
+from travel.documents import queue_document_rebuild
+from travel.models import Attraction, Location
+
+COORD_PLACES = Decimal("0.000001")
+UPSERT_ROWS = 1000  # rows per statement, well under Postgres' 65535 bind parameters
+
+# A blank or missing CSV value never overwrites what is already there (curated
+# descriptions, a location the row can't name): name always, the rest only when set.
+INSERT_COLUMNS = [
+    "osm_id", "name", "latitude", "longitude", "address", "description", "city", "state", "country",
+    "location_id", "estimated_cost", "duration_minutes",
+]
+UPSERT_SQL = """
+    INSERT INTO travel_attraction ({columns}) VALUES {values}
+    ON CONFLICT (osm_id) DO UPDATE SET
+        name = EXCLUDED.name,
+        latitude = COALESCE(EXCLUDED.latitude, travel_attraction.latitude),
+        longitude = COALESCE(EXCLUDED.longitude, travel_attraction.longitude),
+        address = COALESCE(NULLIF(EXCLUDED.address, ''), travel_attraction.address),
+        description = COALESCE(NULLIF(EXCLUDED.description, ''), travel_attraction.description),
+        city = CASE WHEN EXCLUDED.location_id IS NULL THEN travel_attraction.city ELSE EXCLUDED.city END,
+        state = CASE WHEN EXCLUDED.location_id IS NULL THEN travel_attraction.state ELSE EXCLUDED.state END,
+        country = CASE WHEN EXCLUDED.location_id IS NULL THEN travel_attraction.country ELSE EXCLUDED.country END,
+        location_id = COALESCE(EXCLUDED.location_id, travel_attraction.location_id)
+    RETURNING id, day_plan_id
+"""
+# fields the name + location path copies from the CSV when non-empty
+MERGE_FIELDS = ["latitude", "longitude", "address", "description"]
+
+
+def _text(row, column, max_length=None):
+    value = (row.get(column) or "").strip()
+    return value[:max_length] if max_length else value
+
+
+def _coord(value):
+    try:
+        return Decimal(value).quantize(COORD_PLACES)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def _osm_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a fetch_attractions_csv file into Attraction/Location in bulk. "
+        "Upserts on osm_id (else name + location), resumable after an interrupt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=str, help="CSV written by fetch_attractions_csv")
+        parser.add_argument("--batch", type=int, default=5000, help="Rows per transaction")
+        parser.add_argument("--resume-file", type=str, help="Progress file (default: <path>.progress)")
+        parser.add_argument("--restart", action="store_true", help="Ignore saved progress and start from the top")
+        parser.add_argument("--skip-search-index", action="store_true", help="Don't reindex search rows (run rebuild_search_index later)")
+
+    # ---- locations ----
+    def load_locations(self):
+        self.locations = {
+            (city, state, country): pk
+            for pk, city, state, country in Location.objects.values_list("id", "city", "state", "country")
+        }
+        self.location_slugs = set(Location.objects.values_list("slug", flat=True))
+
+    def resolve_locations(self, keys):
+        """Create the (city, state, country) rows not in the map yet, in one insert."""
+        missing = [key for key in keys if key not in self.locations]
+        if not missing:
+            return
+        new = []
+        for city, state, country in missing:
+            # same slug Location.save() would give, suffixed if another place already has it
+            base = slugify("-".join(p for p in (city, state, country) if p)) or "location"
+            slug, n = base, 1
+            while slug in self.location_slugs:
+                n += 1
+                slug = f"{base}-{n}"
+            self.location_slugs.add(slug)
+            new.append(Location(city=city, state=state, country=country, slug=slug))
+        Location.objects.bulk_create(new, ignore_conflicts=True)  # a concurrent import may have won
+        for pk, city, state, country in Location.objects.filter(slug__in=[loc.slug for loc in new]).values_list(
+            "id", "city", "state", "country"
+        ):
+            self.locations[(city, state, country)] = pk
+        for key in missing:
+            if key not in self.locations:
+                city, state, country = key
+                self.locations[key] = Location.objects.get(city=city, state=state, country=country).pk
+
+    # ---- attractions ----
+    def build(self, rows):
+        keyed, unkeyed = {}, {}
+        for row in rows:
+            name = _text(row, "name", 100)
+            if not name:
+                continue
+            city, state, country = _text(row, "city", 100), _text(row, "state", 100), _text(row, "country", 100)
+            location_key = (city, state, country) if city and country else None
+            attraction = Attraction(
+                osm_id=_osm_id(row.get("osm_id")),
+                name=name,
+                latitude=_coord(row.get("latitude")),
+                longitude=_coord(row.get("longitude")),
+                address=_text(row, "address", 255),
+                description=_text(row, "description"),
+                # denormalized fields set here: bulk writes skip sync_location_fields
+                city=city, state=state, country=country,
+            )
+            attraction.location_key = location_key
+            # last row wins for duplicate keys within a batch (ON CONFLICT can't touch a row twice)
+            if attraction.osm_id is not None:
+                keyed[attraction.osm_id] = attraction
+            else:
+                unkeyed[(name, location_key)] = attraction
+        return list(keyed.values()), list(unkeyed.values())
+
+    def backfill_osm_ids(self, keyed):
+        """
+        Give catalogue attractions that predate osm_id (seeded, hand-made) the id of
+        the CSV row with the same name + location, so the upsert updates them
+        instead of inserting a duplicate.
+        """
+        taken = set(Attraction.objects.filter(osm_id__in=[a.osm_id for a in keyed]).values_list("osm_id", flat=True))
+        wanted = {(a.name, a.location_id): a.osm_id for a in keyed if a.osm_id not in taken and a.location_id}
+        if not wanted:
+            return
+        matches = []
+        for pk, name, location_id in Attraction.objects.filter(
+            day_plan__isnull=True, osm_id__isnull=True, name__in={name for name, _ in wanted},
+        ).order_by("id").values_list("id", "name", "location_id"):
+            osm_id = wanted.pop((name, location_id), None)
+            if osm_id is not None:
+                matches.append(Attraction(pk=pk, osm_id=osm_id))
+        if matches:
+            Attraction.objects.bulk_update(matches, ["osm_id"])
+
+    def upsert_keyed(self, keyed):
+        """ON CONFLICT (osm_id) upsert; returns [(id, day_plan_id)]."""
+        written = []
+        columns = ", ".join(connection.ops.quote_name(c) for c in INSERT_COLUMNS)
+        placeholder = "(" + ", ".join(["%s"] * len(INSERT_COLUMNS)) + ")"
+        with connection.cursor() as cursor:
+            for start in range(0, len(keyed), UPSERT_ROWS):
+                chunk = keyed[start:start + UPSERT_ROWS]
+                params = []
+                for a in chunk:
+                    params += [
+                        a.osm_id, a.name, a.latitude, a.longitude, a.address, a.description,
+                        a.city, a.state, a.country, a.location_id, 0, 0,
+                    ]
+                cursor.execute(
+                    UPSERT_SQL.format(columns=columns, values=", ".join([placeholder] * len(chunk))), params
+                )
+                written += cursor.fetchall()
+        return written
+
+    def upsert_unkeyed(self, unkeyed):
+        """No OSM id: match catalogue attractions (not copies inside day plans) on name + location."""
+        existing = {}
+        for pk, name, location_id in Attraction.objects.filter(
+            day_plan__isnull=True, osm_id__isnull=True,
+            name__in={a.name for a in unkeyed},
+        ).order_by("id").values_list("id", "name", "location_id"):
+            existing.setdefault((name, location_id), pk)
+        to_update, to_create = [], []
+        for attraction in unkeyed:
+            attraction.pk = existing.get((attraction.name, attraction.location_id))
+            (to_update if attraction.pk else to_create).append(attraction)
+
+        if to_update:
+            # blank CSV values keep the stored ones
+            current = Attraction.objects.in_bulk([a.pk for a in to_update])
+            for attraction in to_update:
+                for field in MERGE_FIELDS:
+                    if getattr(attraction, field) in (None, ""):
+                        setattr(attraction, field, getattr(current[attraction.pk], field))
+            Attraction.objects.bulk_update(to_update, ["name", *MERGE_FIELDS])
+        if to_create:
+            Attraction.objects.bulk_create(to_create)
+        return [(a.pk, None) for a in unkeyed]
+
+    def upsert(self, rows):
+        keyed, unkeyed = self.build(rows)
+        self.resolve_locations({a.location_key for a in keyed + unkeyed if a.location_key})
+        for attraction in keyed + unkeyed:
+            attraction.location_id = self.locations.get(attraction.location_key)
+
+        written = []
+        if keyed:
+            self.backfill_osm_ids(keyed)
+            written += self.upsert_keyed(keyed)
+        if unkeyed:
+            written += self.upsert_unkeyed(unkeyed)
+
+        ids = [pk for pk, _ in written if pk]
+        # attractions inside day plans are part of itinerary documents
+        queue_document_rebuild(day_plan_ids={day_plan_id for _, day_plan_id in written if day_plan_id})
+        if self.reindex and connection.vendor == "postgresql":
+            search_index.reindex(search_index.ATTRACTION, ids)
+        return len(ids)
+
+    # ---- progress ----
+    def read_progress(self, path, source):
+        try:
+            with open(path) as fh:
+                saved = json.load(fh)
+        except (OSError, ValueError):
+            return 0
+        if saved.get("source") != source["source"] or saved.get("size") != source["size"]:
+            self.stdout.write(self.style.WARNING(f"{path} is for another file; starting from the top"))
+            return 0
+        return saved["rows"]
+
+    def write_progress(self, path, source, rows):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump({**source, "rows": rows}, fh)
+        os.replace(tmp, path)  # never leaves a half-written progress file
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"{path} not found")
+        progress_path = options["resume_file"] or f"{path}.progress"
+        source = {"source": os.path.abspath(path), "size": os.path.getsize(path)}
+        skip = 0 if options["restart"] else self.read_progress(progress_path, source)
+        self.reindex = not options["skip_search_index"]
+        batch_size = options["batch"]
+
+        self.load_locations()
+        started = time.monotonic()
+        done = skip
+        written = 0
+        with open(path, newline="", encoding="utf-8") as fh:
+            reader = csv.DictReader(fh)
+            if skip:
+                self.stdout.write(self.style.NOTICE(f"Resuming after row {skip}"))
+                for _ in zip(range(skip), reader):
+                    pass
+
+            batch = []
+            for row in reader:
+                batch.append(row)
+                if len(batch) < batch_size:
+                    continue
+                with transaction.atomic():
+                    written += self.upsert(batch)
+                done += len(batch)
+                batch = []
+                self.write_progress(progress_path, source, done)
+                rate = (done - skip) / max(time.monotonic() - started, 1e-6) * 60
+                self.stdout.write(f"{done} rows read, {written} upserted ({rate:,.0f} rows/min)")
+            if batch:
+                with transaction.atomic():
+                    written += self.upsert(batch)
+                done += len(batch)
+                self.write_progress(progress_path, source, done)
+
+        # bulk writes skip the post_save signals that normally do this
+        nearby.invalidate("attraction")
+        if self.reindex:
+            autocomplete.schedule_refresh()
+        if os.path.exists(progress_path):
+            os.remove(progress_path)  # finished: the next run starts from the top
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Imported {written} attractions from {done - skip} rows in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from travel.models import Itinerary
+from travel.routing import optimize_itinerary
+
+
+class Command(BaseCommand):
+    help = "Compute (or refresh) the visiting order of every day plan, e.g. for itineraries created before routing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--itinerary", type=int, action="append", dest="itineraries", help="Only this itinerary id (repeatable)")
+
+    def handle(self, *args, **options):
+        ids = options["itineraries"] or Itinerary.objects.filter(days__isnull=False).distinct().order_by("id").values_list("id", flat=True)
+        itineraries = days = 0
+        for itinerary_id in ids:
+            days += optimize_itinerary(itinerary_id)
+            itineraries += 1
+        self.stdout.write(self.style.SUCCESS(f"Routes updated for {days} days across {itineraries} itineraries"))
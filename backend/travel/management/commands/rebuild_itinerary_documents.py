@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from travel.documents import rebuild_itinerary_document
+from travel.models import Itinerary
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized itinerary detail documents (all, or only missing ones)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--missing", action="store_true", help="Only itineraries without a document yet")
+
+    def handle(self, *args, **options):
+        qs = Itinerary.objects.order_by("id")
+        if options["missing"]:
+            qs = qs.filter(document__isnull=True)
+
+        count = 0
+        for itinerary_id in qs.values_list("id", flat=True).iterator():
+            rebuild_itinerary_document(itinerary_id)
+            count += 1
+            if count % 500 == 0:
+                self.stdout.write(f"... {count}")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} itinerary documents"))
@@ -0,0 +1,38 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from travel import autocomplete, search_index
+
+
+class Command(BaseCommand):
+    help = "Backfill / rebuild the search index (SearchDocument) from destinations, itineraries and attractions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type", choices=list(search_index.SOURCE_MODELS), action="append", dest="types",
+            help="Only this entity type (repeatable). Default: all",
+        )
+        parser.add_argument("--batch", type=int, default=1000, help="Rows per upsert statement")
+
+    def handle(self, *args, **options):
+        for entity_type in options["types"] or list(search_index.SOURCE_MODELS):
+            model = apps.get_model("travel", search_index.SOURCE_MODELS[entity_type])
+            ids = model.objects.order_by("id").values_list("id", flat=True)
+
+            written = 0
+            batch = []
+            for pk in ids.iterator(chunk_size=options["batch"]):
+                batch.append(pk)
+                if len(batch) >= options["batch"]:
+                    written += search_index.reindex(entity_type, batch)
+                    batch = []
+            written += search_index.reindex(entity_type, batch)
+
+            # rows whose source no longer exists (e.g. deleted while signals were off)
+            orphans = search_index.SearchDocument.objects.filter(entity_type=entity_type).exclude(
+                entity_id__in=model.objects.values("id")
+            ).delete()[0]
+            self.stdout.write(self.style.SUCCESS(f"{entity_type}: indexed {written}, removed {orphans} orphans"))
+
+        autocomplete.refresh()
+        self.stdout.write(self.style.SUCCESS("Autocomplete snapshot rebuilt"))
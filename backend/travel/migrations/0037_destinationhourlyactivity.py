@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0036_attraction_city_attraction_country_attraction_state_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DestinationHourlyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(db_index=True)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('dwell_seconds', models.PositiveBigIntegerField(default=0)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_activity', to='travel.destination')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('destination', 'bucket'), name='unique_destination_hour_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0037_destinationhourlyactivity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('pending_high_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InteractionRollupDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(blank=True, default='', max_length=100)),
+                ('action_type', models.CharField(choices=[('view', 'View'), ('dwell', 'Dwell'), ('click', 'Click')], max_length=10)),
+                ('bucket', models.DateTimeField()),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('dwell_total', models.PositiveBigIntegerField(default=0)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='travel.destination')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'destination'], name='travel_inte_user_id_969a9d_idx'), models.Index(fields=['session_id', 'destination'], name='travel_inte_session_809cf3_idx'), models.Index(fields=['bucket'], name='travel_inte_bucket_8c3b78_idx')],
+                'constraints': [models.UniqueConstraint(fields=('destination', 'user', 'session_id', 'action_type', 'bucket'), name='unique_interaction_rollup_daily', nulls_distinct=False)],
+            },
+        ),
+        migrations.CreateModel(
+            name='InteractionRollupHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(blank=True, default='', max_length=100)),
+                ('action_type', models.CharField(choices=[('view', 'View'), ('dwell', 'Dwell'), ('click', 'Click')], max_length=10)),
+                ('bucket', models.DateTimeField()),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('dwell_total', models.PositiveBigIntegerField(default=0)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='travel.destination')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'destination'], name='travel_inte_user_id_c328d7_idx'), models.Index(fields=['session_id', 'destination'], name='travel_inte_session_ed7ce5_idx'), models.Index(fields=['bucket'], name='travel_inte_bucket_4665a7_idx')],
+                'constraints': [models.UniqueConstraint(fields=('destination', 'user', 'session_id', 'action_type', 'bucket'), name='unique_interaction_rollup_hourly', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0038_interaction_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarItinerary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('itinerary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_entries', to='travel.itinerary')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='travel.itinerary')),
+            ],
+            options={
+                'ordering': ['itinerary', 'rank'],
+                'indexes': [models.Index(fields=['itinerary', 'rank'], name='travel_simi_itinera_96e5f5_idx'), models.Index(fields=['similar'], name='travel_simi_similar_899215_idx')],
+                'constraints': [models.UniqueConstraint(fields=('itinerary', 'similar'), name='unique_similar_itinerary_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0039_similaritinerary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['-trending_score', '-id'], name='travel_dest_trendin_ad2d14_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itinerary',
+            index=models.Index(fields=['-popularity_score', '-id'], name='travel_itin_popular_fe1a55_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0040_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItineraryDocument',
+            fields=[
+                ('itinerary', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='travel.itinerary')),
+                ('slug', models.SlugField(max_length=150, unique=True)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('document', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
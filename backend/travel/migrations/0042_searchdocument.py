@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:08
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0041_itinerarydocument'),
+    ]
+
+    operations = [
+        TrigramExtension(),  # gin_trgm_ops (no-op where pg_trgm already exists)
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(choices=[('destination', 'Destination'), ('itinerary', 'Itinerary'), ('attraction', 'Attraction')], max_length=20)),
+                ('entity_id', models.BigIntegerField()),
+                ('slug', models.CharField(blank=True, max_length=150)),
+                ('title', models.CharField(max_length=255)),
+                ('image', models.CharField(blank=True, max_length=255)),
+                ('search_text', models.TextField()),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+                ('popularity', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='search_document_vector'), django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='search_document_text_trgm', opclasses=['gin_trgm_ops']), models.Index(fields=['entity_type', '-popularity'], name='travel_sear_entity__e32888_idx')],
+                'constraints': [models.UniqueConstraint(fields=('entity_type', 'entity_id'), name='unique_search_document')],
+            },
+        ),
+    ]
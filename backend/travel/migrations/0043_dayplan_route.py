@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0042_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dayplan',
+            name='route',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0043_dayplan_route'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attraction',
+            name='osm_id',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+    ]
@@ -9,6 +9,7 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.conf import settings
 from cloudinary.models import CloudinaryField
 from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 class User(AbstractUser):
@@ -67,6 +68,11 @@ class Destination(models.Model):
 
     def __str__(self):
         return self.name
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-trending_score", "-id"]),  # keyset pages by trending
+        ]
     
 class DestinationImage(models.Model):
     destination = models.ForeignKey(
@@ -173,8 +179,81 @@ class Itinerary(models.Model):
         indexes = [
             models.Index(fields=["destination", "id"]),  # for dest itineraries
             models.Index(fields=["destination", "total_budget", "duration_days"]),
+            models.Index(fields=["-popularity_score", "-id"]),  # keyset pages by popularity
+        ]
+
+
+
+class ItineraryDocument(models.Model):
+    """
+    Materialized itinerary detail JSON (see documents.py), rebuilt on write.
+    `version` bumps on every rebuild and backs the detail ETag.
+    """
+    itinerary = models.OneToOneField(Itinerary, on_delete=models.CASCADE, primary_key=True, related_name="document")
+    slug = models.SlugField(max_length=150, unique=True)
+    version = models.PositiveIntegerField(default=1)
+    document = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.slug} v{self.version}"
+
+
+class SimilarItinerary(models.Model):
+    """
+    Precomputed top-K related itineraries (see similar_itineraries.py); read by rank.
+    """
+    itinerary = models.ForeignKey(Itinerary, on_delete=models.CASCADE, related_name="similar_entries")
+    similar = models.ForeignKey(Itinerary, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ["itinerary", "rank"]
+        constraints = [
+            models.UniqueConstraint(fields=["itinerary", "similar"], name="unique_similar_itinerary_pair"),
+        ]
+        indexes = [
+            models.Index(fields=["itinerary", "rank"]),
+            models.Index(fields=["similar"]),
         ]
 
+    def __str__(self):
+        return f"{self.itinerary_id} ~ {self.similar_id} ({self.score:.2f})"
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized search row per destination / public itinerary / attraction
+    (see search_index.py). One GIN-indexed ranked query serves every search endpoint.
+    """
+    class EntityTypes(models.TextChoices):
+        DESTINATION = "destination", "Destination"
+        ITINERARY = "itinerary", "Itinerary"
+        ATTRACTION = "attraction", "Attraction"
+
+    entity_type = models.CharField(max_length=20, choices=EntityTypes.choices)
+    entity_id = models.BigIntegerField()
+    slug = models.CharField(max_length=150, blank=True)
+    title = models.CharField(max_length=255)
+    image = models.CharField(max_length=255, blank=True)
+    search_text = models.TextField()  # title + place names, for trigram / ILIKE
+    search_vector = SearchVectorField(null=True)  # weighted: A title, B places, C description
+    popularity = models.FloatField(default=0)  # log-scaled prior, see search_index.py
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["entity_type", "entity_id"], name="unique_search_document"),
+        ]
+        indexes = [
+            GinIndex(name="search_document_vector", fields=["search_vector"]),
+            GinIndex(name="search_document_text_trgm", fields=["search_text"], opclasses=["gin_trgm_ops"]),
+            models.Index(fields=["entity_type", "-popularity"]),
+        ]
+
+    def __str__(self):
+        return f"{self.entity_type}:{self.entity_id} {self.title}"
 
 
 class DayPlan(models.Model):
@@ -183,6 +262,8 @@ class DayPlan(models.Model):
     title = models.CharField(max_length=100, help_text="E.g., Day 1: Arrival & Beach Visit")
     description = models.TextField()
     locations = models.TextField(blank=True, help_text="Comma-separated locations for the map")
+    # visiting order computed by routing.py after the itinerary is written
+    route = models.JSONField(blank=True, null=True, editable=False)
 
     class Meta:
         unique_together = ('itinerary', 'day_number')
@@ -278,6 +359,7 @@ class Attraction(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     google_place_id = models.CharField(max_length=255, blank=True, null=True)
+    osm_id = models.BigIntegerField(blank=True, null=True, unique=True)  # upsert key for import_attractions
     address = models.CharField(max_length=255, blank=True)
     categories = models.ManyToManyField("Category", blank=True, related_name="attractions")
     estimated_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
@@ -407,6 +489,92 @@ class DestinationView(models.Model):
         indexes = [
             models.Index(fields=["user", "destination", "action_type"]),
         ]
+
+
+class DestinationHourlyActivity(models.Model):
+    """
+    Per-destination counters for one hour, bumped as events are ingested.
+    Trending is a sum over the last 168 of these instead of a scan of DestinationView.
+    """
+    destination = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name="hourly_activity")
+    bucket = models.DateTimeField(db_index=True)  # start of the hour (UTC)
+    views = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+    dwell_seconds = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["destination", "bucket"], name="unique_destination_hour_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.destination_id} @ {self.bucket:%Y-%m-%d %H}:00"
+
+
+class InteractionRollup(models.Model):
+    """
+    DestinationView events compacted per (destination, user or session, action, bucket).
+    Authenticated rows keep session_id blank; anonymous rows have user NULL.
+    """
+    destination = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name="+")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    session_id = models.CharField(max_length=100, blank=True, default="")
+    action_type = models.CharField(max_length=10, choices=DestinationView.ACTION_CHOICES)
+    bucket = models.DateTimeField()
+    event_count = models.PositiveIntegerField(default=0)
+    dwell_total = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class InteractionRollupHourly(InteractionRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["destination", "user", "session_id", "action_type", "bucket"],
+                name="unique_interaction_rollup_hourly",
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "destination"]),
+            models.Index(fields=["session_id", "destination"]),
+            models.Index(fields=["bucket"]),
+        ]
+
+
+class InteractionRollupDaily(InteractionRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["destination", "user", "session_id", "action_type", "bucket"],
+                name="unique_interaction_rollup_daily",
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "destination"]),
+            models.Index(fields=["session_id", "destination"]),
+            models.Index(fields=["bucket"]),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """
+    Progress of a compaction job over an append-only table.
+    Rows with id <= last_id are rolled up. pending_high_id is the max id seen on the
+    previous run; it becomes the next upper bound so in-flight inserts are never skipped.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    pending_high_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
 class Rating(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     rating = models.PositiveSmallIntegerField()
@@ -0,0 +1,142 @@
+"""
+Nearest-neighbour lookups for attractions, restaurants and experiences.
+
+Each worker keeps a haversine BallTree (scikit-learn) per table over the rows
+that have coordinates, held in the L1 cache. A query is a radius search on the
+tree plus one `id = ANY(...)` fetch for the hits, so it never scans the table.
+Experiences have no coordinates of their own and are placed at their attraction.
+Writes drop the tree through the L1 invalidation channel (signals.py); it is
+rebuilt lazily on the next query, and NEARBY_INDEX_TTL bounds staleness for bulk
+writes that skip signals.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from sklearn.neighbors import BallTree
+
+from . import local_cache
+from .models import Attraction, Restaurant
+
+EARTH_RADIUS_KM = 6371.0088
+TREE_MODELS = {"attraction": Attraction, "restaurant": Restaurant}
+
+_trees = local_cache.local_cache("nearby", maxsize=len(TREE_MODELS), ttl=settings.NEARBY_INDEX_TTL)
+
+
+def _build(entity):
+    rows = list(
+        TREE_MODELS[entity].objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list("id", "latitude", "longitude")
+    )
+    if not rows:
+        return None
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    coords = np.radians(np.array([(float(row[1]), float(row[2])) for row in rows]))
+    return ids, BallTree(coords, metric="haversine")
+
+
+def _tree(entity):
+    return _trees.get(entity, lambda: _build(entity))
+
+
+def invalidate(entity):
+    local_cache.invalidate("nearby", entity)
+
+
+def nearest_ids(entity, lat, lng, radius_km, k):
+    """[(id, distance_km)] of the k nearest rows within radius_km, closest first."""
+    built = _tree(entity)
+    if built is None:
+        return []
+    ids, tree = built
+    point = np.radians([[lat, lng]])
+    indices, distances = tree.query_radius(
+        point, r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+    )
+    return [
+        (int(ids[i]), round(float(d) * EARTH_RADIUS_KM, 3))
+        for i, d in zip(indices[0][:k], distances[0][:k])
+    ]
+
+
+def _fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        cols = [c[0] for c in cursor.description]
+        return [dict(zip(cols, row)) for row in cursor.fetchall()]
+
+
+def _image_sql(column):
+    return f"""
+        CASE
+            WHEN {column} IS NULL OR {column} = '' THEN NULL
+            WHEN {column} LIKE 'http%%' THEN {column}
+            ELSE %s || {column}
+        END AS image
+    """
+
+
+def _with_distance(rows, hits, key="id"):
+    distance = dict(hits)
+    for row in rows:
+        row["distance_km"] = distance[row[key]]
+    return sorted(rows, key=lambda row: (row["distance_km"], row["id"]))
+
+
+def day_plan_center(day_plan_id):
+    """Centroid of a day plan's located attractions/restaurants, or None."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT AVG(latitude), AVG(longitude) FROM (
+                SELECT latitude, longitude FROM travel_attraction WHERE day_plan_id = %s
+                UNION ALL
+                SELECT latitude, longitude FROM travel_restaurant WHERE day_plan_id = %s
+            ) points
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+            """,
+            [day_plan_id, day_plan_id],
+        )
+        lat, lng = cursor.fetchone()
+    return None if lat is None else (float(lat), float(lng))
+
+
+def nearby(lat, lng, radius_km, k, types, image_prefix):
+    """{"attractions": [...], "restaurants": [...], "experiences": [...]} within radius_km."""
+    data = {}
+    attraction_hits = []
+    if "attraction" in types or "experience" in types:
+        # experiences live at attractions: look a bit wider so k experiences can be filled
+        attraction_hits = nearest_ids("attraction", lat, lng, radius_km, k * 3 if "experience" in types else k)
+
+    if "attraction" in types:
+        hits = attraction_hits[:k]
+        data["attractions"] = _with_distance(_fetch(
+            f"""
+            SELECT id, name, {_image_sql("image")}, latitude::float, longitude::float, address, city
+            FROM travel_attraction WHERE id = ANY(%s)
+            """,
+            [image_prefix, [i for i, _ in hits]],
+        ), hits) if hits else []
+
+    if "restaurant" in types:
+        hits = nearest_ids("restaurant", lat, lng, radius_km, k)
+        data["restaurants"] = _with_distance(_fetch(
+            f"""
+            SELECT id, name, cuisine, {_image_sql("image")}, latitude::float, longitude::float, address,
+                   estimated_cost::float
+            FROM travel_restaurant WHERE id = ANY(%s)
+            """,
+            [image_prefix, [i for i, _ in hits]],
+        ), hits) if hits else []
+
+    if "experience" in types:
+        rows = _fetch(
+            f"""
+            SELECT id, name, {_image_sql("image")}, attraction_id, address, estimated_cost::float
+            FROM travel_experience WHERE attraction_id = ANY(%s)
+            """,
+            [image_prefix, [i for i, _ in attraction_hits]],
+        ) if attraction_hits else []
+        data["experiences"] = _with_distance(rows, attraction_hits, key="attraction_id")[:k]
+    return data
@@ -0,0 +1,147 @@
+"""
+HTTP plumbing for fetch_attractions_csv: a persistent response cache and
+per-host rate limits, so enrichment can run on a thread pool and reruns are
+served from disk.
+
+* ResponseCache - SQLite file keyed by method + URL + params/body. 200s and
+  404s are stored (a missing Wikipedia page is an answer too); errors and
+  5xx/429 are not, so a rerun retries them.
+* RateLimiter - spaces requests to one host at least 1/rate apart across all
+  threads (Nominatim's usage policy is 1 request/second).
+* Fetcher - requests.Session + both of the above; cache hits never wait on a
+  limiter. Base URLs are the caller's, so the whole thing can be pointed at a
+  local stub server.
+"""
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+import orjson
+import requests
+
+USER_AGENT = "travista-bot"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CACHEABLE_STATUSES = {200, 404}
+
+
+class ResponseCache:
+    def __init__(self, path, max_age=None):
+        self.max_age = max_age  # seconds; None = entries never expire
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, status INTEGER NOT NULL, body BLOB, fetched_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(method, url, params=None, data=None):
+        query = urlencode(sorted((params or {}).items()))
+        body = urlencode(sorted((data or {}).items()))
+        return f"{method} {url}?{query}#{body}"
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT status, body, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.max_age is not None and time.time() - row[2] > self.max_age):
+            return None
+        return row[0], row[1]
+
+    def set(self, key, status, body):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, status, body, fetched_at) VALUES (?, ?, ?, ?)",
+                (key, status, body, time.time()),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RateLimiter:
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Fetcher:
+    def __init__(self, cache, rates, default_rate=5.0, retries=3, timeout=30):
+        # rates: {host: requests per second}
+        self.cache = cache
+        self.limiters = {host: RateLimiter(rate) for host, rate in rates.items()}
+        self.default_rate = default_rate
+        self.retries = retries
+        self.timeout = timeout
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self):
+        # requests.Session isn't thread-safe; one per worker thread
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+            self._local.session.headers["User-Agent"] = USER_AGENT
+        return self._local.session
+
+    def _limiter(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self.limiters:
+                self.limiters[host] = RateLimiter(self.default_rate)
+            return self.limiters[host]
+
+    def request_json(self, method, url, params=None, data=None, refresh=False):
+        """Parsed JSON body of a 200, or None (404, error, unparseable)."""
+        key = ResponseCache.key(method, url, params, data)
+        cached = None if refresh else self.cache.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            status, body = cached
+        else:
+            with self._lock:
+                self.misses += 1
+            status, body = self._fetch(method, url, params, data)
+            if status in CACHEABLE_STATUSES:
+                self.cache.set(key, status, body)
+        if status != 200 or not body:
+            return None
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return None
+
+    def get_json(self, url, params=None):
+        return self.request_json("GET", url, params=params)
+
+    def _fetch(self, method, url, params, data):
+        limiter = self._limiter(url)
+        for attempt in range(self.retries + 1):
+            limiter.wait()
+            try:
+                r = self._session().request(method, url, params=params, data=data, timeout=self.timeout)
+            except requests.RequestException:
+                status, body, retry_after = None, None, None
+            else:
+                status, body = r.status_code, r.content
+                retry_after = r.headers.get("Retry-After")
+                if status not in RETRY_STATUSES:
+                    return status, body
+            if attempt < self.retries:
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+                time.sleep(delay)
+        return status, body
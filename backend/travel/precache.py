@@ -0,0 +1,50 @@
+"""
+Demand tracking for precache jobs.
+
+Views record each request path in a Redis sorted set (score = hits). The nightly
+precache warms only the hottest paths, and `decay_demand` halves every score
+afterwards so yesterday's traffic fades and cold paths drop out entirely.
+"""
+import redis
+
+from .cache_serializer import CompressedRedisSerializer
+from .cache_utils import get_redis
+
+CATEGORY_DEMAND_KEY = "precache:demand:category"
+
+
+def record_demand(key, path):
+    try:
+        get_redis().zincrby(key, 1, path)
+    except redis.RedisError:
+        pass  # demand stats are best effort, never fail the request
+
+
+def hot_paths(key, limit):
+    # [(path, hits)] hottest first
+    return [
+        (path.decode() if isinstance(path, bytes) else path, hits)
+        for path, hits in get_redis().zrevrange(key, 0, limit - 1, withscores=True)
+    ]
+
+
+def forget(key, path):
+    get_redis().zrem(key, path)
+
+
+def decay_demand(key, factor=0.5, min_score=1):
+    """
+    Multiply all hit counts by `factor` and drop paths that fall below `min_score`.
+    Returns how many paths were dropped.
+    """
+    client = get_redis()
+    client.zunionstore(key, {key: factor})
+    return client.zremrangebyscore(key, "-inf", f"({min_score}")
+
+
+def entry_size(value):
+    # bytes the cache backend will actually store (pickled, compressed if large)
+    return len(_serializer.encode(value)[2])
+
+
+_serializer = CompressedRedisSerializer()
@@ -0,0 +1,217 @@
+"""
+Item-item collaborative filtering for destinations.
+
+`build_item_similarity` (offline, Celery) turns interaction rollups and ratings into a
+sparse owner x destination matrix, computes cosine similarity between destination
+columns and keeps the top ITEM_NEIGHBOURS per destination as three flat arrays
+(CSR style) in the cache. Serving (`recommend_destination_ids`) is a handful of
+array slices over the user's own destinations.
+"""
+import time
+
+import numpy as np
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from .models import (Attraction, DayPlan, DestinationView, InteractionRollupDaily, InteractionRollupHourly,
+                     Itinerary, Rating)
+from .rollups import destination_signals
+from .serializers import DestinationRecommendationSerializer
+from .utils import (CLICK_WEIGHT, DWELL_WEIGHT, VIEW_WEIGHT, compute_recommended_destinations,
+                    signal_vector, top_ids)
+
+ITEM_NEIGHBOURS = 30
+MODEL_KEY = "recommendations:item_similarity"
+MODEL_VERSION_KEY = "recommendations:item_similarity:version"
+MODEL_CHECK_INTERVAL = 60  # seconds between version checks per process
+RATING_WEIGHT = 1.0  # per star above 2 (1-2 star ratings are not a positive signal)
+SELF_WEIGHT = 0.5  # how much a user's own destinations count against their neighbours
+
+_model = {"checked": 0.0, "version": None, "data": None}
+
+
+def _rating_rows(user_id=None):
+    """
+    (user_id, destination_id, rating) for ratings on itineraries and on attractions
+    that belong to an itinerary day.
+    """
+    itinerary_ct = ContentType.objects.get_for_model(Itinerary, for_concrete_model=False).id
+    attraction_ct = ContentType.objects.get_for_model(Attraction, for_concrete_model=False).id
+    user_sql = " AND r.user_id = %s" if user_id else ""
+    user_params = [user_id] if user_id else []
+
+    sql = f"""
+        SELECT r.user_id, i.destination_id, r.rating
+        FROM {Rating._meta.db_table} r
+        JOIN {Itinerary._meta.db_table} i ON i.id = r.object_id
+        WHERE r.content_type_id = %s{user_sql}
+        UNION ALL
+        SELECT r.user_id, i.destination_id, r.rating
+        FROM {Rating._meta.db_table} r
+        JOIN {Attraction._meta.db_table} a ON a.id = r.object_id
+        JOIN {DayPlan._meta.db_table} dp ON dp.id = a.day_plan_id
+        JOIN {Itinerary._meta.db_table} i ON i.id = dp.itinerary_id
+        WHERE r.content_type_id = %s{user_sql}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [itinerary_ct] + user_params + [attraction_ct] + user_params)
+        return cursor.fetchall()
+
+
+def _interaction_rows():
+    # (user_id, session_id, destination_id, action_type, count, dwell_total) over both rollups
+    sql = f"""
+        SELECT user_id, session_id, destination_id, action_type, SUM(event_count), SUM(dwell_total)
+        FROM (
+            SELECT user_id, session_id, destination_id, action_type, event_count, dwell_total
+            FROM {InteractionRollupHourly._meta.db_table}
+            UNION ALL
+            SELECT user_id, session_id, destination_id, action_type, event_count, dwell_total
+            FROM {InteractionRollupDaily._meta.db_table}
+        ) s
+        GROUP BY 1, 2, 3, 4
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchall()
+
+
+def _preference_matrix():
+    """
+    Sparse owner x destination matrix of implicit preference (same weights as the
+    heuristic scorer, plus ratings), log-damped so heavy users don't dominate.
+    """
+    owners, dests, prefs = {}, {}, {}
+
+    def add(owner, dest_id, value):
+        o = owners.setdefault(owner, len(owners))
+        d = dests.setdefault(dest_id, len(dests))
+        prefs[(o, d)] = prefs.get((o, d), 0.0) + value
+
+    for user_id, session_id, dest_id, action_type, count, dwell in _interaction_rows():
+        owner = ("u", user_id) if user_id else ("s", session_id)
+        if action_type == DestinationView.VIEW:
+            add(owner, dest_id, VIEW_WEIGHT * count)
+        elif action_type == DestinationView.CLICK:
+            add(owner, dest_id, CLICK_WEIGHT * count)
+        elif action_type == DestinationView.DWELL and count:
+            add(owner, dest_id, DWELL_WEIGHT * float(dwell) / count)
+
+    for user_id, dest_id, rating in _rating_rows():
+        if rating > 2:
+            add(("u", user_id), dest_id, RATING_WEIGHT * (rating - 2))
+
+    if not prefs:
+        return None, None
+    (rows, cols), values = zip(*prefs.keys()), np.log1p(np.fromiter(prefs.values(), dtype=np.float64))
+    matrix = sparse.csr_matrix((values, (rows, cols)), shape=(len(owners), len(dests)))
+    # owners with a single destination carry no co-occurrence
+    matrix = matrix[matrix.getnnz(axis=1) > 1]
+    dest_ids = np.empty(len(dests), dtype=np.int64)
+    for dest_id, idx in dests.items():
+        dest_ids[idx] = dest_id
+    return matrix, dest_ids
+
+
+def build_item_similarity(neighbours=ITEM_NEIGHBOURS):
+    """
+    Rebuild the truncated destination similarity model and publish it to the cache.
+    Returns the number of destinations with at least one neighbour.
+    """
+    matrix, dest_ids = _preference_matrix()
+    if matrix is None or not matrix.shape[0]:
+        return 0
+
+    # sort columns by destination id so serving can searchsorted into them
+    order = np.argsort(dest_ids)
+    dest_ids = dest_ids[order]
+    matrix = normalize(matrix.tocsc()[:, order], axis=0)
+
+    similarity = (matrix.T @ matrix).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    indptr = np.zeros(len(dest_ids) + 1, dtype=np.int32)
+    neighbour_idx, neighbour_scores = [], []
+    for row in range(len(dest_ids)):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        cols, vals = similarity.indices[start:end], similarity.data[start:end]
+        if len(vals) > neighbours:
+            keep = np.argpartition(-vals, neighbours - 1)[:neighbours]
+            cols, vals = cols[keep], vals[keep]
+        neighbour_idx.append(cols.astype(np.int32))
+        neighbour_scores.append(vals.astype(np.float32))
+        indptr[row + 1] = indptr[row] + len(cols)
+
+    model = {
+        "dest_ids": dest_ids,
+        "indptr": indptr,
+        "neighbours": np.concatenate(neighbour_idx) if neighbour_idx else np.array([], dtype=np.int32),
+        "scores": np.concatenate(neighbour_scores) if neighbour_scores else np.array([], dtype=np.float32),
+    }
+    cache.set(MODEL_KEY, model, timeout=None)
+    cache.set(MODEL_VERSION_KEY, time.time(), timeout=None)
+    return int((np.diff(indptr) > 0).sum())
+
+
+def load_item_similarity():
+    # per-process copy, re-fetched only when the published version changes
+    now = time.monotonic()
+    if now - _model["checked"] > MODEL_CHECK_INTERVAL:
+        _model["checked"] = now
+        version = cache.get(MODEL_VERSION_KEY)
+        if version != _model["version"]:
+            _model["data"] = cache.get(MODEL_KEY)
+            _model["version"] = version
+    return _model["data"]
+
+
+def recommend_destination_ids(user, limit=None):
+    """
+    Destination ids for `user`, best first: their own destinations (weighted by
+    signals and ratings) spread to similar destinations. [] on cold start.
+    """
+    model = load_item_similarity()
+    if model is None:
+        return []
+
+    dest_ids = model["dest_ids"]
+    signals = destination_signals(user=user)
+    own = signal_vector(signals, dest_ids)
+    for _, dest_id, rating in _rating_rows(user_id=user.id):
+        pos = np.searchsorted(dest_ids, dest_id)
+        if rating > 2 and pos < len(dest_ids) and dest_ids[pos] == dest_id:
+            own[pos] += RATING_WEIGHT * (rating - 2)
+    if not own.any():
+        return []
+    own = np.log1p(own)
+    own /= own.max()
+
+    indptr, neighbours, sims = model["indptr"], model["neighbours"], model["scores"]
+    scores = SELF_WEIGHT * own
+    for pos in np.flatnonzero(own):
+        start, end = indptr[pos], indptr[pos + 1]
+        scores[neighbours[start:end]] += own[pos] * sims[start:end]
+
+    candidates = np.flatnonzero(scores)
+    return top_ids(dest_ids[candidates], scores[candidates], limit)
+
+
+def personalized_destination_data(user):
+    """
+    Serialized destinations for `user`: CF-ranked ones first, then the rest in
+    global order. Reuses the cached global payload, so a warm cache means no DB reads
+    beyond the user's own signals.
+    """
+    base = cache.get("recommendations:global:destinations")
+    if base is None:
+        base = DestinationRecommendationSerializer(compute_recommended_destinations(), many=True).data
+
+    ranked = recommend_destination_ids(user)
+    if not ranked:
+        return list(base)
+    position = {dest_id: i for i, dest_id in enumerate(ranked)}
+    return sorted(base, key=lambda d: position.get(d["id"], len(position)))
@@ -0,0 +1,49 @@
+"""
+Pre-rendered response caching.
+
+Caching dicts means every hit pays unpickle -> dict -> ORJSONRenderer again, which
+dominates for big payloads (all_destinations, itinerary detail trees). Here the
+final JSON bytes are cached instead (gzipped above RENDERED_CACHE_GZIP_MIN_BYTES)
+and a hit is returned as a plain HttpResponse, skipping DRF rendering entirely.
+"""
+import gzip
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework_orjson.renderers import ORJSONRenderer
+
+from .cache_utils import cache_set
+
+_renderer = ORJSONRenderer()
+
+
+def render_blob(data, **extra):
+    # same bytes DRF would have sent; compressed once here instead of per request
+    body = _renderer.render(data)
+    min_bytes = settings.RENDERED_CACHE_GZIP_MIN_BYTES
+    if min_bytes is not None and len(body) >= min_bytes:
+        return {"body": gzip.compress(body, compresslevel=6), "gzip": True, **extra}
+    return {"body": body, "gzip": False, **extra}
+
+
+def cache_rendered(key, data, timeout, tags=(), **extra):
+    """
+    Render `data`, cache the bytes under `key` (with tags) and return the blob
+    for `rendered_response`. `extra` is stored alongside (e.g. the etag it was
+    rendered for).
+    """
+    blob = render_blob(data, **extra)
+    cache_set(key, blob, timeout=timeout, tags=tags)
+    return blob
+
+
+def rendered_response(request, blob, status=200):
+    if blob["gzip"]:
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            response = HttpResponse(blob["body"], content_type="application/json", status=status)
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(gzip.decompress(blob["body"]), content_type="application/json", status=status)
+        response["Vary"] = "Accept-Encoding"
+        return response
+    return HttpResponse(blob["body"], content_type="application/json", status=status)
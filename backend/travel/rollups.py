@@ -0,0 +1,165 @@
+"""
+Rollups of DestinationView for the recommendation reads.
+
+`rollup_interactions` (Celery, every few minutes) compacts new raw rows into
+InteractionRollupHourly, folds hourly rows older than
+INTERACTION_HOURLY_RETENTION_DAYS into InteractionRollupDaily, and prunes raw rows
+older than INTERACTION_RAW_RETENTION_DAYS that are already rolled up.
+`destination_signals` reads rollups plus the small not-yet-rolled-up raw tail, so
+its cost tracks the number of (destination, action, bucket) groups, not raw history.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import DestinationView, InteractionRollupHourly, InteractionRollupDaily, RollupWatermark
+
+WATERMARK_NAME = "destination_views"
+PRUNE_CHUNK = 10000
+
+RAW_TABLE = DestinationView._meta.db_table
+HOURLY_TABLE = InteractionRollupHourly._meta.db_table
+DAILY_TABLE = InteractionRollupDaily._meta.db_table
+
+_UPSERT_SET = """
+    event_count = {table}.event_count + EXCLUDED.event_count,
+    dwell_total = {table}.dwell_total + EXCLUDED.dwell_total
+"""
+
+
+def _roll_raw_into_hourly(cursor, low_id, high_id):
+    cursor.execute(
+        f"""
+        INSERT INTO {HOURLY_TABLE}
+            (destination_id, user_id, session_id, action_type, bucket, event_count, dwell_total)
+        SELECT destination_id,
+               user_id,
+               CASE WHEN user_id IS NULL THEN COALESCE(session_id, '') ELSE '' END,
+               action_type,
+               date_trunc('hour', created_at),
+               COUNT(*),
+               COALESCE(SUM(dwell_time), 0)
+        FROM {RAW_TABLE}
+        WHERE id > %s AND id <= %s
+        GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT ON CONSTRAINT unique_interaction_rollup_hourly DO UPDATE SET
+        """ + _UPSERT_SET.format(table=HOURLY_TABLE),
+        [low_id, high_id],
+    )
+
+
+def _roll_hourly_into_daily(cursor, cutoff):
+    cursor.execute(
+        f"""
+        INSERT INTO {DAILY_TABLE}
+            (destination_id, user_id, session_id, action_type, bucket, event_count, dwell_total)
+        SELECT destination_id, user_id, session_id, action_type,
+               date_trunc('day', bucket), SUM(event_count), SUM(dwell_total)
+        FROM {HOURLY_TABLE}
+        WHERE bucket < %s
+        GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT ON CONSTRAINT unique_interaction_rollup_daily DO UPDATE SET
+        """ + _UPSERT_SET.format(table=DAILY_TABLE),
+        [cutoff],
+    )
+    cursor.execute(f"DELETE FROM {HOURLY_TABLE} WHERE bucket < %s", [cutoff])
+
+
+def _prune_raw(cutoff, rolled_up_id):
+    # small chunks so the delete never holds long locks on the hot insert table
+    deleted = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                DELETE FROM {RAW_TABLE} WHERE id IN (
+                    SELECT id FROM {RAW_TABLE}
+                    WHERE created_at < %s AND id <= %s
+                    LIMIT %s
+                )
+                """,
+                [cutoff, rolled_up_id, PRUNE_CHUNK],
+            )
+            deleted += cursor.rowcount
+            if cursor.rowcount < PRUNE_CHUNK:
+                return deleted
+
+
+def rollup_interactions():
+    """
+    One compaction pass. Safe to run concurrently (the watermark row is locked).
+    Returns (hourly groups upserted, raw rows pruned).
+    """
+    today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    hourly_cutoff = today - timedelta(days=settings.INTERACTION_HOURLY_RETENTION_DAYS)
+
+    with transaction.atomic():
+        RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+        mark = RollupWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+
+        low_id, high_id = mark.last_id, mark.pending_high_id
+        rolled = 0
+        with connection.cursor() as cursor:
+            if high_id > low_id:
+                _roll_raw_into_hourly(cursor, low_id, high_id)
+                rolled = cursor.rowcount
+            _roll_hourly_into_daily(cursor, hourly_cutoff)
+
+        mark.last_id = max(low_id, high_id)
+        mark.pending_high_id = max(
+            mark.last_id,
+            DestinationView.objects.order_by("-id").values_list("id", flat=True).first() or 0,
+        )
+        mark.save(update_fields=["last_id", "pending_high_id", "updated_at"])
+
+    pruned = 0
+    if settings.INTERACTION_RAW_RETENTION_DAYS is not None:
+        raw_cutoff = timezone.now() - timedelta(days=settings.INTERACTION_RAW_RETENTION_DAYS)
+        pruned = _prune_raw(raw_cutoff, mark.last_id)
+    return rolled, pruned
+
+
+def destination_signals(user=None, session_id=None):
+    """
+    {destination_id: {"views", "dwell", "clicks"}} for a user (or anonymous session),
+    with dwell as the average dwell time, same as the old raw-table aggregate.
+    """
+    if user is not None:
+        owner_sql, owner_params = "user_id = %s", [user.id]
+    elif session_id:
+        owner_sql, owner_params = "user_id IS NULL AND session_id = %s", [session_id]
+    else:
+        return {}
+
+    rolled_up_id = RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list("last_id", flat=True).first() or 0
+
+    sql = f"""
+        SELECT destination_id, action_type, SUM(n), SUM(dwell)
+        FROM (
+            SELECT destination_id, action_type, event_count AS n, dwell_total AS dwell
+            FROM {HOURLY_TABLE} WHERE {owner_sql}
+            UNION ALL
+            SELECT destination_id, action_type, event_count, dwell_total
+            FROM {DAILY_TABLE} WHERE {owner_sql}
+            UNION ALL
+            SELECT destination_id, action_type, 1, dwell_time
+            FROM {RAW_TABLE} WHERE id > %s AND {owner_sql}
+        ) s
+        GROUP BY destination_id, action_type
+    """
+    params = owner_params + owner_params + [rolled_up_id] + owner_params
+
+    signals = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for dest_id, action_type, count, dwell in cursor.fetchall():
+            s = signals.setdefault(dest_id, {"views": 0, "dwell": 0, "clicks": 0})
+            if action_type == DestinationView.VIEW:
+                s["views"] = count
+            elif action_type == DestinationView.CLICK:
+                s["clicks"] = count
+            elif action_type == DestinationView.DWELL and count:
+                s["dwell"] = float(dwell) / count
+    return signals
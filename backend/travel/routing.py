@@ -0,0 +1,257 @@
+"""
+Visiting order for a day plan's stops.
+
+Attractions and restaurants with coordinates are ordered by nearest-neighbour
+construction followed by 2-opt on a haversine distance matrix. Attraction
+opening windows (start_time / end_time) and the day's own window (DayBudget)
+are honoured: a stop reached early waits until it opens, and finishing after it
+closes costs lateness, which is minimised before distance. Experiences follow
+the attraction they belong to; stops that can't be placed are listed apart.
+
+Routes are stored on DayPlan.route (so they ride along in the itinerary
+document) and recomputed by a task after the itinerary is written.
+"""
+import hashlib
+from datetime import time
+
+import numpy as np
+import orjson
+from django.conf import settings
+from django.db import transaction
+
+from .documents import rebuild_itinerary_document
+from .models import Attraction, DayBudget, DayPlan, Experience, Restaurant
+from .nearby import EARTH_RADIUS_KM
+
+MULTI_START_LIMIT = 12  # up to this many stops every stop is tried as the first one
+MAX_2OPT_PASSES = 50
+
+
+def _minutes(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = time.fromisoformat(value)
+    return value.hour * 60 + value.minute
+
+
+def _clock(minutes):
+    minutes = int(round(minutes))
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+def distance_matrix(points):
+    """Pairwise great-circle distances in km for [(lat, lng), ...]."""
+    coords = np.radians(np.asarray(points, dtype=float))
+    lat, lng = coords[:, 0], coords[:, 1]
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class _Schedule:
+    def __init__(self, dist, minutes, opens, closes, day_start, speed_kmh):
+        self.dist = dist
+        self.travel = dist / speed_kmh * 60  # minutes
+        self.minutes = minutes
+        self.opens = opens
+        self.closes = closes
+        self.day_start = day_start
+
+    def run(self, order):
+        """(lateness minutes, km, arrival per stop) when visiting in `order`."""
+        t, late, km, arrivals = self.day_start, 0.0, 0.0, []
+        prev = None
+        for i in order:
+            if prev is not None:
+                t += self.travel[prev, i]
+                km += self.dist[prev, i]
+            if self.opens[i] is not None and t < self.opens[i]:
+                t = self.opens[i]  # wait for it to open
+            arrivals.append(t)
+            t += self.minutes[i]
+            if self.closes[i] is not None and t > self.closes[i]:
+                late += t - self.closes[i]
+            prev = i
+        return late, km, arrivals
+
+    def cost(self, order):
+        late, km, _ = self.run(order)
+        return round(late, 3), km
+
+    def nearest_neighbour(self, start):
+        order = [start]
+        remaining = set(range(len(self.minutes))) - {start}
+        t = max(self.day_start, self.opens[start] or 0) + self.minutes[start]
+        while remaining:
+            here = order[-1]
+
+            def key(j):
+                arrive = max(t + self.travel[here, j], self.opens[j] or 0)
+                misses = self.closes[j] is not None and arrive + self.minutes[j] > self.closes[j]
+                return misses, self.dist[here, j], j
+
+            nxt = min(remaining, key=key)
+            t = max(t + self.travel[here, nxt], self.opens[nxt] or 0) + self.minutes[nxt]
+            order.append(nxt)
+            remaining.remove(nxt)
+        return order
+
+    def two_opt(self, order):
+        best = self.cost(order)
+        for _ in range(MAX_2OPT_PASSES):
+            improved = False
+            for i in range(len(order) - 1):
+                for j in range(i + 2, len(order) + 1):
+                    candidate = order[:i] + order[i:j][::-1] + order[j:]
+                    cost = self.cost(candidate)
+                    if cost < best:
+                        order, best, improved = candidate, cost, True
+            if not improved:
+                break
+        return order, best
+
+
+def optimize_order(schedule):
+    """Visiting order (stop indexes) for a _Schedule: best of the 2-opt'd nearest-neighbour tours."""
+    n = len(schedule.minutes)
+    if n <= 1:
+        return list(range(n))
+    if n <= MULTI_START_LIMIT:
+        starts = range(n)
+    else:
+        # earliest opening first, else the first stop the author listed
+        starts = [min(range(n), key=lambda i: (schedule.opens[i] is None, schedule.opens[i] or 0, i))]
+
+    best_order, best_cost = None, None
+    for start in starts:
+        order, cost = schedule.two_opt(schedule.nearest_neighbour(start))
+        if best_cost is None or cost < best_cost:
+            best_order, best_cost = order, cost
+    return best_order
+
+
+def _day_stops(day_plan_ids):
+    stops = {day_id: [] for day_id in day_plan_ids}
+    for row in Attraction.objects.filter(day_plan_id__in=day_plan_ids).order_by("id").values(
+        "id", "day_plan_id", "name", "latitude", "longitude", "duration_minutes", "start_time", "end_time"
+    ):
+        stops[row["day_plan_id"]].append({"type": "attraction", **row})
+    for row in Restaurant.objects.filter(day_plan_id__in=day_plan_ids).order_by("id").values(
+        "id", "day_plan_id", "name", "latitude", "longitude"
+    ):
+        stops[row["day_plan_id"]].append({
+            "type": "restaurant", **row,
+            "duration_minutes": settings.ROUTE_MEAL_MINUTES, "start_time": None, "end_time": None,
+        })
+    return stops
+
+
+def build_route(stops, experiences, day_window=(None, None)):
+    """
+    Route payload for one day: {"stops": [...], "unplaced": [...], "total_km",
+    "late_minutes"}. `experiences` are (id, name, attraction_id) rows.
+    """
+    day_start = _minutes(day_window[0]) if day_window[0] else _minutes(settings.ROUTE_DAY_START)
+    day_end = _minutes(day_window[1])
+    located, unplaced = [], []
+    for stop in stops:
+        if stop["latitude"] is not None and stop["longitude"] is not None:
+            located.append(stop)
+        else:
+            unplaced.append({"type": stop["type"], "id": stop["id"], "name": stop["name"]})
+
+    if located:
+        schedule = _Schedule(
+            distance_matrix([(float(s["latitude"]), float(s["longitude"])) for s in located]),
+            [s["duration_minutes"] or 0 for s in located],
+            [_minutes(s["start_time"]) for s in located],
+            [_minutes(s["end_time"]) if s["end_time"] else day_end for s in located],
+            day_start,
+            settings.ROUTE_SPEED_KMH,
+        )
+        order = optimize_order(schedule)
+        late, km, arrivals = schedule.run(order)
+    else:
+        order, late, km, arrivals = [], 0.0, 0.0, []
+
+    at_attraction = {}
+    for exp_id, name, attraction_id in experiences:
+        at_attraction.setdefault(attraction_id, []).append({"type": "experience", "id": exp_id, "name": name})
+    placed_attractions = {located[i]["id"] for i in order if located[i]["type"] == "attraction"}
+
+    result, prev = [], None
+    for i, arrival in zip(order, arrivals):
+        stop = located[i]
+        result.append({
+            "type": stop["type"], "id": stop["id"], "name": stop["name"],
+            "leg_km": 0.0 if prev is None else round(float(schedule.dist[prev, i]), 2),
+            "arrival": _clock(arrival),
+            "departure": _clock(arrival + (stop["duration_minutes"] or 0)),
+        })
+        if stop["type"] == "attraction":
+            result.extend(at_attraction.get(stop["id"], []))
+        prev = i
+    for attraction_id, items in at_attraction.items():
+        if attraction_id not in placed_attractions:
+            unplaced.extend(items)
+
+    return {
+        "stops": result,
+        "unplaced": unplaced,
+        "total_km": round(float(km), 2),
+        "late_minutes": int(round(late)),
+    }
+
+
+def _signature(stops, experiences, day_window):
+    payload = orjson.dumps(
+        [stops, experiences, day_window, settings.ROUTE_SPEED_KMH, settings.ROUTE_DAY_START],
+        default=str,
+    )
+    return hashlib.sha1(payload).hexdigest()
+
+
+def optimize_itinerary(itinerary_id):
+    """
+    Recompute the route of every day whose stops changed and rebuild the
+    itinerary document if any did. Returns how many days were updated.
+    """
+    days = list(DayPlan.objects.filter(itinerary_id=itinerary_id).only("id", "route"))
+    if not days:
+        return 0
+    day_ids = [day.id for day in days]
+    stops = _day_stops(day_ids)
+    experiences = {day_id: [] for day_id in day_ids}
+    for exp_id, name, attraction_id, day_id in Experience.objects.filter(day_plan_id__in=day_ids).order_by("id").values_list(
+        "id", "name", "attraction_id", "day_plan_id"
+    ):
+        experiences[day_id].append((exp_id, name, attraction_id))
+    windows = {
+        day_id: (start, end)
+        for day_id, start, end in DayBudget.objects.filter(day_plan_id__in=day_ids).values_list(
+            "day_plan_id", "start_time", "end_time"
+        )
+    }
+
+    changed = []
+    for day in days:
+        window = windows.get(day.id, (None, None))
+        signature = _signature(stops[day.id], experiences[day.id], window)
+        if day.route and day.route.get("signature") == signature:
+            continue
+        day.route = {**build_route(stops[day.id], experiences[day.id], window), "signature": signature}
+        changed.append(day)
+
+    if changed:
+        DayPlan.objects.bulk_update(changed, ["route"])
+        rebuild_itinerary_document(itinerary_id)
+    return len(changed)
+
+
+def schedule_optimization(itinerary_id):
+    # after commit so the worker sees the new days; tasks imports views -> lazy
+    from .tasks import optimize_day_routes
+
+    transaction.on_commit(lambda: optimize_day_routes.delay(itinerary_id))
@@ -0,0 +1,172 @@
+"""
+Denormalized search index (SearchDocument).
+
+One row per destination, public itinerary and attraction with a weighted tsvector
+(A title, B place names, C description), a trigram text column and a log-scaled
+popularity prior, all built in SQL. Both text columns are GIN-indexed, so a search
+is one ranked query: full-text match OR substring (ILIKE) OR trigram similarity,
+scored by ts_rank_cd + similarity + a small popularity boost.
+
+Rows are kept current by signals (`schedule_reindex`), `refresh_popularity` (beat)
+and the `rebuild_search_index` command for backfills; the in-memory autocomplete
+(autocomplete.py) is rebuilt from this table.
+"""
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from . import autocomplete
+from .models import SearchDocument
+
+DESTINATION = SearchDocument.EntityTypes.DESTINATION
+ITINERARY = SearchDocument.EntityTypes.ITINERARY
+ATTRACTION = SearchDocument.EntityTypes.ATTRACTION
+
+POPULARITY_WEIGHT = 0.05  # prior only breaks ties between similarly relevant rows
+
+_UPSERT_TAIL = """
+    ON CONFLICT (entity_type, entity_id) DO UPDATE SET
+        slug = EXCLUDED.slug,
+        title = EXCLUDED.title,
+        image = EXCLUDED.image,
+        search_text = EXCLUDED.search_text,
+        search_vector = EXCLUDED.search_vector,
+        popularity = EXCLUDED.popularity,
+        updated_at = EXCLUDED.updated_at
+    RETURNING entity_id
+"""
+
+UPSERT_SQL = {
+    DESTINATION: """
+        INSERT INTO travel_searchdocument
+            (entity_type, entity_id, slug, title, image, search_text, search_vector, popularity, updated_at)
+        SELECT 'destination', d.id, d.slug, d.name, COALESCE(d.image, ''),
+               concat_ws(' ', d.name, l.city, l.state, l.country),
+               setweight(to_tsvector('simple', d.name), 'A')
+               || setweight(to_tsvector('simple', concat_ws(' ', l.city, l.state, l.country)), 'B')
+               || setweight(to_tsvector('simple', COALESCE(d.description, '')), 'C'),
+               ln(1 + GREATEST(d.trending_score, 0)), NOW()
+        FROM travel_destination d
+        LEFT JOIN travel_location l ON l.id = d.location_id
+        WHERE d.id = ANY(%s)
+    """ + _UPSERT_TAIL,
+    ITINERARY: """
+        INSERT INTO travel_searchdocument
+            (entity_type, entity_id, slug, title, image, search_text, search_vector, popularity, updated_at)
+        SELECT 'itinerary', i.id, i.slug, i.title, COALESCE(i.thumbnail, ''),
+               concat_ws(' ', i.title, i.highlighted_places, d.name),
+               setweight(to_tsvector('simple', i.title), 'A')
+               || setweight(to_tsvector('simple', concat_ws(' ', i.highlighted_places, d.name)), 'B')
+               || setweight(to_tsvector('simple', COALESCE(i.short_description, '')), 'C'),
+               ln(1 + GREATEST(i.popularity_score, 0)), NOW()
+        FROM travel_itinerary i
+        JOIN travel_destination d ON d.id = i.destination_id
+        WHERE i.id = ANY(%s) AND i.is_public
+    """ + _UPSERT_TAIL,
+    ATTRACTION: """
+        INSERT INTO travel_searchdocument
+            (entity_type, entity_id, slug, title, image, search_text, search_vector, popularity, updated_at)
+        SELECT 'attraction', a.id, '', a.name, COALESCE(a.image, ''),
+               concat_ws(' ', a.name, a.city),
+               setweight(to_tsvector('simple', a.name), 'A')
+               || setweight(to_tsvector('simple', concat_ws(' ', a.city, a.state, a.country)), 'B')
+               || setweight(to_tsvector('simple', concat_ws(' ', a.description, a.address)), 'C'),
+               0, NOW()
+        FROM travel_attraction a
+        WHERE a.id = ANY(%s)
+    """ + _UPSERT_TAIL,
+}
+
+SOURCE_MODELS = {
+    DESTINATION: "Destination",
+    ITINERARY: "Itinerary",
+    ATTRACTION: "Attraction",
+}
+
+
+def reindex(entity_type, ids):
+    """
+    Upsert the documents for `ids`; rows whose source is gone (or an itinerary
+    that went private) are deleted. Returns how many documents were written.
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(UPSERT_SQL[entity_type], [ids])
+        written = {row[0] for row in cursor.fetchall()}
+        stale = [i for i in ids if i not in written]
+        if stale:
+            cursor.execute(
+                "DELETE FROM travel_searchdocument WHERE entity_type = %s AND entity_id = ANY(%s)",
+                [entity_type, stale],
+            )
+    return len(written)
+
+
+def schedule_reindex(entity_type, ids):
+    ids = list(ids)
+
+    def run():
+        reindex(entity_type, ids)
+        autocomplete.schedule_refresh()
+
+    transaction.on_commit(run)
+
+
+def reindex_destination_itineraries(destination_id):
+    # itinerary rows carry the destination name in their B weight
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT id FROM travel_itinerary WHERE destination_id = %s", [destination_id])
+        ids = [row[0] for row in cursor.fetchall()]
+    return reindex(ITINERARY, ids)
+
+
+def refresh_popularity():
+    """
+    Re-sync the popularity prior with trending_score / popularity_score, which
+    are bulk-updated without signals. Only rows whose prior moved are written.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE travel_searchdocument sd
+            SET popularity = ln(1 + GREATEST(d.trending_score, 0))
+            FROM travel_destination d
+            WHERE sd.entity_type = 'destination' AND sd.entity_id = d.id
+              AND sd.popularity IS DISTINCT FROM ln(1 + GREATEST(d.trending_score, 0))
+        """)
+        updated = cursor.rowcount
+        cursor.execute("""
+            UPDATE travel_searchdocument sd
+            SET popularity = ln(1 + GREATEST(i.popularity_score, 0))
+            FROM travel_itinerary i
+            WHERE sd.entity_type = 'itinerary' AND sd.entity_id = i.id
+              AND sd.popularity IS DISTINCT FROM ln(1 + GREATEST(i.popularity_score, 0))
+        """)
+        return updated + cursor.rowcount
+
+
+# ---- querying ----
+MATCH_SQL = (
+    "(search_vector @@ websearch_to_tsquery('simple', %s)"
+    " OR search_text ILIKE %s OR search_text %% %s)"
+)
+SCORE_SQL = (
+    "ts_rank_cd(search_vector, websearch_to_tsquery('simple', %s))"
+    f" + similarity(search_text, %s) + {POPULARITY_WEIGHT} * popularity"
+)
+
+
+def _like(query):
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def matching(query, entity_type):
+    """SearchDocument rows of one type matching `query`, best first (annotated `score`)."""
+    return (
+        SearchDocument.objects.filter(entity_type=entity_type)
+        .filter(RawSQL(MATCH_SQL, [query, _like(query), query], output_field=BooleanField()))
+        .annotate(score=RawSQL(SCORE_SQL, [query, query], output_field=FloatField()))
+        .order_by("-score", "entity_id")
+    )
@@ -3,6 +3,9 @@ from .models import (Destination, Itinerary, DayPlan, Attraction, Restaurant, Ex
                      DayBudget, Tag, DestinationView, Rating, Location, AttractionImage, DestinationImage, UserTask, FavoriteItinerary)
 from .models import User
 from .utils import get_rating_summary
+from .similar_itineraries import schedule_update as schedule_similar_update
+from .documents import schedule_document_rebuild
+from .routing import schedule_optimization as schedule_route_optimization
 from cloudinary.utils import cloudinary_url
 import cloudinary
 from django.db import transaction
@@ -294,6 +297,16 @@ class DestinationDwellSerializer(serializers.ModelSerializer):
     class Meta:
         model = DestinationView
         fields = ["dwell_time"]
+
+
+class DestinationEventSerializer(serializers.Serializer):
+    action_type = serializers.ChoiceField(choices=DestinationView.ACTION_CHOICES, default=DestinationView.VIEW)
+    dwell_time = serializers.IntegerField(min_value=0, max_value=86400, default=0)
+    click_target = serializers.CharField(max_length=100, default="unknown", allow_blank=True)
+
+
+class DestinationBatchEventSerializer(DestinationEventSerializer):
+    destination = serializers.SlugField()
         
 class RatingSerializer(serializers.ModelSerializer):
     class Meta:
@@ -524,6 +537,9 @@ class ItineraryWriteSerializer(serializers.ModelSerializer):
             status="pending",
         )
 
+        schedule_similar_update(itinerary.id)
+        schedule_document_rebuild(itinerary.id)
+        schedule_route_optimization(itinerary.id)
         return itinerary
 
     @transaction.atomic
@@ -571,6 +587,10 @@ class ItineraryWriteSerializer(serializers.ModelSerializer):
                 if budget:
                     DayBudget.objects.create(day_plan=day, **budget)
 
+        schedule_similar_update(instance.id)
+        schedule_document_rebuild(instance.id)
+        if days_payload is not None:
+            schedule_route_optimization(instance.id)
         return instance
     
     
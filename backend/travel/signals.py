@@ -1,11 +1,18 @@
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
 from django.dispatch import receiver
-from .models import Destination, DestinationImage, DestinationView, Rating, Attraction,Category
-from .tasks import precache_destinations
-from .cache_utils import clear_destination_cache
+from .models import (Destination, DestinationImage, DestinationView, Rating, Attraction,Category, Itinerary, Restaurant,
+                     BudgetBreakdown, DayBudget, DayPlan, Experience)
+from .cache_utils import clear_user_recommendations
+from . import local_cache
+from .conditional import bump_version
+from .documents import queue_document_rebuild
+from . import nearby, search_index
+from .invalidation import (destination_image_tags, destination_tags, itinerary_tags, queue_invalidation,
+                           snapshot_destination)
 from django.apps import AppConfig
-from .tasks import rebuild_recommendations, precache_itineraries_by_category
+from .tasks import rebuild_recommendations
 from django.core.cache import cache
+from django.db import transaction
 
 class TravelConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
@@ -17,22 +24,79 @@ class TravelConfig(AppConfig):
         except Exception:
             pass
         
+@receiver(pre_save, sender=Destination)
+def snapshot_destination_fields(sender, instance, **kwargs):
+    instance._cache_snapshot = snapshot_destination(instance)
+
+
+@receiver([post_save, post_delete], sender=Destination)
+def invalidate_destination_cache(sender, instance, created=False, **kwargs):
+    # planner picks the affected tags; the flush task coalesces bursts and re-warms 🔥
+    deleted = kwargs["signal"] is post_delete
+    previous = getattr(instance, "_cache_snapshot", None)
+    queue_invalidation(destination_tags(instance, previous, created=created, deleted=deleted))
+    if created or deleted or (previous and previous["slug"] != instance.slug):
+        local_cache.invalidate("destination_ids")
+
+
 @receiver([post_save, post_delete], sender=Destination)
+def reindex_destination_search(sender, instance, **kwargs):
+    # reindex() drops the row again when the destination is gone
+    search_index.schedule_reindex(search_index.DESTINATION, [instance.id])
+    previous = getattr(instance, "_cache_snapshot", None)
+    if kwargs["signal"] is post_save and previous and previous["name"] != instance.name:
+        transaction.on_commit(lambda: search_index.reindex_destination_itineraries(instance.id))
+
+
 @receiver([post_save, post_delete], sender=DestinationImage)
-def invalidate_destination_cache(sender, **kwargs):
-    clear_destination_cache()
-    precache_destinations.delay()  # 🔥 auto rebuild
+def invalidate_destination_image_cache(sender, instance, **kwargs):
+    queue_invalidation(destination_image_tags(instance))
+
+
+@receiver(pre_delete, sender=Itinerary)
+def snapshot_itinerary_categories(sender, instance, **kwargs):
+    # the through rows are gone by post_delete (and no m2m_changed is sent)
+    instance._category_slugs = list(instance.categories.values_list("slug", flat=True))
+
+
+@receiver([post_save, post_delete], sender=Itinerary)
+def invalidate_itinerary_cache(sender, instance, **kwargs):
+    if kwargs["signal"] is post_delete:
+        slugs = getattr(instance, "_category_slugs", [])
+    else:
+        slugs = instance.categories.values_list("slug", flat=True)
+    queue_invalidation(itinerary_tags(instance, slugs))
+
+
+@receiver([post_save, post_delete], sender=Itinerary)
+def reindex_itinerary_search(sender, instance, **kwargs):
+    search_index.schedule_reindex(search_index.ITINERARY, [instance.id])
+
+
+@receiver(m2m_changed, sender=Itinerary.categories.through)
+def invalidate_itinerary_category_cache(sender, instance, action, pk_set=None, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if isinstance(instance, Itinerary):
+        slugs = Category.objects.filter(pk__in=pk_set) if pk_set else instance.categories.all()
+        queue_invalidation({f"itinerary:{instance.id}", *(f"category:{c.slug}" for c in slugs)})
+    else:  # category.itineraries.add(...)
+        queue_invalidation({f"category:{instance.slug}"})
     
 
         
 @receiver(post_save, sender=DestinationView)
 @receiver(post_save, sender=Rating)
 def invalidate_user_recommendations(sender, instance, **kwargs):
-    user = getattr(instance, "user", None)
-    if user and user.is_authenticated:
-        cache.delete(f"recommendations:user:{user.id}:destinations")
-        cache.delete(f"recommendations:user:{user.id}:itineraries")
-        
+    if getattr(instance, "user_id", None):
+        clear_user_recommendations([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Rating)
+def bump_ratings_version(sender, instance, **kwargs):
+    # new ETag for that object's ratings pages (get_ratings)
+    bump_version(f"ratings:{instance.content_type_id}:{instance.object_id}")
+
         
 @receiver(pre_save, sender=Attraction)
 def sync_location_fields(sender, instance, **kwargs):
@@ -45,9 +109,47 @@ def sync_location_fields(sender, instance, **kwargs):
         instance.state = instance.location.state or ""
         instance.country = instance.location.country or ""
         
+@receiver([post_save, post_delete], sender=Attraction)
+def reindex_attraction_search(sender, instance, **kwargs):
+    search_index.schedule_reindex(search_index.ATTRACTION, [instance.id])
+
+
+@receiver([post_save, post_delete], sender=Attraction)
+@receiver([post_save, post_delete], sender=Restaurant)
+def invalidate_nearby_tree(sender, instance, **kwargs):
+    # every worker rebuilds its tree on the next /api/nearby/ query
+    entity = "attraction" if sender is Attraction else "restaurant"
+    transaction.on_commit(lambda: nearby.invalidate(entity))
+
+
+# ---- itinerary documents: edits that don't go through ItineraryWriteSerializer ----
+@receiver(pre_save, sender=Attraction)
+@receiver(pre_save, sender=Restaurant)
+@receiver(pre_save, sender=Experience)
+@receiver(pre_save, sender=DayBudget)
+def snapshot_day_plan(sender, instance, **kwargs):
+    # a stop moved to another day leaves the old itinerary's document stale too
+    instance._previous_day_plan_id = (
+        sender.objects.filter(pk=instance.pk).values_list("day_plan_id", flat=True).first() if instance.pk else None
+    )
+
+
+@receiver([post_save, post_delete], sender=Attraction)
+@receiver([post_save, post_delete], sender=Restaurant)
+@receiver([post_save, post_delete], sender=Experience)
+@receiver([post_save, post_delete], sender=DayBudget)
+def rebuild_stop_document(sender, instance, **kwargs):
+    queue_document_rebuild(day_plan_ids=[instance.day_plan_id, getattr(instance, "_previous_day_plan_id", None)])
+
+
+@receiver([post_save, post_delete], sender=DayPlan)
+@receiver([post_save, post_delete], sender=BudgetBreakdown)
+def rebuild_itinerary_document_on_change(sender, instance, **kwargs):
+    queue_document_rebuild(itinerary_ids=[instance.itinerary_id])
+
+
 @receiver([post_save, post_delete], sender=Category)
-def invalidate_category_itinerary_cache(sender, **kwargs):
-    try:
-        precache_itineraries_by_category.delay()
-    except Exception:
-        pass
\ No newline at end of file
+def invalidate_category_itinerary_cache(sender, instance, **kwargs):
+    # hot pages refill on the next request; the nightly demand-driven precache re-warms them
+    queue_invalidation({f"category:{instance.slug}"})
+    local_cache.invalidate("categories")  # all of it: the slug itself may have changed
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""
+Background-built "similar itineraries" index.
+
+Similarity between two itineraries is a weighted mix of shared categories and tags
+(Jaccard), budget and duration proximity, and same destination. Rows are scored
+against every public itinerary in vectorized chunks and the top SIMILAR_ITINERARIES_K
+are stored in SimilarItinerary, so the API is one indexed read.
+
+Each worker keeps the feature matrix in the L1 cache for SIMILAR_FEATURES_TTL;
+a per-itinerary update reloads only that itinerary's row into a copy of it and
+swaps the copy in, so concurrent updates (threaded/gevent pools) never see a
+half-patched matrix.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from . import local_cache
+from .models import Itinerary, SimilarItinerary
+
+SIMILAR_ITINERARIES_K = 12
+SIMILAR_LIST_TAG = "itinerary_similar"  # every cached /similar/ response; dropped after a full rebuild
+CHUNK_SIZE = 256
+
+CATEGORY_WEIGHT = 0.35
+TAG_WEIGHT = 0.25
+BUDGET_WEIGHT = 0.15
+DURATION_WEIGHT = 0.10
+DESTINATION_WEIGHT = 0.15
+
+_features = local_cache.local_cache("similar_itineraries", maxsize=1, ttl=settings.SIMILAR_FEATURES_TTL)
+
+
+def _membership(through_model, owner_field, target_field, index):
+    # sparse itinerary x (category|tag) 0/1 matrix aligned with `index`
+    pairs = [
+        (index[owner], target)
+        for owner, target in through_model.objects.values_list(owner_field, target_field)
+        if owner in index
+    ]
+    targets = {t: i for i, t in enumerate(sorted({t for _, t in pairs}))}
+    rows = [r for r, _ in pairs]
+    cols = [targets[t] for _, t in pairs]
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, cols)),
+        shape=(len(index), max(len(targets), 1)),
+    )
+    return matrix, targets
+
+
+def load_features():
+    rows = list(
+        Itinerary.objects.order_by("id").values_list("id", "destination_id", "total_budget", "duration_days", "is_public")
+    )
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    index = {itin_id: i for i, itin_id in enumerate(ids.tolist())}
+    categories, category_cols = _membership(Itinerary.categories.through, "itinerary_id", "category_id", index)
+    tags, tag_cols = _membership(Itinerary.tags.through, "itinerary_id", "tag_id", index)
+    return {
+        "ids": ids,
+        "index": index,
+        "destination": np.array([r[1] for r in rows], dtype=np.int64),
+        "log_budget": np.log1p(np.array([float(r[2] or 0) for r in rows], dtype=np.float64)),
+        "duration": np.array([r[3] or 0 for r in rows], dtype=np.float64),
+        "public": np.array([bool(r[4]) for r in rows]),
+        "categories": categories,
+        "category_cols": category_cols,
+        "category_counts": np.asarray(categories.sum(axis=1)).ravel(),
+        "tags": tags,
+        "tag_cols": tag_cols,
+        "tag_counts": np.asarray(tags.sum(axis=1)).ravel(),
+    }
+
+
+def _sparse_row(cols, width):
+    return sparse.csr_matrix(
+        (np.ones(len(cols), dtype=np.float32), (np.zeros(len(cols), dtype=np.int64), sorted(cols))),
+        shape=(1, width),
+    )
+
+
+def _refresh_row(f, itinerary_id):
+    """
+    Copy of the features `f` with one itinerary reloaded (appended if it's new),
+    and its row position. (None, None) when it no longer exists or uses a
+    category/tag the matrix has no column for - the caller reloads everything then.
+    """
+    row = Itinerary.objects.filter(id=itinerary_id).values_list(
+        "destination_id", "total_budget", "duration_days", "is_public"
+    ).first()
+    if row is None:
+        return None, None
+    memberships = {}
+    for key, through, target in (
+        ("category", Itinerary.categories.through, "category_id"),
+        ("tag", Itinerary.tags.through, "tag_id"),
+    ):
+        cols = f[f"{key}_cols"]
+        targets = list(through.objects.filter(itinerary_id=itinerary_id).values_list(target, flat=True))
+        if any(t not in cols for t in targets):
+            return None, None
+        memberships[key] = [cols[t] for t in targets]
+
+    # other threads may be scoring against `f`: only ever write to fresh arrays
+    f = dict(f)
+    pos = f["index"].get(itinerary_id)
+    if pos is None:
+        pos = len(f["ids"])
+        f["index"] = {**f["index"], itinerary_id: pos}
+        for key in ("ids", "destination", "log_budget", "duration", "public", "category_counts", "tag_counts"):
+            f[key] = np.append(f[key], np.zeros(1, dtype=f[key].dtype))
+        for key in ("categories", "tags"):
+            f[key] = sparse.vstack([f[key], _sparse_row([], f[key].shape[1])], format="csr")
+        f["ids"][pos] = itinerary_id
+    else:
+        for key in ("destination", "log_budget", "duration", "public", "category_counts", "tag_counts"):
+            f[key] = f[key].copy()
+    f["destination"][pos] = row[0]
+    f["log_budget"][pos] = np.log1p(float(row[1] or 0))
+    f["duration"][pos] = row[2] or 0
+    f["public"][pos] = bool(row[3])
+    for key, matrix_key in (("category", "categories"), ("tag", "tags")):
+        matrix = f[matrix_key]
+        f[matrix_key] = sparse.vstack(
+            [matrix[:pos], _sparse_row(memberships[key], matrix.shape[1]), matrix[pos + 1:]], format="csr"
+        )
+        f[f"{key}_counts"][pos] = len(memberships[key])
+    return f, pos
+
+
+def _jaccard(matrix, counts, rows):
+    inter = (matrix[rows] @ matrix.T).toarray()
+    union = counts[rows][:, None] + counts[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter, dtype=np.float64), where=union > 0)
+
+
+def _score_rows(f, rows):
+    """
+    Dense (len(rows) x N) similarity of the given row positions against every itinerary.
+    Self pairs and private candidates score -inf so they never make a top-K.
+    """
+    scores = (
+        CATEGORY_WEIGHT * _jaccard(f["categories"], f["category_counts"], rows)
+        + TAG_WEIGHT * _jaccard(f["tags"], f["tag_counts"], rows)
+        + BUDGET_WEIGHT * np.exp(-np.abs(f["log_budget"][rows][:, None] - f["log_budget"][None, :]))
+        + DURATION_WEIGHT * np.exp(-np.abs(f["duration"][rows][:, None] - f["duration"][None, :]) / 2.0)
+        + DESTINATION_WEIGHT * (f["destination"][rows][:, None] == f["destination"][None, :])
+    )
+    scores[:, ~f["public"]] = -np.inf
+    scores[np.arange(len(rows)), rows] = -np.inf
+    return scores
+
+
+def _top_k(scores, k):
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+
+def _store(f, rows, k=SIMILAR_ITINERARIES_K):
+    scores = _score_rows(f, rows)
+    top = _top_k(scores, k)
+    ids = f["ids"]
+    entries = [
+        SimilarItinerary(
+            itinerary_id=int(ids[row]), similar_id=int(ids[col]), score=float(scores[i, col]), rank=rank
+        )
+        for i, row in enumerate(rows)
+        for rank, col in enumerate(top[i])
+        if np.isfinite(scores[i, col])
+    ]
+    with transaction.atomic():
+        # row locks in id order serialize concurrent updates of the same lists without deadlocking
+        sources = set(
+            Itinerary.objects.select_for_update().filter(id__in=ids[rows].tolist())
+            .order_by("id").values_list("id", flat=True)
+        )
+        # cached features can still hold itineraries deleted since they were loaded
+        alive = set(
+            Itinerary.objects.filter(id__in={e.similar_id for e in entries}).values_list("id", flat=True)
+        )
+        entries = [e for e in entries if e.itinerary_id in sources and e.similar_id in alive]
+        SimilarItinerary.objects.filter(itinerary_id__in=sources).delete()
+        SimilarItinerary.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+    return len(entries)
+
+
+def rebuild_all(k=SIMILAR_ITINERARIES_K):
+    f = load_features()
+    total = len(f["ids"])
+    for start in range(0, total, CHUNK_SIZE):
+        _store(f, np.arange(start, min(start + CHUNK_SIZE, total)), k)
+    # itineraries deleted since the last run cascade away; nothing else to clean
+    return total
+
+
+def update_for(itinerary_id, k=SIMILAR_ITINERARIES_K):
+    """
+    Refresh one itinerary's list plus the lists most likely to change because of it:
+    its own new neighbours and every itinerary that currently lists it. Returns
+    the ids whose lists were rewritten.
+    """
+    f, pos = _refresh_row(_features.get("features", load_features), itinerary_id)
+    if pos is None:
+        # deleted, or new categories/tags: start over from the DB
+        _features.clear("features")
+        f = _features.get("features", load_features)
+        pos = f["index"].get(itinerary_id)
+    else:
+        # last writer wins between concurrent updates; a row lost that way is back within the TTL
+        _features.replace("features", f)
+    if pos is None:
+        return []
+
+    _store(f, np.array([pos]), k)
+    affected = set(
+        SimilarItinerary.objects.filter(itinerary_id=itinerary_id).values_list("similar_id", flat=True)
+    ) | set(SimilarItinerary.objects.filter(similar_id=itinerary_id).values_list("itinerary_id", flat=True))
+    rows = np.array(sorted(f["index"][i] for i in affected if i in f["index"]), dtype=np.int64)
+    if len(rows):
+        _store(f, rows, k)
+    return [itinerary_id, *f["ids"][rows].tolist()]
+
+
+def schedule_update(itinerary_id):
+    # after commit so the worker sees the new categories/tags; tasks imports views -> lazy
+    from .tasks import update_similar_itineraries
+
+    transaction.on_commit(lambda: update_similar_itineraries.delay(itinerary_id))
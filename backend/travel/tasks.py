@@ -1,15 +1,33 @@
 from celery import shared_task
 from .models import Destination
 from celery import shared_task
-from django.db.models import Count, Sum, Q
 from django.utils.timezone import now, timedelta
-from .models import Destination,Location, Category
-from django.core.cache import cache
+from .models import Destination,Location
 from .serializers import  DestinationDetailSerializer, ItinerarySerializer, DestinationRecommendationSerializer, ItineraryRecommendationSerializer
 from django.test import RequestFactory
-from .views import destination_list_api, itineraries_by_category
-from .utils import compute_recommended_destinations, compute_recommended_itineraries
+from .views import destination_list_api, _build_category_itineraries, _category_demand_path, InvalidCursor
+from .utils import compute_recommended_destinations, compute_recommended_itineraries, RECOMMENDATION_LIMIT
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from .events import drain_event_buffer
+from .rollups import rollup_interactions
+from .recommender import build_item_similarity, personalized_destination_data
+from .documents import pop_pending_documents, rebuild_itinerary_document
+from .routing import optimize_itinerary as optimize_itinerary_routes
+from .similar_itineraries import (SIMILAR_LIST_TAG, rebuild_all as rebuild_similar_index,
+                                  update_for as update_similar_index)
+from .trending import refresh_trending_scores, prune_activity, backfill_activity, TRENDING_WINDOW_HOURS
+from .cache_utils import cache_set, invalidate_tags, prune_tags
+from .invalidation import destination_pages_to_refresh, flush_pending
+from .conditional import make_entry
+from . import autocomplete
+from .search_index import refresh_popularity as refresh_search_index_popularity
+from .precache import CATEGORY_DEMAND_KEY, decay_demand, entry_size, forget, hot_paths
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from urllib.parse import urlparse
+
+USER_REC_TAGS = ["recommendations", "recommendations:user"]
 
 
 
@@ -23,6 +41,38 @@ def update_trending_destinations():
     return f"Updated {len(latest)} destinations"
 
 
+@shared_task
+def flush_destination_events(max_batches=20):
+    """
+    Drain the buffered view/dwell/click events into DestinationView.
+    Bounded so one run can't monopolise a worker when the buffer is very deep.
+    """
+    total = 0
+    for _ in range(max_batches):
+        flushed = drain_event_buffer()
+        total += flushed
+        if flushed < settings.EVENT_FLUSH_BATCH_SIZE:
+            break
+    return f"✅ Flushed {total} destination events"
+
+
+@shared_task
+def flush_cache_invalidations():
+    """
+    Debounced flush of the tags queued by model-write signals (see invalidation.py):
+    one invalidation for the whole burst, then re-warm only the destination list
+    pages that were actually dropped.
+    """
+    dropped = flush_pending()
+    factory = RequestFactory()
+    refreshed = 0
+    for key in destination_pages_to_refresh(dropped):
+        req = factory.get(key[len("destinations:"):])
+        destination_list_api(req)  # the view caches (and tags) its own response
+        refreshed += 1
+    return f"✅ Invalidated {len(dropped)} cache entries, refreshed {refreshed} destination pages"
+
+
 @shared_task
 def precache_destinations():
     """
@@ -49,9 +99,7 @@ def precache_destinations():
             for size in sizes:
                 params = {**q, "page": page, "page_size": size}
                 req = factory.get("/api/destinations/", data=params)
-                resp = destination_list_api(req)  # directly call your API view
-                cache_key = f"destinations:{req.get_full_path()}"
-                cache.set(cache_key, resp.data, timeout=None)
+                destination_list_api(req)  # the view stores its own (stale-while-revalidate) entry
                 count += 1
 
     return f"✅ Precomputed {count} destination cache entries"
@@ -59,29 +107,52 @@ def precache_destinations():
 
 @shared_task
 def compute_trending_destinations():
-    last_week = now() - timedelta(days=7)
-    qs = (
-        Destination.objects
-        .annotate(
-            views=Count("interactions", filter=Q(interactions__action_type="view", interactions__created_at__gte=last_week)),
-            clicks=Count("interactions", filter=Q(interactions__action_type="click", interactions__created_at__gte=last_week)),
-            dwell=Sum("interactions__dwell_time", filter=Q(interactions__action_type="dwell", interactions__created_at__gte=last_week)),
-        )
-    )
+    """
+    Refresh trending_score from the hourly activity counters (last 168 buckets).
+    Cheap enough to run every minute.
+    """
+    updated = refresh_trending_scores()
+    prune_activity()
+    return f"✅ Trending scores refreshed ({updated} changed)"
 
-    for d in qs:
-        score = (d.views or 0) + 2 * (d.clicks or 0) + ((d.dwell or 0) / 60.0)
-        d.trending_score = score
-        d.save(update_fields=["trending_score"])
-        
 
-def clear_pattern(prefix):
-    try:
-        keys = cache.keys(f"{prefix}*") if hasattr(cache, "keys") else []
-        if keys:
-            cache.delete_many(keys)
-    except Exception:
-        pass
+@shared_task
+def refresh_search_popularity():
+    """
+    Copy trending_score / popularity_score (bulk-updated, no signals) into the
+    search index's popularity prior.
+    """
+    updated = refresh_search_index_popularity()
+    if updated:
+        autocomplete.refresh()  # suggestion ranking follows the prior
+    return f"✅ Search popularity refreshed ({updated} rows)"
+
+
+@shared_task
+def refresh_autocomplete():
+    # debounced by autocomplete.schedule_refresh after search index writes
+    autocomplete.refresh()
+    return "✅ Autocomplete snapshot rebuilt"
+
+
+@shared_task
+def rollup_destination_views():
+    """
+    Compact new DestinationView rows into the hourly/daily rollups and apply
+    the raw-row retention policy.
+    """
+    rolled, pruned = rollup_interactions()
+    return f"✅ Rolled up {rolled} interaction groups, pruned {pruned} raw rows"
+
+
+@shared_task
+def backfill_destination_activity(hours=TRENDING_WINDOW_HOURS):
+    """
+    Seed the hourly counters from raw DestinationView rows, e.g. right after deploy.
+    """
+    rows = backfill_activity(hours=hours)
+    refresh_trending_scores()
+    return f"✅ Backfilled {rows} hourly activity buckets"
         
 
 @shared_task
@@ -89,34 +160,84 @@ def rebuild_recommendations():
     # --- Destinations ---
     dests = compute_recommended_destinations()
     dest_data = DestinationRecommendationSerializer(dests, many=True).data
-    clear_pattern("recommendations:global:destinations")
-    cache.set("recommendations:global:destinations", dest_data, timeout=None)
+    cache_set("recommendations:global:destinations", dest_data, timeout=None, tags=["recommendations"])
 
-    itins = compute_recommended_itineraries()
+    itins = compute_recommended_itineraries(limit=RECOMMENDATION_LIMIT)
     itin_data = ItineraryRecommendationSerializer(itins, many=True).data
-    clear_pattern("recommendations:global:itineraries")
-    cache.set("recommendations:global:itineraries", itin_data, timeout=None)
+    cache_set("recommendations:global:itineraries", itin_data, timeout=None, tags=["recommendations"])
+    invalidate_tags("recommendations:global")  # per-limit rendered copies of the above
 
     return f"✅ Recommendations rebuilt (destinations={len(dests)}, itineraries={len(itins)})"
 
 
 
+@shared_task
+def build_item_similarity_model():
+    """
+    Rebuild the item-item destination similarity model used for personalized
+    recommendations.
+    """
+    count = build_item_similarity()
+    return f"✅ Item similarity model built for {count} destinations"
+
+
+@shared_task
+def update_similar_itineraries(itinerary_id):
+    """
+    Incremental refresh after an itinerary is saved or cloned.
+    """
+    refreshed = update_similar_index(itinerary_id)
+    invalidate_tags(*(f"similar:{itin_id}" for itin_id in refreshed))
+    return f"✅ Similar itineraries refreshed for {len(refreshed)} itineraries"
+
+
+@shared_task
+def rebuild_pending_documents():
+    """
+    Debounced rebuild of itinerary documents queued by day plan / stop signals
+    (see documents.queue_document_rebuild). Routes are refreshed on the way; that
+    already rebuilds the document when a route moved.
+    """
+    ids = pop_pending_documents()
+    for itinerary_id in ids:
+        if not optimize_itinerary_routes(itinerary_id):
+            rebuild_itinerary_document(itinerary_id)
+    return f"✅ Rebuilt {len(ids)} itinerary documents"
+
+
+@shared_task
+def optimize_day_routes(itinerary_id):
+    """
+    Recompute the visiting order of an itinerary's days after it is written.
+    """
+    count = optimize_itinerary_routes(itinerary_id)
+    return f"✅ Routes optimized for {count} days"
+
+
+@shared_task
+def rebuild_similar_itineraries():
+    """
+    Full nightly rebuild of the similar-itineraries index.
+    """
+    count = rebuild_similar_index()
+    invalidate_tags(SIMILAR_LIST_TAG)
+    return f"✅ Similar itineraries rebuilt for {count} itineraries"
+
+
 @shared_task
 def clear_stale_cache():
     """
     Remove old per-user/session cache entries to save Redis memory.
     Runs nightly via Celery Beat.
     """
-    # Per-user recommendations
+    # Per-user recommendations (tag lookup, no KEYS scan)
     try:
-        keys = cache.keys("recommendations:user:*") if hasattr(cache, "keys") else []
-        if keys:
-            cache.delete_many(keys)
-            return f"🧹 Cleared {len(keys)} stale user recommendation cache entries"
+        cleared = len(invalidate_tags("recommendations:user"))
+        pruned = prune_tags()
     except Exception as e:
         return f"⚠️ Error while clearing cache: {e}"
 
-    return "No stale cache found"
+    return f"🧹 Cleared {cleared} user recommendation entries, pruned {pruned} expired tag members"
 
 
 @shared_task
@@ -132,14 +253,19 @@ def precache_user_recommendations(days_active=7):
     count = 0
     for user in active_users:
         # Destinations
-        dests = compute_recommended_destinations(user=user)
-        dest_data = DestinationRecommendationSerializer(dests, many=True).data
-        cache.set(f"recommendations:user:{user.id}:destinations", dest_data, timeout=3600)
+        dest_data = personalized_destination_data(user)
+        cache_set(
+            f"recommendations:user:{user.id}:destinations", dest_data, timeout=3600,
+            tags=USER_REC_TAGS + [f"user:{user.id}"],
+        )
 
         # Itineraries
-        itins = compute_recommended_itineraries(user=user)
+        itins = compute_recommended_itineraries(user=user, limit=RECOMMENDATION_LIMIT)
         itin_data = ItineraryRecommendationSerializer(itins, many=True).data
-        cache.set(f"recommendations:user:{user.id}:itineraries", itin_data, timeout=3600)
+        cache_set(
+            f"recommendations:user:{user.id}:itineraries", itin_data, timeout=3600,
+            tags=USER_REC_TAGS + [f"user:{user.id}"],
+        )
 
         count += 1
 
@@ -159,52 +285,52 @@ def precache_single_user_recommendations(user_id):
         return "❌ User not found"
 
     # Destinations
-    dests = compute_recommended_destinations(user=user)
-    dest_data = DestinationRecommendationSerializer(dests, many=True).data
-    cache.set(f"recommendations:user:{user.id}:destinations", dest_data, timeout=3600)
+    dest_data = personalized_destination_data(user)
+    cache_set(
+        f"recommendations:user:{user.id}:destinations", dest_data, timeout=3600,
+        tags=USER_REC_TAGS + [f"user:{user.id}"],
+    )
 
     # Itineraries
-    itins = compute_recommended_itineraries(user=user)
+    itins = compute_recommended_itineraries(user=user, limit=RECOMMENDATION_LIMIT)
     itin_data = ItineraryRecommendationSerializer(itins, many=True).data
-    cache.set(f"recommendations:user:{user.id}:itineraries", itin_data, timeout=3600)
+    cache_set(
+        f"recommendations:user:{user.id}:itineraries", itin_data, timeout=3600,
+        tags=USER_REC_TAGS + [f"user:{user.id}"],
+    )
 
     return f"✅ Cached recs for user {user.id}"
 
 @shared_task
-def precache_itineraries_by_category():
+def precache_itineraries_by_category(top_n=None, memory_budget=None, ttl=None):
     """
-    Precompute and cache category itineraries for all combinations of
-    categories, destinations, duration, and budget filters.
+    Warm the category-itinerary pages people actually request: the top `top_n`
+    paths by hit count, stopping once `memory_budget` bytes have been written.
+    Entries get a TTL (they are not pinned forever) and hit counts decay afterwards.
     """
-    factory = RequestFactory()
-    categories = Category.objects.only("slug").all()
-    destinations = Destination.objects.only("slug").all()
+    top_n = top_n or settings.CATEGORY_PRECACHE_TOP_N
+    memory_budget = memory_budget or settings.CATEGORY_PRECACHE_MEMORY_BUDGET
+    ttl = ttl or settings.CATEGORY_PRECACHE_TTL
 
-    budgets = [None, 10000, 25000, 50000, 100000]
-    durations = [None, 3, 5, 7]
-    pages = [1, 2]
-    sizes = [10, 25]
+    factory = RequestFactory()
+    count = used = 0
+    for path, _hits in hot_paths(CATEGORY_DEMAND_KEY, top_n):
+        request = factory.get(path)
+        try:
+            if _category_demand_path(request) != path:
+                raise KeyError(path)  # recorded before paths were normalized
+            category_slug = resolve(urlparse(path).path).kwargs["category_slug"]
+            data, tags = _build_category_itineraries(request, category_slug)
+        except (Resolver404, KeyError, Http404, InvalidCursor):
+            forget(CATEGORY_DEMAND_KEY, path)  # category gone / stale path
+            continue
+
+        size = entry_size(data)
+        if used + size > memory_budget:
+            break
+        cache_set(f"category:{category_slug}:{path}", make_entry(data), timeout=ttl, tags=tags)
+        used += size
+        count += 1
 
-    count = 0
-    for category in categories:
-        for dest in destinations:
-            for budget in budgets:
-                for duration in durations:
-                    for page in pages:
-                        for size in sizes:
-                            params = {
-                                "destination": dest.slug,
-                                "budget_max": budget,
-                                "duration_days": duration,
-                                "page": page,
-                                "page_size": size,
-                            }
-                            # clean out None values
-                            params = {k: v for k, v in params.items() if v is not None}
-
-                            req = factory.get(f"/api/categories/type/{category.slug}/", data=params)
-                            resp = itineraries_by_category(req, category.slug)
-                            cache_key = f"category:{category.slug}:{req.get_full_path()}"
-                            cache.set(cache_key, resp.data, timeout=None)
-                            count += 1
-    return f"✅ Precomputed {count} category-itinerary cache entries"
\ No newline at end of file
+    dropped = decay_demand(CATEGORY_DEMAND_KEY)
+    return f"✅ Precomputed {count} category-itinerary cache entries ({used // 1024} KiB), {dropped} cold paths dropped"
\ No newline at end of file
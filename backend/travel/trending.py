@@ -0,0 +1,121 @@
+"""
+Incremental trending scores.
+
+`record_activity` folds each ingested batch into DestinationHourlyActivity with one
+upsert; `refresh_trending_scores` sums the last TRENDING_WINDOW_HOURS buckets and
+writes changed scores back with a single bulk_update.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import Destination, DestinationView, DestinationHourlyActivity
+
+TRENDING_WINDOW_HOURS = 7 * 24
+
+
+def hour_bucket(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def trending_score(views, clicks, dwell_seconds):
+    return (views or 0) + 2 * (clicks or 0) + ((dwell_seconds or 0) / 60.0)
+
+
+def record_activity(rows):
+    """
+    Add a batch of DestinationView rows (saved or not) to the hourly counters.
+    Counters are incremented in SQL so concurrent flushes can't lose updates.
+    """
+    counters = defaultdict(lambda: [0, 0, 0])
+    for row in rows:
+        c = counters[(row.destination_id, hour_bucket(row.created_at))]
+        if row.action_type == DestinationView.VIEW:
+            c[0] += 1
+        elif row.action_type == DestinationView.CLICK:
+            c[1] += 1
+        elif row.action_type == DestinationView.DWELL:
+            c[2] += row.dwell_time or 0
+    if not counters:
+        return
+
+    values_sql = ", ".join(["(%s, %s, %s, %s, %s)"] * len(counters))
+    params = []
+    for (dest_id, bucket), (views, clicks, dwell) in counters.items():
+        params.extend([dest_id, bucket, views, clicks, dwell])
+
+    table = DestinationHourlyActivity._meta.db_table
+    sql = f"""
+        INSERT INTO {table} (destination_id, bucket, views, clicks, dwell_seconds)
+        VALUES {values_sql}
+        ON CONFLICT (destination_id, bucket) DO UPDATE SET
+            views = {table}.views + EXCLUDED.views,
+            clicks = {table}.clicks + EXCLUDED.clicks,
+            dwell_seconds = {table}.dwell_seconds + EXCLUDED.dwell_seconds
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def refresh_trending_scores():
+    """
+    Recompute Destination.trending_score from the hourly window.
+    Reads at most destinations x 168 small rows and only writes scores that moved.
+    Returns the number of destinations updated.
+    """
+    window_start = hour_bucket(timezone.now()) - timedelta(hours=TRENDING_WINDOW_HOURS - 1)
+    table = DestinationHourlyActivity._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT destination_id, SUM(views), SUM(clicks), SUM(dwell_seconds)
+            FROM {table}
+            WHERE bucket >= %s
+            GROUP BY destination_id
+            """,
+            [window_start],
+        )
+        scores = {row[0]: trending_score(row[1], row[2], row[3]) for row in cursor.fetchall()}
+
+    changed = [
+        Destination(id=dest_id, trending_score=scores.get(dest_id, 0.0))
+        for dest_id, current in Destination.objects.values_list("id", "trending_score")
+        if abs((current or 0.0) - scores.get(dest_id, 0.0)) > 1e-9
+    ]
+    # bulk_update skips post_save, so this no longer wipes and rebuilds the destination cache
+    Destination.objects.bulk_update(changed, ["trending_score"], batch_size=500)
+    return len(changed)
+
+
+def prune_activity(keep_hours=TRENDING_WINDOW_HOURS + 24):
+    cutoff = hour_bucket(timezone.now()) - timedelta(hours=keep_hours)
+    deleted, _ = DestinationHourlyActivity.objects.filter(bucket__lt=cutoff).delete()
+    return deleted
+
+
+def backfill_activity(hours=TRENDING_WINDOW_HOURS):
+    """
+    Rebuild the hourly counters from raw DestinationView rows (first deploy / repair).
+    """
+    window_start = hour_bucket(timezone.now()) - timedelta(hours=hours - 1)
+    table = DestinationHourlyActivity._meta.db_table
+    views_table = DestinationView._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE bucket >= %s", [window_start])
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (destination_id, bucket, views, clicks, dwell_seconds)
+            SELECT destination_id,
+                   date_trunc('hour', created_at),
+                   COUNT(*) FILTER (WHERE action_type = %s),
+                   COUNT(*) FILTER (WHERE action_type = %s),
+                   COALESCE(SUM(dwell_time) FILTER (WHERE action_type = %s), 0)
+            FROM {views_table}
+            WHERE created_at >= %s
+            GROUP BY destination_id, date_trunc('hour', created_at)
+            """,
+            [DestinationView.VIEW, DestinationView.CLICK, DestinationView.DWELL, window_start],
+        )
+        return cursor.rowcount
@@ -1,14 +1,21 @@
+import time
+
+import numpy as np
 from django.db.models import Avg, Count
 from django.contrib.contenttypes.models import ContentType
 from .models import Rating
 from django.utils.timezone import now
 from datetime import timedelta
 from .models import (
-    Itinerary, DayPlan, Attraction, Restaurant, Experience, DayBudget, UserTask, Destination, DestinationView,
+    Itinerary, DayPlan, Attraction, Restaurant, Experience, DayBudget, UserTask, Destination,
 )
 from django.db import transaction
 from django.utils.text import slugify
 from django.db.models import Q
+from .rollups import destination_signals
+from .similar_itineraries import schedule_update as schedule_similar_update
+from .documents import schedule_document_rebuild
+from .routing import schedule_optimization as schedule_route_optimization
 
 def get_rating_summary(obj):
     content_type = ContentType.objects.get_for_model(obj.__class__)
@@ -141,6 +148,9 @@ def clone_itinerary_for_user(source: Itinerary, user) -> Itinerary:
         related_itinerary=copy,
         status="pending",
     )
+    schedule_similar_update(copy.id)
+    schedule_document_rebuild(copy.id)
+    schedule_route_optimization(copy.id)
     return copy
 
 
@@ -168,56 +178,96 @@ def clone_itinerary_for_user(source: Itinerary, user) -> Itinerary:
 #     results.sort(key=lambda x: x[1], reverse=True)
 #     return [dest for dest, score in results]
 
-def compute_recommended_destinations(user=None, session_id=None):
-    filters = {"user": user} if user else {"session_id": session_id}
-    user_views = (
-        DestinationView.objects.filter(**filters)
-        .values("destination")
-        .annotate(
-            views=Count("id", filter=Q(action_type="view")),
-            dwell=Avg("dwell_time", filter=Q(action_type="dwell")),
-            clicks=Count("id", filter=Q(action_type="click")),
-        )
+# Weights for a user's signals on a destination, plus itinerary popularity
+VIEW_WEIGHT, DWELL_WEIGHT, CLICK_WEIGHT, POPULARITY_WEIGHT = 0.2, 0.4, 0.3, 0.1
+RECOMMENDATION_LIMIT = 20  # largest `limit` the recommendation APIs accept
+COLUMNS_TTL = 300  # seconds the per-process id/popularity columns are reused
+
+_columns = {}
+
+
+def _cached_columns(name, loader):
+    expires, value = _columns.get(name, (0, None))
+    if expires < time.monotonic():
+        value = loader()
+        _columns[name] = (time.monotonic() + COLUMNS_TTL, value)
+    return value
+
+
+def _load_destination_columns():
+    return np.fromiter(Destination.objects.order_by("id").values_list("id", flat=True), dtype=np.int64)
+
+
+def _load_itinerary_columns():
+    rows = list(Itinerary.objects.order_by("id").values_list("id", "destination_id", "popularity_score"))
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    dest_ids = np.array([r[1] for r in rows], dtype=np.int64)
+    popularity = np.array([r[2] or 0 for r in rows], dtype=np.float64)
+    # unique destinations (sorted) + each itinerary's index into them
+    itin_dest_ids, itin_dest_idx = np.unique(dest_ids, return_inverse=True)
+    return ids, itin_dest_ids, itin_dest_idx, popularity
+
+
+def signal_vector(signal_map, dest_ids):
+    """
+    Scatter {destination_id: signals} into a dense weighted vector aligned with
+    the sorted `dest_ids`; destinations without signals score 0.
+    """
+    vec = np.zeros(len(dest_ids), dtype=np.float64)
+    if not signal_map or not len(dest_ids):
+        return vec
+    keys = np.fromiter(signal_map.keys(), dtype=np.int64, count=len(signal_map))
+    weights = np.fromiter(
+        (VIEW_WEIGHT * (s["views"] or 0) + DWELL_WEIGHT * (s["dwell"] or 0) + CLICK_WEIGHT * (s["clicks"] or 0)
+         for s in signal_map.values()),
+        dtype=np.float64,
+        count=len(signal_map),
     )
-    signal_map = {row["destination"]: row for row in user_views}
+    pos = np.searchsorted(dest_ids, keys)
+    pos_clipped = np.minimum(pos, len(dest_ids) - 1)
+    known = (pos < len(dest_ids)) & (dest_ids[pos_clipped] == keys)
+    vec[pos_clipped[known]] = weights[known]
+    return vec
 
-    results = []
-    for dest in Destination.objects.all():
-        signals = signal_map.get(dest.id, {"views": 0, "dwell": 0, "clicks": 0})
-        score = (0.2 * (signals["views"] or 0)
-               + 0.4 * (signals["dwell"] or 0)
-               + 0.3 * (signals["clicks"] or 0))
-        results.append((dest, score))
 
-    results.sort(key=lambda x: x[1], reverse=True)
+def top_ids(ids, scores, limit=None):
+    """
+    ids ordered by score desc (id asc on ties). With a limit only the top `limit`
+    are partitioned out and sorted instead of sorting everything.
+    """
+    if limit is not None and limit < len(ids):
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        order = top[np.lexsort((ids[top], -scores[top]))]
+    else:
+        order = np.lexsort((ids, -scores))
+    return ids[order].tolist()
+
+
+def _in_order(queryset, ids):
+    objs = queryset.in_bulk(ids)
+    return [objs[i] for i in ids if i in objs]
+
+
+def compute_recommended_destinations(user=None, session_id=None, limit=None):
+    signal_map = destination_signals(user=user, session_id=session_id)
+    dest_ids = _cached_columns("destinations", _load_destination_columns)
+    scores = signal_vector(signal_map, dest_ids)
 
     # ✅ fallback if all scores are zero → use trending_score
-    if not any(score > 0 for _, score in results):
-        return Destination.objects.order_by("-trending_score")
-
-    return [dest for dest, _ in results]
-
-def compute_recommended_itineraries(user=None, session_id=None):
-    filters = {"user": user} if user else {"session_id": session_id}
-    user_views = (
-        DestinationView.objects.filter(**filters)
-        .values("destination")
-        .annotate(
-            views=Count("id", filter=Q(action_type="view")),
-            dwell=Avg("dwell_time", filter=Q(action_type="dwell")),
-            clicks=Count("id", filter=Q(action_type="click")),
-        )
-    )
-    signal_map = {row["destination"]: row for row in user_views}
-
-    results = []
-    for itin in Itinerary.objects.select_related("destination").all():
-        signals = signal_map.get(itin.destination_id, {"views": 0, "dwell": 0, "clicks": 0})
-        score = (0.2 * (signals["views"] or 0)
-               + 0.4 * (signals["dwell"] or 0)
-               + 0.3 * (signals["clicks"] or 0)
-               + 0.1 * itin.popularity_score)
-        results.append((itin, score))
-
-    results.sort(key=lambda x: x[1], reverse=True)
-    return [itin for itin, score in results]
\ No newline at end of file
+    if not scores.any():
+        qs = Destination.objects.prefetch_related("images").order_by("-trending_score")
+        return qs[:limit] if limit else qs
+
+    top = top_ids(dest_ids, scores, limit)
+    return _in_order(Destination.objects.prefetch_related("images"), top)
+
+
+def compute_recommended_itineraries(user=None, session_id=None, limit=None):
+    signal_map = destination_signals(user=user, session_id=session_id)
+    ids, itin_dest_ids, itin_dest_idx, popularity = _cached_columns("itineraries", _load_itinerary_columns)
+    if not len(ids):
+        return []
+
+    scores = signal_vector(signal_map, itin_dest_ids)[itin_dest_idx] + POPULARITY_WEIGHT * popularity
+    top = top_ids(ids, scores, limit)
+    return _in_order(Itinerary.objects.all(), top)
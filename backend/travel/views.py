@@ -5,10 +5,11 @@ from .serializers import (HomeDestinationSerializer, HomeCategorySerializer,Dest
                           ItinerarySerializer, ItineraryDetailSerializer, ItineraryListSerializer, DestinationDwellSerializer, 
                           DestinationDetailSerializer,AttractionSerializer,RestaurantSerializer, DestinationListSerializer, ItineraryCardSerializer,
                           ItineraryWriteSerializer,FavoriteItinerarySerializer, DestinationRecommendationSerializer,ItineraryRecommendationSerializer,
-                          AttractionSearchSerializer)
+                          AttractionSearchSerializer, DestinationEventSerializer, DestinationBatchEventSerializer)
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import RegisterSerializer
@@ -19,18 +20,49 @@ from .serializers import RatingSerializer
 from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
 from rest_framework.pagination import PageNumberPagination
-from django.contrib.postgres.search import TrigramSimilarity
 from django.db import connection
 from cloudinary import config as cloudinary_config
 from urllib.parse import urlencode, urlparse, parse_qs, urlunparse
+import base64
+from decimal import Decimal, InvalidOperation
+import hashlib
 import json
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
 from django.db import transaction, IntegrityError
 from .utils import clone_itinerary_for_user, compute_recommended_destinations, compute_recommended_itineraries
 from rest_framework.pagination import CursorPagination, Cursor
+from .recommender import personalized_destination_data
+from .events import build_event, event_context, record_events
+from .cache_utils import cache_set, swr_get_entry, swr_stats
+from .cache_serializer import codec_stats
+from .conditional import conditional_response, current_version, entry_response, make_entry
+from .precache import CATEGORY_DEMAND_KEY, record_demand
+from .local_cache import local_cache, stats as local_cache_stats
+from .fanout import fan_out
+from . import autocomplete, nearby, search_index
+from .similar_itineraries import SIMILAR_LIST_TAG
+from .documents import document_blob, document_validators
+from .rendered import cache_rendered, rendered_response
 from django.db import models
-from django.db.models import Value, CharField, F
+from django.db.models import Value, CharField, F, OuterRef, Subquery
+
+# Per-process L1 for reference data; signals invalidate these by name (local_cache.invalidate)
+CATEGORY_L1 = local_cache("categories", maxsize=512, ttl=600)
+DESTINATION_IDS_L1 = local_cache("destination_ids", maxsize=4096, ttl=600)
+REFERENCE_L1 = local_cache("reference", maxsize=32, ttl=3600)
+
+
+def _category_meta(slug):
+    # {"id", "name", "slug"} or None
+    return CATEGORY_L1.get(slug, lambda: Category.objects.filter(slug=slug).values("id", "name", "slug").first())
+
+
+def _destination_id(slug):
+    return DESTINATION_IDS_L1.get(
+        slug, lambda: Destination.objects.filter(slug=slug).values_list("id", flat=True).first()
+    )
+
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
@@ -180,6 +212,24 @@ def itineraries_by_tag(request, tag_slug):
 
 @api_view(["GET"])
 def itineraries_by_category(request, category_slug):
+    # normalized path when there is one, so junk params share the entry the precache warms
+    demand_path = _category_demand_path(request)
+    cache_key = f"category:{category_slug}:{demand_path or request.get_full_path()}"
+    entry = cache.get(cache_key)
+    if entry is None or "etag" not in entry:  # miss, or a pre-envelope entry
+        try:
+            response_data, tags = _build_category_itineraries(request, category_slug)
+        except InvalidCursor:
+            return Response({"detail": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        entry = make_entry(response_data)
+        cache_set(cache_key, entry, timeout=3600, tags=tags)
+    if demand_path:
+        record_demand(CATEGORY_DEMAND_KEY, demand_path)  # feeds the nightly precache
+    return entry_response(request, "category_itineraries", entry)
+
+
+def _category_paging(request):
+    # (page, page_size, ordering) the way _build_category_itineraries reads them
     try:
         page_size = min(max(int(request.GET.get("page_size", 25)), 1), 50)
     except ValueError:
@@ -188,41 +238,96 @@ def itineraries_by_category(request, category_slug):
         page = max(int(request.GET.get("page", 1)), 1)
     except ValueError:
         page = 1
+    ordering = request.GET.get("ordering", "id")
+    if ordering not in CATEGORY_ITINERARY_ORDERINGS:
+        ordering = "id"
+    return page, page_size, ordering
+
+
+def _category_demand_path(request):
+    """
+    Canonical path of a category page: only the params the page is built from,
+    normalized, in a fixed order. None for cursor pages and filters that don't
+    parse or resolve - those aren't worth tracking or precaching.
+    """
+    if CURSOR_PARAM in request.GET:
+        return None
+    params = {}
+    destination = request.GET.get("destination")
+    if destination:
+        if not _destination_id(destination):
+            return None
+        params["destination"] = destination
+    try:
+        if request.GET.get("budget_max"):
+            budget_max = Decimal(request.GET["budget_max"])
+            if not budget_max.is_finite():
+                return None
+            params["budget_max"] = str(budget_max)
+        if request.GET.get("duration_days"):
+            params["duration_days"] = int(request.GET["duration_days"])
+    except (InvalidOperation, ValueError):
+        return None
+    page, page_size, ordering = _category_paging(request)
+    params.update(ordering=ordering, page_size=page_size)
+    if _wants_keyset(request):
+        params["pagination"] = "cursor"
+        if request.GET.get("include_count") == "true":
+            params["include_count"] = "true"
+    else:
+        params["page"] = page
+    return f"{request.path}?{urlencode(params)}"
+
+
+def _build_category_itineraries(request, category_slug):
+    """
+    (response data, cache tags) for one category page; shared by the view and
+    the demand-driven precache task. Raises InvalidCursor / Http404.
+    """
+    page, page_size, ordering = _category_paging(request)
     offset = (page - 1) * page_size
+    keyset = _wants_keyset(request)
+    columns, keys, descending = CATEGORY_ITINERARY_ORDERINGS[ordering]
+    cursor_pos = _decode_cursor(request, len(columns)) if keyset else None
 
     destination_slug = request.GET.get("destination")
     budget_max = request.GET.get("budget_max")
     duration_days = request.GET.get("duration_days")
     prefix = _abs_url_prefix()
 
-    cache_key = f"category:{category_slug}:{request.get_full_path()}"
-    cached = cache.get(cache_key)
-    if cached:
-        return Response(cached)
-    
-    # ✅ Resolve category_id
-    category = get_object_or_404(Category.objects.only("id", "name", "slug"), slug=category_slug)
 
-    # ✅ Resolve destination_id once (avoid join on slug)
+    # ✅ Resolve category / destination_id from the per-process L1 (no DB round-trip when warm)
+    category_data = _category_meta(category_slug)
+    if category_data is None:
+        raise Http404("Category not found")
+
     dest_id = None
     if destination_slug:
-        dest_id = Destination.objects.only("id").filter(slug=destination_slug).values_list("id", flat=True).first()
+        dest_id = _destination_id(destination_slug)
         if not dest_id:
-            return Response({"count": 0, "results": {"category": {"id": category.id, "name": category.name, "slug": category.slug}, "itineraries": []}})
-
-    # ---- COUNT (cheap) ----
-    count_sql = "SELECT COUNT(*) FROM travel_itinerary_categories ic WHERE ic.category_id = %s"
-    count_params = [category.id]
+            return {"count": 0, "results": {"category": category_data, "itineraries": []}}, {f"category:{category_slug}"}
 
-    with connection.cursor() as cursor:
-        cursor.execute(count_sql, count_params)
-        total = cursor.fetchone()[0]
+    filters_sql, filter_params = "", []
+    if dest_id:
+        filters_sql += " AND i.destination_id = %s"
+        filter_params.append(dest_id)
+    if budget_max:
+        filters_sql += " AND i.total_budget <= %s"
+        filter_params.append(budget_max)
+    if duration_days:
+        filters_sql += " AND i.duration_days = %s"
+        filter_params.append(duration_days)
 
-    if total == 0:
-        return Response({
-            "count": 0, "next": None, "previous": None,
-            "results": {"category": {"id": category.id, "name": category.name, "slug": category.slug}, "itineraries": []}
-        })
+    def count():
+        # ---- COUNT (cached apart from the pages, shared by every page/cursor) ----
+        count_key = f"category:{category_slug}:count:" + urlencode(
+            {"destination": dest_id or "", "budget_max": budget_max or "", "duration_days": duration_days or ""}
+        )
+        count_sql = (
+            "SELECT COUNT(*) FROM travel_itinerary_categories ic "
+            "JOIN travel_itinerary i ON i.id = ic.itinerary_id WHERE ic.category_id = %s" + filters_sql
+        )
+        return _cached_count(count_key, count_sql, [category_data["id"]] + filter_params, tags=[f"category:{category_slug}"])
 
     # ---- DATA ----
     data_sql = """
@@ -247,41 +352,48 @@ def itineraries_by_category(request, category_slug):
         JOIN travel_itinerary_categories ic ON ic.itinerary_id = i.id
         JOIN travel_destination d ON i.destination_id = d.id
         WHERE ic.category_id = %s
-    """
-    data_params = [prefix, category.id]
+    """ + filters_sql
+    data_params = [prefix, category_data["id"]] + filter_params
 
-    if dest_id:
-        data_sql += " AND i.destination_id = %s"
-        data_params.append(dest_id)
-    if budget_max:
-        data_sql += " AND i.total_budget <= %s"
-        data_params.append(budget_max)
-    if duration_days:
-        data_sql += " AND i.duration_days = %s"
-        data_params.append(duration_days)
-
-    data_sql += " LIMIT %s OFFSET %s"
-    data_params.extend([page_size, offset])
+    if keyset:
+        where, keyset_params, order = _keyset_sql(columns, descending, cursor_pos)
+        data_sql += f"{where} ORDER BY {order} LIMIT %s"
+        data_params += keyset_params + [page_size + 1]
+    else:
+        order = ", ".join(f"{c} {'DESC' if descending else 'ASC'}" for c in columns)
+        data_sql += f" ORDER BY {order} LIMIT %s OFFSET %s"
+        data_params.extend([page_size + 1, offset])
 
     with connection.cursor() as cursor:
         cursor.execute(data_sql, data_params)
         cols = [c[0] for c in cursor.description]
         rows = [dict(zip(cols, r)) for r in cursor.fetchall()]
 
-    next_url = _build_link(request, page + 1) if (offset + page_size) < total else None
-    prev_url = _build_link(request, page - 1) if page > 1 else None
-    response_data = {
-        "count": total,
-        "next": next_url,
-        "previous": prev_url,
-        "results": {
-            "category": {"id": category.id, "name": category.name, "slug": category.slug},
-            "itineraries": rows,
-        },
-    }
-    cache.set(cache_key, response_data, timeout=3600)
-
-    return Response(response_data)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if keyset:
+        if cursor_pos and cursor_pos[1]:
+            rows.reverse()
+        next_url, prev_url = _keyset_links(request, rows, keys, cursor_pos, has_more)
+        response_data = {
+            "next": next_url,
+            "previous": prev_url,
+            "results": {"category": category_data, "itineraries": rows},
+        }
+        if request.GET.get("include_count") == "true":
+            response_data["count"] = count()
+    else:
+        response_data = {
+            "count": count(),
+            "next": _build_link(request, page + 1) if has_more else None,
+            "previous": _build_link(request, page - 1) if page > 1 else None,
+            "results": {"category": category_data, "itineraries": rows},
+        }
+    tags = {f"category:{category_slug}"}
+    tags.update(f"itinerary:{r['id']}" for r in rows)
+    tags.update(f"destination:{r['destination_id']}" for r in rows)
+    return response_data, tags
     
     
     
@@ -390,59 +502,82 @@ def itineraries_by_category(request, category_slug):
 #     })
     
     
+def _destination_id_or_404(slug):
+    destination_id = _destination_id(slug)
+    if destination_id is None:
+        raise Http404("Destination not found")
+    return destination_id
+
+
 @api_view(["POST"])
 def destination_view_api(request, slug):
-    destination = get_object_or_404(Destination, slug=slug)
-    session_id = request.session.session_key or request.session.create()
-    ip = request.META.get("REMOTE_ADDR")
-
-    DestinationView.objects.create(
-        destination=destination,
-        user=request.user if request.user.is_authenticated else None,
-        session_id=session_id,
-        ip_address=ip,
-        action_type=DestinationView.VIEW
-    )
+    destination_id = _destination_id_or_404(slug)
+    record_events([build_event(event_context(request), destination_id, DestinationView.VIEW)])
     return Response({"message": "View recorded"})
 
 
 
 @api_view(["POST"])
 def destination_dwell_api(request, slug):
-    destination = get_object_or_404(Destination, slug=slug)
-    session_id = request.session.session_key or request.session.create()
-    ip = request.META.get("REMOTE_ADDR")
-
-    dwell_time = int(request.data.get("dwell_time", 0))
+    destination_id = _destination_id_or_404(slug)
+    serializer = DestinationEventSerializer(data={"dwell_time": request.data.get("dwell_time", 0)})
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    DestinationView.objects.create(
-        destination=destination,
-        user=request.user if request.user.is_authenticated else None,
-        session_id=session_id,
-        ip_address=ip,
-        action_type=DestinationView.DWELL,
-        dwell_time=dwell_time
-    )
+    dwell_time = serializer.validated_data["dwell_time"]
+    record_events([build_event(event_context(request), destination_id, DestinationView.DWELL, dwell_time=dwell_time)])
     return Response({"message": f"Dwell time {dwell_time}s recorded"})
 
 
 @api_view(["POST"])
 def destination_click_api(request, slug):
-    destination = get_object_or_404(Destination, slug=slug)
-    session_id = request.session.session_key or request.session.create()
-    ip = request.META.get("REMOTE_ADDR")
+    destination_id = _destination_id_or_404(slug)
+    serializer = DestinationEventSerializer(data={"click_target": request.data.get("click_target", "unknown")})
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    click_target = request.data.get("click_target", "unknown")
+    click_target = serializer.validated_data["click_target"]
+    record_events([build_event(event_context(request), destination_id, DestinationView.CLICK, click_target=click_target)])
+    return Response({"message": f"Click recorded on {click_target}"})
+
+
+MAX_BATCH_EVENTS = 100
+
+
+@api_view(["POST"])
+def destination_events_batch_api(request):
+    """
+    Record many view/dwell/click events (for any destinations) in one request:
+    {"events": [{"destination": "goa", "action_type": "dwell", "dwell_time": 12}, ...]}
+    All slugs are resolved with one query and the rows go in with one bulk insert.
+    """
+    payload = request.data.get("events", []) if isinstance(request.data, dict) else request.data
+    serializer = DestinationBatchEventSerializer(data=payload, many=True, max_length=MAX_BATCH_EVENTS)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    items = serializer.validated_data
+    slugs = {item["destination"] for item in items}
+    dest_ids = dict(Destination.objects.filter(slug__in=slugs).values_list("slug", "id"))
+
+    context = event_context(request)
+    events = [
+        build_event(
+            context,
+            dest_ids[item["destination"]],
+            item["action_type"],
+            dwell_time=item["dwell_time"] if item["action_type"] == DestinationView.DWELL else 0,
+            click_target=item["click_target"] if item["action_type"] == DestinationView.CLICK else None,
+        )
+        for item in items
+        if item["destination"] in dest_ids
+    ]
+    record_events(events)
 
-    DestinationView.objects.create(
-        destination=destination,
-        user=request.user if request.user.is_authenticated else None,
-        session_id=session_id,
-        ip_address=ip,
-        action_type=DestinationView.CLICK,
-        click_target=click_target
+    return Response(
+        {"recorded": len(events), "skipped": len(items) - len(events)},
+        status=status.HTTP_202_ACCEPTED,
     )
-    return Response({"message": f"Click recorded on {click_target}"})
 
 
 def log_destination_view(request, destination):
@@ -550,12 +685,28 @@ def get_ratings(request, model_name, object_id):
     if not model:
         return Response({"error": "Invalid model"}, status=400)
 
+    # ratings version counter (bumped by the Rating signals) -> 304 without a query
+    content_type = ContentType.objects.get_for_model(model, for_concrete_model=False)
+    version = current_version(
+        f"ratings:{content_type.id}:{object_id}",
+        exists=lambda: model.objects.filter(id=object_id).exists(),
+    )
+    if version is None:  # no such object (-> 404 below) or Redis down
+        return _ratings_response(request, model, content_type, object_id)
+
+    page_hash = hashlib.blake2b(request.get_full_path().encode(), digest_size=6).hexdigest()
+    etag = f'"ratings-{content_type.id}-{object_id}-{version}-{page_hash}"'
+    return conditional_response(
+        request, "ratings", etag=etag, last_modified=version // 1_000_000_000,
+        loader=lambda: _ratings_response(request, model, content_type, object_id),
+    )
+
+
+def _ratings_response(request, model, content_type, object_id):
     obj = model.objects.filter(id=object_id).only("id", "name", "title").first()
     if not obj:
         return Response({"error": "Object not found"}, status=404)
 
-    content_type = ContentType.objects.get_for_model(model, for_concrete_model=False)
-
     ratings_qs = Rating.objects.filter(
         content_type=content_type,
         object_id=obj.id
@@ -612,34 +763,41 @@ def recommended_destinations_api(request):
     except ValueError:
         limit = 5
 
+    # rendered bytes per limit (rendered.py): a hit never re-serializes all_destinations
     # 🔹 Anonymous → Global recommendations
     if not user:
-        cached = cache.get("recommendations:global:destinations")
-        if cached:
-            return Response({
-                "recommended": cached[:limit],
-                "all_destinations": cached
-            })
-        return Response({"recommended": [], "all_destinations": []})
+        rendered_key = f"recommendations:global:destinations:rendered:{limit}"
+        blob = cache.get(rendered_key)
+        if blob is None:
+            cached = cache.get("recommendations:global:destinations")
+            if not cached:
+                return Response({"recommended": [], "all_destinations": []})
+            blob = cache_rendered(
+                rendered_key, {"recommended": cached[:limit], "all_destinations": cached},
+                timeout=None, tags=["recommendations", "recommendations:global"],
+            )
+        return rendered_response(request, blob)
 
     # 🔹 Authenticated → User recommendations
+    user_tags = ["recommendations", "recommendations:user", f"user:{user.id}"]
+    rendered_key = f"recommendations:user:{user.id}:destinations:rendered:{limit}"
+    blob = cache.get(rendered_key)
+    if blob is not None:
+        return rendered_response(request, blob)
+
     cache_key = f"recommendations:user:{user.id}:destinations"
     cached = cache.get(cache_key)
 
-    if cached:
-        return Response({
-            "recommended": cached[:limit],
-            "all_destinations": cached
-        })
-
-    # No cache → return empty but trigger async recompute
-    from .tasks import precache_single_user_recommendations
-    precache_single_user_recommendations.delay(user.id)
+    # No cache → item-item model lookup (cheap), reordering the global payload
+    if cached is None:
+        cached = personalized_destination_data(user)
+        cache_set(cache_key, cached, timeout=3600, tags=user_tags)
 
-    return Response({
-        "recommended": [],
-        "all_destinations": []
-    })
+    blob = cache_rendered(
+        rendered_key, {"recommended": cached[:limit], "all_destinations": cached},
+        timeout=3600, tags=user_tags,
+    )
+    return rendered_response(request, blob)
 
 
 # @api_view(["GET"])
@@ -829,19 +987,19 @@ def recommended_itineraries_api(request):
     except ValueError:
         limit = 5
 
-    cache_key = f"recommendations:itineraries:{user.id if user else session_id}:limit:{limit}"
-    cached = cache.get(cache_key)
-    if cached:
-        return Response({"recommended": cached})
+    cache_key = f"recommendations:itineraries:{user.id if user else session_id}:limit:{limit}:rendered"
+    blob = cache.get(cache_key)
+    if blob is not None:
+        return rendered_response(request, blob)
 
     # Compute recommendations
-    results = compute_recommended_itineraries(user=user, session_id=session_id)
+    results = compute_recommended_itineraries(user=user, session_id=session_id, limit=limit)
 
     serializer = ItineraryRecommendationSerializer(results, many=True)
-    data = {"recommended": serializer.data[:limit]}  # ✅ configurable limit
+    data = {"recommended": serializer.data}  # ✅ configurable limit
 
-    cache.set(cache_key, data["recommended"], timeout=300)
-    return Response(data)
+    tags = ["recommendations", "recommendations:user", f"user:{user.id}"] if user else ["recommendations"]
+    return rendered_response(request, cache_rendered(cache_key, data, timeout=300, tags=tags))
 
 # @api_view(["GET"])
 # def recommended_itineraries_api(request):
@@ -911,44 +1069,85 @@ def search_suggestions(request):
     if not query:
         return Response({"results": []})
 
-    cache_key = f"search_suggestions:{query}"
-    cached = cache.get(cache_key)
-    if cached:
-        return Response(cached)
-
-    limit = 5  # small and fast
+    # in-memory typo-tolerant prefix index (autocomplete.py): no DB/Redis per keystroke
+    return Response(format_suggestions(autocomplete.suggest(query, SUGGESTION_LIMIT)))
 
-    # Use .values() instead of serializing whole objects
-    destinations = list(
-        Destination.objects.filter(name__icontains=query)
-        .only("id", "name", "slug", "image")
-        .values("id", "name", "slug", "image")[:limit]
-    )
 
-    itineraries = list(
-        Itinerary.objects.filter(
-            Q(title__icontains=query) | Q(highlighted_places__icontains=query)
-        )
-        .only("id", "title", "slug", "thumbnail")
-        .values("id", "title", "slug", "thumbnail")[:limit]
-    )
+SUGGESTION_LIMIT = 5  # per entity type
 
-    attractions = list(
-        Attraction.objects.filter(name__icontains=query)
-        .only("id", "name", "image")
-        .values("id", "name", "image")[:limit]
-    )
 
-    data = {
-        "destinations": destinations,
-        "itineraries": itineraries,
-        "attractions": attractions,
+def format_suggestions(found):
+    prefix = _abs_url_prefix()
+    return {
+        "destinations": [
+            {"id": id_, "name": title, "slug": slug, "image": _abs_image(prefix, image)}
+            for id_, slug, title, image in found[search_index.DESTINATION]
+        ],
+        "itineraries": [
+            {"id": id_, "title": title, "slug": slug, "thumbnail": _abs_image(prefix, image)}
+            for id_, slug, title, image in found[search_index.ITINERARY]
+        ],
+        "attractions": [
+            {"id": id_, "name": title, "image": _abs_image(prefix, image)}
+            for id_, slug, title, image in found[search_index.ATTRACTION]
+        ],
     }
 
-    # Cache results for 30s
-    cache.set(cache_key, data, timeout=30)
 
-    return Response(data)
+def _abs_image(prefix, path):
+    # same rule as the CASE expressions in the raw list queries
+    if not path:
+        return None
+    return path if path.startswith("http") else prefix + path
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_stats_api(request):
+    # hit/stale/miss counters of the stale-while-revalidate endpoints, plus this worker's L1
+    # and cache compression counters
+    return Response({"swr": swr_stats(), "l1": local_cache_stats(), "codec": codec_stats()})
+
+
+NEARBY_TYPES = ("attraction", "restaurant", "experience")
+NEARBY_DEFAULT_RADIUS_KM = 5
+NEARBY_MAX_RADIUS_KM = 50
+NEARBY_DEFAULT_K = 10
+NEARBY_MAX_K = 50
+
+
+@api_view(["GET"])
+def nearby_api(request):
+    """
+    k nearest attractions / restaurants / experiences within radius_km of a point
+    (?lat=&lng=) or of a day plan's stops (?day_plan=<id>), closest first with distance_km.
+    Optional: radius_km (default 5, max 50), k (default 10, max 50), types=attraction,restaurant,experience
+    """
+    started = time.perf_counter()
+    try:
+        if request.GET.get("day_plan"):
+            center = nearby.day_plan_center(int(request.GET["day_plan"]))
+            if center is None:
+                return Response({"error": "Day plan has no located stops"}, status=status.HTTP_404_NOT_FOUND)
+            lat, lng = center
+        else:
+            lat, lng = float(request.GET["lat"]), float(request.GET["lng"])
+        radius_km = float(request.GET.get("radius_km", NEARBY_DEFAULT_RADIUS_KM))
+        k = int(request.GET.get("k", NEARBY_DEFAULT_K))
+    except (KeyError, ValueError):
+        return Response({"error": "Pass lat and lng, or day_plan"}, status=status.HTTP_400_BAD_REQUEST)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius_km <= 0 or k <= 0:
+        return Response({"error": "Coordinates, radius_km or k out of range"}, status=status.HTTP_400_BAD_REQUEST)
+
+    types = [t for t in request.GET.get("types", ",".join(NEARBY_TYPES)).split(",") if t in NEARBY_TYPES]
+    radius_km = min(radius_km, NEARBY_MAX_RADIUS_KM)
+    data = nearby.nearby(lat, lng, radius_km, min(k, NEARBY_MAX_K), types, _abs_url_prefix())
+    return Response({
+        "center": {"latitude": lat, "longitude": lng},
+        "radius_km": radius_km,
+        **data,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    })
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -977,10 +1176,9 @@ def search_results(request):
             "id", "name", "slug", "image"
         )[:10]
     else:
-        destinations = Destination.objects.annotate(
-            similarity=TrigramSimilarity("name", query)
-        ).filter(similarity__gt=0.3).order_by("-similarity").values(
-            "id", "name", "slug", "image"
+        # ranked match from the search index (search_index.py), GIN-backed
+        destinations = search_index.matching(query, search_index.DESTINATION).values(
+            "entity_id", "title", "slug", "image"
         )[:10]
 
     # --- Itineraries ---
@@ -991,10 +1189,10 @@ def search_results(request):
             highlighted_places__icontains=query
         )
     else:
-        itineraries = Itinerary.objects.annotate(
-            similarity=TrigramSimilarity("title", query) +
-                       TrigramSimilarity("highlighted_places", query)
-        ).filter(similarity__gt=0.3)
+        matches = search_index.matching(query, search_index.ITINERARY)
+        itineraries = Itinerary.objects.filter(id__in=matches.values("entity_id")).annotate(
+            similarity=Subquery(matches.filter(entity_id=OuterRef("id")).values("score")[:1])
+        )
 
     # Apply filters
     if min_budget:
@@ -1025,14 +1223,11 @@ def search_results(request):
         else:
             itineraries = itineraries.order_by("-similarity")
 
-    # Pagination
+    # Pagination (count + page) runs as its own branch below
     paginator = StandardResultsSetPagination()
-    paginated_itineraries = paginator.paginate_queryset(
-        itineraries.values(
-            "id", "title", "slug", "duration_days", "duration_nights",
-            "total_budget", "thumbnail", "popularity_score"
-        ),
-        request
+    itinerary_rows = itineraries.values(
+        "id", "title", "slug", "duration_days", "duration_nights",
+        "total_budget", "thumbnail", "popularity_score"
     )
 
     # --- Attractions ---
@@ -1041,17 +1236,38 @@ def search_results(request):
             name__icontains=query
         ).values("id", "name", "image")[:10]
     else:
-        attractions = Attraction.objects.annotate(
-            similarity=TrigramSimilarity("name", query)
-        ).filter(similarity__gt=0.3).order_by("-similarity").values(
-            "id", "name", "image"
+        attractions = search_index.matching(query, search_index.ATTRACTION).values(
+            "entity_id", "title", "image"
         )[:10]
 
-    return paginator.get_paginated_response({
-        "destinations": list(destinations),
-        "itineraries": list(paginated_itineraries),
-        "attractions": list(attractions)
+    # the three querysets are lazy; evaluate them concurrently under one deadline
+    prefix = _abs_url_prefix()
+
+    def with_urls(rows):
+        # index rows -> the old {id, name, slug, image} shape, with absolute image URLs
+        results = []
+        for row in rows:
+            if "entity_id" in row:
+                slug = {"slug": row["slug"]} if "slug" in row else {}
+                row = {"id": row["entity_id"], "name": row["title"], **slug, "image": _abs_image(prefix, row["image"])}
+            results.append(row)
+        return results
+
+    results, missing = fan_out({
+        "destinations": lambda: with_urls(destinations),
+        "itineraries": lambda: list(paginator.paginate_queryset(itinerary_rows, request)),
+        "attractions": lambda: with_urls(attractions),
     })
+    data = {
+        "destinations": results.get("destinations", []),
+        "itineraries": results.get("itineraries", []),
+        "attractions": results.get("attractions", []),
+        "partial": bool(missing),
+        "missing": missing,
+    }
+    if "itineraries" in missing:
+        return Response({"count": None, "next": None, "previous": None, "results": data})
+    return paginator.get_paginated_response(data)
     
 
 @api_view(["GET"])
@@ -1092,15 +1308,12 @@ def search_attractions(request):
         .order_by("id")
     )
 
-    # Typo-tolerant fuzzy search on name
+    # Typo-tolerant + substring match from the search index, ranked in the same query
     if query:
-        qs = qs.annotate(similarity=TrigramSimilarity("name", query)) \
-               .filter(similarity__gt=0.2) \
-               .order_by("-similarity")
-
-        # Fallback: icontains if trigram fails
-        if not qs.exists():
-            qs = Attraction.objects.filter(filters & Q(name__icontains=query))
+        matches = search_index.matching(query, search_index.ATTRACTION)
+        qs = qs.filter(id__in=matches.values("entity_id")).annotate(
+            similarity=Subquery(matches.filter(entity_id=OuterRef("id")).values("score")[:1])
+        ).order_by("-similarity", "id")
 
     # Pagination
     paginator = StandardResultsSetPagination()
@@ -1108,7 +1321,7 @@ def search_attractions(request):
     serializer = AttractionSearchSerializer(page, many=True)
 
     response_data = paginator.get_paginated_response(serializer.data).data
-    cache.set(cache_key, response_data, 900)  # 15 min cache
+    cache.set(cache_key, response_data, 900)  # 15 min cache; nothing invalidates it, so no tag set
 
     return Response(response_data)
 
@@ -1150,8 +1363,10 @@ DEFAULT_PAGE_SIZE = 25
 MAX_PAGE_SIZE = 50
 
 def _abs_url_prefix():
-    cloud_name = cloudinary_config().cloud_name or "" 
-    return f"https://res.cloudinary.com/{cloud_name}/"
+    def load():
+        cloud_name = cloudinary_config().cloud_name or ""
+        return f"https://res.cloudinary.com/{cloud_name}/"
+    return REFERENCE_L1.get("cloudinary_prefix", load)
 
 def _build_link(request, page):
     # rebuild URL with a different ?page=
@@ -1162,27 +1377,120 @@ def _build_link(request, page):
     new_q = urlencode({k: v[0] if isinstance(v, list) else v for k, v in q.items()})
     return urlunparse(parsed._replace(query=new_q))
 
+
+# ---- keyset (cursor) pagination for the raw SQL list endpoints ----
+CURSOR_PARAM = "cursor"
+COUNT_TTL = 600
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _wants_keyset(request):
+    return CURSOR_PARAM in request.GET or request.GET.get("pagination") == "cursor"
+
+
+def _encode_cursor(position, reverse=False):
+    # opaque to clients: base64 of {"p": [sort values..., id], "r": reverse}
+    raw = json.dumps({"p": position, "r": reverse}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(request, size):
+    token = request.GET.get(CURSOR_PARAM)
+    if not token:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        position, reverse = data["p"], bool(data.get("r"))
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+    if not isinstance(position, list) or len(position) != size:
+        raise InvalidCursor(token)
+    return position, reverse
+
+
+def _keyset_sql(columns, descending, cursor):
+    """
+    (extra WHERE, params, ORDER BY) for a keyset page over `columns` (last one unique).
+    Walking backwards flips both the comparison and the sort; the caller reverses rows.
+    """
+    reverse = bool(cursor and cursor[1])
+    sql_desc = descending != reverse
+    where, params = "", []
+    if cursor:
+        op = "<" if sql_desc else ">"
+        where = f" AND ({', '.join(columns)}) {op} ({', '.join(['%s'] * len(columns))})"
+        params = list(cursor[0])
+    order = ", ".join(f"{c} {'DESC' if sql_desc else 'ASC'}" for c in columns)
+    return where, params, order
+
+
+def _keyset_links(request, rows, keys, cursor, has_more):
+    reverse = bool(cursor and cursor[1])
+    next_url = prev_url = None
+    if rows:
+        if has_more or reverse:
+            next_url = _build_cursor_link(request, _encode_cursor([rows[-1][k] for k in keys]))
+        if cursor and (has_more or not reverse):
+            prev_url = _build_cursor_link(request, _encode_cursor([rows[0][k] for k in keys], reverse=True))
+    return next_url, prev_url
+
+
+def _build_cursor_link(request, token):
+    url = request.build_absolute_uri()
+    parsed = urlparse(url)
+    q = {k: v[0] for k, v in parse_qs(parsed.query).items() if k != PAGE_PARAM}
+    q[CURSOR_PARAM] = token
+    return urlunparse(parsed._replace(query=urlencode(q)))
+
+
+def _cached_count(cache_key, sql, params, tags=()):
+    # exact counts are the expensive part of deep pages, so they live apart from the pages
+    total = cache.get(cache_key)
+    if total is None:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            total = cursor.fetchone()[0]
+        cache_set(cache_key, total, timeout=COUNT_TTL, tags=tags)
+    return total
+
+SWR_HARD_TTL = 600  # how long a stale list page may still be served while it refreshes
+
+# ordering -> (sort columns, row keys for the cursor, descending); id is the tiebreaker
+DESTINATION_ORDERINGS = {
+    "id": (["d.id"], ["id"], False),
+    "-trending_score": (["d.trending_score", "d.id"], ["trending_score", "id"], True),
+}
+CATEGORY_ITINERARY_ORDERINGS = {
+    "id": (["i.id"], ["id"], False),
+    "-popularity_score": (["i.popularity_score", "i.id"], ["popularity_score", "id"], True),
+}
+
 import time
 @api_view(["GET"])  #v1 500ms
 def destination_list_api(request):
-    
     cache_key = f"destinations:{request.get_full_path()}"
-    cached = cache.get(cache_key)
-    if cached:
-        return Response(cached)
+    # stale-while-revalidate: a hot page past 60s is served stale while one worker rebuilds it
+    try:
+        entry = swr_get_entry(
+            "destination_list", cache_key, lambda: _build_destination_list(request),
+            soft_ttl=60, hard_ttl=SWR_HARD_TTL,
+        )
+    except InvalidCursor:
+        return Response({"detail": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+    return entry_response(request, "destination_list", entry)
 
-    
-    cache_key = f"destinations:{request.get_full_path()}"
-    start = time.time()
-    cached = cache.get(cache_key)
-    if cached:
-        print(f"[CACHE HIT] {cache_key} in {time.time()-start:.4f}s")
-        return Response(cached)
-    print(f"[CACHE MISS] {cache_key}")
-    
+
+def _build_destination_list(request):
     trending = request.GET.get("trending")
     country = request.GET.get("country")
     q = request.GET.get("q")
+    ordering = request.GET.get("ordering", "id")
+    if ordering not in DESTINATION_ORDERINGS:
+        ordering = "id"
+    keyset = _wants_keyset(request)
 
     # pagination inputs
     try:
@@ -1200,13 +1508,17 @@ def destination_list_api(request):
     offset = (page - 1) * page_size
     prefix = _abs_url_prefix()
 
-    # ---- RAW SQL with absolute Cloudinary URLs + total_count window ----
+    columns, keys, descending = DESTINATION_ORDERINGS[ordering]
+    cursor_pos = _decode_cursor(request, len(columns)) if keyset else None
+
+    # ---- RAW SQL with absolute Cloudinary URLs ----
     sql = """
         SELECT
             d.id,
             d.name,
             d.slug,
             d.description,
+            d.trending_score,
             CASE
                 WHEN d.image IS NULL OR d.image = '' THEN NULL
                 WHEN d.image LIKE 'http%%' THEN d.image
@@ -1237,8 +1549,7 @@ def destination_list_api(request):
                 FROM travel_destinationimage di
                 WHERE di.destination_id = d.id
                 ORDER BY di."order", di.id
-            ) AS images,
-            COUNT(*) OVER() AS total_count
+            ) AS images
         FROM travel_destination d
         LEFT JOIN travel_location l ON d.location_id = l.id
         WHERE 1=1
@@ -1246,39 +1557,69 @@ def destination_list_api(request):
 
     params = [prefix, prefix, prefix, prefix]
 
+    filters_sql, filter_params = "", []
     if trending == "true":
-        sql += " AND d.is_trending = TRUE"
+        filters_sql += " AND d.is_trending = TRUE"
     if country:
-        sql += " AND l.country = %s"
-        params.append(country)
+        filters_sql += " AND l.country = %s"
+        filter_params.append(country)
     if q:
-        sql += " AND d.name ILIKE %s"
-        params.append(f"%{q}%")
-
-    sql += " ORDER BY d.id ASC LIMIT %s OFFSET %s"
-    params.extend([page_size, offset])
+        filters_sql += " AND d.name ILIKE %s"
+        filter_params.append(f"%{q}%")
+    sql += filters_sql
+    params += filter_params
+
+    if keyset:
+        where, keyset_params, order = _keyset_sql(columns, descending, cursor_pos)
+        sql += f"{where} ORDER BY {order} LIMIT %s"
+        params += keyset_params + [page_size + 1]
+    else:
+        order = ", ".join(f"{c} {'DESC' if descending else 'ASC'}" for c in columns)
+        sql += f" ORDER BY {order} LIMIT %s OFFSET %s"
+        params.extend([page_size + 1, offset])
 
     with connection.cursor() as cursor:
         cursor.execute(sql, params)
         cols = [c[0] for c in cursor.description]
         rows = [dict(zip(cols, r)) for r in cursor.fetchall()]
 
-    total = rows[0]["total_count"] if rows else 0
-    for r in rows:
-        r.pop("total_count", None)
-
-    next_url = _build_link(request, page + 1) if (offset + page_size) < total else None
-    prev_url = _build_link(request, page - 1) if page > 1 else None
+    # one extra row tells us whether there is another page, no window count needed
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
 
-    response_data = {
-        "count": total,
-        "next": next_url,
-        "previous": prev_url,
-        "results": rows,
-    }
-    cache.set(cache_key, response_data, timeout=60)
+    # every list page is dropped when destinations are added/removed; filtered pages
+    # also when a destination moves in/out of that filter (see invalidation.py)
+    list_tags = ["destinations"]
+    if trending == "true":
+        list_tags.append("destinations:trending")
+    if country:
+        list_tags.append(f"destinations:country:{country}")
+    if q:
+        list_tags.append("destinations:search")
 
-    return Response(response_data)
+    def count():
+        count_key = "destinations:count:" + urlencode({"trending": trending or "", "country": country or "", "q": q or ""})
+        count_sql = (
+            "SELECT COUNT(*) FROM travel_destination d LEFT JOIN travel_location l ON d.location_id = l.id WHERE 1=1"
+            + filters_sql
+        )
+        return _cached_count(count_key, count_sql, filter_params, tags=list_tags)
+
+    if keyset:
+        if cursor_pos and cursor_pos[1]:
+            rows.reverse()
+        next_url, prev_url = _keyset_links(request, rows, keys, cursor_pos, has_more)
+        response_data = {"next": next_url, "previous": prev_url, "results": rows}
+        if request.GET.get("include_count") == "true":
+            response_data["count"] = count()
+    else:
+        response_data = {
+            "count": count(),
+            "next": _build_link(request, page + 1) if has_more else None,
+            "previous": _build_link(request, page - 1) if page > 1 else None,
+            "results": rows,
+        }
+    return response_data, list_tags + [f"destination:{r['id']}" for r in rows]
 
 class ItineraryCursorPagination(CursorPagination):
     page_size = 30
@@ -1289,6 +1630,15 @@ class ItineraryCursorPagination(CursorPagination):
 
 @api_view(["GET"])
 def destination_itineraries_api(request, slug):
+    cache_key = f"dest:{slug}:cursor:{request.get_full_path()}"
+    entry = swr_get_entry(
+        "destination_itineraries", cache_key, lambda: _build_destination_itineraries(request, slug),
+        soft_ttl=30, hard_ttl=SWR_HARD_TTL,
+    )
+    return entry_response(request, "destination_itineraries", entry)
+
+
+def _build_destination_itineraries(request, slug):
     paginator = ItineraryCursorPagination()
     page_size = paginator.get_page_size(request)
 
@@ -1320,11 +1670,6 @@ def destination_itineraries_api(request, slug):
     """
     params.append(page_size + 1)
 
-    cache_key = f"dest:{slug}:cursor:{request.get_full_path()}"
-    cached = cache.get(cache_key)
-    if cached:
-        return Response(cached)
-
     with connection.cursor() as cursor_obj:
         cursor_obj.execute(sql, params)
         cols = [c[0] for c in cursor_obj.description]
@@ -1357,8 +1702,7 @@ def destination_itineraries_api(request, slug):
         "results": itineraries,
     }
 
-    cache.set(cache_key, response, timeout=30)
-    return Response(response)
+    return response, [f"destination_itineraries:{slug}"] + [f"itinerary:{i['id']}" for i in itineraries]
 
 # @api_view(["GET"])
 # def destination_itineraries_api(request, slug):
@@ -1433,133 +1777,81 @@ def destination_itineraries_api(request, slug):
  
 @api_view(["GET"])
 def itinerary_detail_api(request, slug):
-    cache_key = f"itinerary_detail:{slug}"
+    """
+    Materialized detail document (documents.py): one indexed fetch, with an
+    ETag from the document version so unchanged itineraries answer 304.
+    """
+    validators = document_validators(slug)
+    if validators is None:
+        return Response({"detail": "Not found"}, status=404)
+
+    # the document itself is only fetched when the client's copy is stale
+    return conditional_response(
+        request, "itinerary_detail", etag=validators["etag"], last_modified=validators["last_modified"],
+        loader=lambda: _itinerary_detail_body(request, slug, validators["etag"]),
+    )
+
+
+def _itinerary_detail_body(request, slug, etag):
+    blob = document_blob(slug, etag)
+    if blob is None:
+        return Response({"detail": "Not found"}, status=404)
+    return rendered_response(request, blob)
+
+
+@api_view(["GET"])
+def similar_itineraries_api(request, slug):
+    """
+    Top related itineraries from the precomputed SimilarItinerary index
+    (one indexed read, no category/tag scan).
+    """
+    cache_key = f"itinerary_similar:{slug}"
     cached = cache.get(cache_key)
-    if cached:
+    if cached is not None:
         return Response(cached)
 
     sql = """
-    WITH itinerary_base AS (
-        SELECT i.id, i.title, i.slug, i.short_description,
-               i.duration_days, i.duration_nights,
-               i.total_budget, i.thumbnail,
-               i.highlighted_places, i.popularity_score
-        FROM travel_itinerary i
-        WHERE i.slug = %s
-        LIMIT 1
-    )
-    SELECT row_to_json(base)::jsonb || jsonb_build_object(
-        'categories', (
-            SELECT COALESCE(json_agg(json_build_object('id', c.id, 'name', c.name, 'slug', c.slug)), '[]'::json)
-            FROM travel_itinerary_categories ic
-            JOIN travel_category c ON c.id = ic.category_id
-            WHERE ic.itinerary_id = base.id
-        ),
-        'tags', (
-            SELECT COALESCE(json_agg(json_build_object('id', t.id, 'name', t.name, 'slug', t.slug)), '[]'::json)
-            FROM travel_itinerary_tags it
-            JOIN travel_tag t ON t.id = it.tag_id
-            WHERE it.itinerary_id = base.id
-        ),
-        'budget_breakdown', (
-            SELECT to_json(bb)
-            FROM (
-                SELECT stay, travel, food, misc
-                FROM travel_budgetbreakdown bb
-                WHERE bb.itinerary_id = base.id
-                LIMIT 1
-            ) bb
-        ),
-        'days', (
-            SELECT COALESCE(json_agg(
-                json_build_object(
-                    'day_number', d.day_number,
-                    'title', d.title,
-                    'description', d.description,
-                    'locations', d.locations,
-                    'attractions', (
-                        SELECT COALESCE(json_agg(
-                            json_build_object(
-                                'id', a.id,
-                                'name', a.name,
-                                'description', a.description,
-                                'image', a.image,
-                                'estimated_cost', a.estimated_cost,
-                                'latitude', a.latitude,
-                                'longitude', a.longitude,
-                                'google_place_id', a.google_place_id,
-                                'address', a.address
-                            )
-                        ORDER BY a.id), '[]'::json)
-                        FROM travel_attraction a
-                        WHERE a.day_plan_id = d.id
-                    ),
-                    'restaurants', (
-                        SELECT COALESCE(json_agg(
-                            json_build_object(
-                                'id', r.id,
-                                'name', r.name,
-                                'cuisine', r.cuisine,
-                                'description', r.description,
-                                'image', r.image,
-                                'estimated_cost', r.estimated_cost,
-                                'latitude', r.latitude,
-                                'longitude', r.longitude,
-                                'google_place_id', r.google_place_id,
-                                'address', r.address
-                            )
-                        ORDER BY r.id), '[]'::json)
-                        FROM travel_restaurant r
-                        WHERE r.day_plan_id = d.id
-                    ),
-                    'experiences', (
-                        SELECT COALESCE(json_agg(
-                            json_build_object(
-                                'id', e.id,
-                                'name', e.name,
-                                'description', e.description,
-                                'image', e.image,
-                                'estimated_cost', e.estimated_cost
-                            )
-                        ORDER BY e.id), '[]'::json)
-                        FROM travel_experience e
-                        WHERE e.day_plan_id = d.id
-                    ),
-                    'budget', (
-                        SELECT to_json(db)
-                        FROM (
-                            SELECT attractions_cost, restaurants_cost, experiences_cost,
-                                   total_cost, estimated_cost,
-                                   duration_minutes, start_time, end_time
-                            FROM travel_daybudget db
-                            WHERE db.day_plan_id = d.id
-                            LIMIT 1
-                        ) db
-                    )
-                )
-            ORDER BY d.day_number), '[]'::json)
-            FROM travel_dayplan d
-            WHERE d.itinerary_id = base.id
-        )
-    ) AS full_json
-    FROM itinerary_base base;
+    SELECT (
+        SELECT COALESCE(json_agg(json_build_object(
+            'id', s.id,
+            'title', s.title,
+            'slug', s.slug,
+            'short_description', s.short_description,
+            'duration_days', s.duration_days,
+            'total_budget', s.total_budget,
+            'thumbnail', CASE
+                WHEN s.thumbnail IS NULL OR s.thumbnail = '' THEN NULL
+                WHEN s.thumbnail LIKE 'http%%' THEN s.thumbnail
+                ELSE %s || s.thumbnail
+            END,
+            'popularity_score', s.popularity_score,
+            'destination', json_build_object('name', d.name, 'slug', d.slug),
+            'score', si.score
+        ) ORDER BY si.rank), '[]'::json)
+        FROM travel_similaritinerary si
+        JOIN travel_itinerary s ON s.id = si.similar_id AND s.is_public
+        JOIN travel_destination d ON d.id = s.destination_id
+        WHERE si.itinerary_id = i.id
+    ), i.id
+    FROM travel_itinerary i
+    WHERE i.slug = %s
     """
-
     with connection.cursor() as cursor:
-        cursor.execute(sql, [slug])
+        cursor.execute(sql, [_abs_url_prefix(), slug])
         row = cursor.fetchone()
 
     if not row:
         return Response({"detail": "Not found"}, status=404)
 
-    data = row[0]
-    if isinstance(data, str):  # psycopg2 sometimes returns str for json/jsonb
+    data, itinerary_id = row
+    if isinstance(data, str):
         data = json.loads(data)
-    cache.set(cache_key, data, timeout=300)
+    # own id: renames/deletes; similar:<id>: the update task; the shared tag: nightly rebuild
+    tags = [SIMILAR_LIST_TAG, f"itinerary:{itinerary_id}", f"similar:{itinerary_id}"]
+    cache_set(cache_key, data, timeout=3600, tags=tags + [f"itinerary:{d['id']}" for d in data])
     return Response(data)
 
 
-
 class MyWorksPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"
@@ -99,8 +99,13 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
         "LOCATION": REDIS_URL,
+        "OPTIONS": {
+            # pickles >= CACHE_COMPRESS_MIN_BYTES are stored lz4/zlib-compressed (travel/cache_serializer.py)
+            "serializer": "travel.cache_serializer.CompressedRedisSerializer",
+        },
     }
 }
+CACHE_COMPRESS_MIN_BYTES = 1024  # None disables compression
 
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -111,9 +116,17 @@ CELERY_TIMEZONE = "Asia/Kolkata"
 
 
 CELERY_BEAT_SCHEDULE = {
+    "flush-destination-events": {
+        "task": "travel.tasks.flush_destination_events",
+        "schedule": 5.0,  # every 5 seconds
+    },
     "compute-trending-destinations": {
         "task": "travel.tasks.compute_trending_destinations",
-        "schedule": crontab(minute=0, hour="*/1"),  # every 1 hour
+        "schedule": crontab(minute="*/1"),  # every minute, reads hourly counters only
+    },
+    "rollup-destination-views": {
+        "task": "travel.tasks.rollup_destination_views",
+        "schedule": crontab(minute="*/5"),  # every 5 minutes
     },
     "refresh-destinations-daily": {
         "task": "travel.tasks.precompute_destination_list",
@@ -122,6 +135,18 @@ CELERY_BEAT_SCHEDULE = {
      "rebuild-recommendations-every-30min": {
         "task": "travel.tasks.rebuild_recommendations",
         "schedule": crontab(minute="*/30"),  # every 30 minutes
+    },
+     "build-item-similarity-model": {
+        "task": "travel.tasks.build_item_similarity_model",
+        "schedule": crontab(minute=15, hour="*/6"),  # every 6 hours
+    },
+     "rebuild-similar-itineraries": {
+        "task": "travel.tasks.rebuild_similar_itineraries",
+        "schedule": crontab(hour=4, minute=30),  # daily at 4:30 AM
+    },
+    "refresh-search-popularity": {
+        "task": "travel.tasks.refresh_search_popularity",
+        "schedule": crontab(minute="*/30"),  # popularity prior of the search index
     },
      "clear-stale-cache": {
     "task": "travel.tasks.clear_stale_cache",
@@ -138,6 +163,74 @@ CELERY_BEAT_SCHEDULE = {
 }
 
 
+# View/dwell/click ingestion: "buffered" appends events to a Redis list that
+# flush_destination_events bulk inserts, "sync" writes them during the request.
+EVENT_INGEST_MODE = os.getenv("EVENT_INGEST_MODE", "buffered")
+EVENT_FLUSH_BATCH_SIZE = 1000
+
+# Interaction rollups: hourly rows older than this are folded into daily rows,
+# and raw DestinationView rows older than this are deleted once rolled up (None keeps them).
+INTERACTION_HOURLY_RETENTION_DAYS = 14
+INTERACTION_RAW_RETENTION_DAYS = 30
+
+# Model-write cache invalidation (travel/invalidation.py): bursts of signals within the
+# debounce window become one flush that re-warms at most CACHE_REFRESH_LIMIT list pages.
+CACHE_INVALIDATION_DEBOUNCE = 5  # seconds
+CACHE_REFRESH_LIMIT = 100
+
+# Itinerary documents (travel/documents.py) touched by edits outside the itinerary
+# serializer (admin, day plans, stops) are rebuilt once per window.
+DOCUMENT_REBUILD_DEBOUNCE = 5  # seconds
+
+# Demand-driven category precache: nightly warm of the hottest requested pages only.
+CATEGORY_PRECACHE_TOP_N = 500
+CATEGORY_PRECACHE_MEMORY_BUDGET = 32 * 1024 * 1024  # bytes
+CATEGORY_PRECACHE_TTL = 26 * 60 * 60  # outlives the gap until the next nightly run
+
+# Cache-Control per read endpoint (travel/conditional.py). ETag/Last-Modified are always
+# sent, so clients and CDNs can revalidate cheaply once max-age runs out.
+API_CACHE_CONTROL = {
+    "destination_list": "public, max-age=30",
+    "destination_itineraries": "public, max-age=30",
+    "category_itineraries": "public, max-age=60",
+    "itinerary_detail": "public, max-age=0, must-revalidate",
+    "ratings": "public, max-age=0, must-revalidate",
+}
+
+# Cache-hit fast path for destinations / suggestions / recommendations as async views
+# (travel/async_views.py). Only enable when serving ASGI, e.g.
+#   gunicorn travelplanner.asgi:application -k uvicorn.workers.UvicornWorker --workers 3
+# Under WSGI every async view gets its own event loop and is slower than the sync one.
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "false").lower() in ("1", "true", "yes")
+
+# Search endpoints run their per-entity queries concurrently (travel/fanout.py) and
+# answer with partial results for branches still running after the deadline.
+SEARCH_FANOUT_DEADLINE = 0.8  # seconds
+SEARCH_FANOUT_WORKERS = 8  # per process; each thread holds its own DB connection
+
+# In-memory autocomplete for search suggestions (travel/autocomplete.py): snapshot rebuilt
+# at most once per REFRESH_DELAY after writes; TTL bounds staleness if an invalidation is missed.
+AUTOCOMPLETE_REFRESH_DELAY = 10  # seconds
+AUTOCOMPLETE_TTL = 60 * 60
+
+# Per-worker BallTrees for /api/nearby/ (travel/nearby.py); signals drop them on writes,
+# the TTL covers bulk writes that skip signals.
+NEARBY_INDEX_TTL = 10 * 60
+
+# Per-worker feature matrix for similar itineraries (travel/similar_itineraries.py); an
+# update patches the changed itinerary's row in, the TTL bounds how stale the others get.
+SIMILAR_FEATURES_TTL = 10 * 60
+
+# Day-plan route optimizer (travel/routing.py): travel time between stops is the
+# great-circle distance at ROUTE_SPEED_KMH; days without a DayBudget start_time start at ROUTE_DAY_START.
+ROUTE_SPEED_KMH = 25
+ROUTE_DAY_START = "09:00"
+ROUTE_MEAL_MINUTES = 60  # restaurants have no duration of their own
+
+# Pre-rendered JSON caches (travel/rendered.py) gzip bodies at least this big; None = never.
+RENDERED_CACHE_GZIP_MIN_BYTES = 1024
+
+
 # CELERY_BEAT_SCHEDULE = {
 #     "compute-trending-destinations": {
 #         "task": "travel.tasks.compute_trending_destinations",
@@ -230,8 +323,11 @@ DATABASES = {
 # ✅ disable server-side cursors (important for Neon)
 DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True  
 
-# ✅ persistent connections (prevents Neon from dropping idle conns too fast)
-CONN_MAX_AGE = 600
+# ✅ persistent connections (prevents Neon from dropping idle conns too fast).
+# Must be set on the database entry: a module-level CONN_MAX_AGE is ignored by Django.
+# Search fan-out threads (travel/fanout.py) rely on this to reuse their connection.
+DATABASES["default"]["CONN_MAX_AGE"] = 600
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True  # drop a connection Neon closed instead of failing the request
 
 
 
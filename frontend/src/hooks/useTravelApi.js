@@ -252,29 +252,18 @@ export const useRatings = (itineraryId) => {
 
 // Analytics hook for tracking user interactions
 export const useAnalytics = () => {
-  const trackView = async (slug) => {
-    try {
-      await destinationsAPI.recordView(slug);
-    } catch (error) {
-      console.error('Failed to track view:', error);
-    }
+  // queued and sent in batches (see flushEvents in services/api.js)
+  const trackView = (slug) => {
+    destinationsAPI.recordView(slug);
   };
 
-  const trackDwell = async (slug, startTime) => {
+  const trackDwell = (slug, startTime) => {
     const dwellTime = Math.floor((Date.now() - startTime) / 1000);
-    try {
-      await destinationsAPI.recordDwell(slug, dwellTime);
-    } catch (error) {
-      console.error('Failed to track dwell time:', error);
-    }
+    destinationsAPI.recordDwell(slug, dwellTime);
   };
 
-  const trackClick = async (slug, target) => {
-    try {
-      await destinationsAPI.recordClick(slug, target);
-    } catch (error) {
-      console.error('Failed to track click:', error);
-    }
+  const trackClick = (slug, target) => {
+    destinationsAPI.recordClick(slug, target);
   };
 
   return {
@@ -153,6 +153,70 @@ export const authAPI = {
   },
 };
 
+// Interaction events queue: view/dwell/click are batched client side and sent through
+// recordEvents every EVENT_FLUSH_INTERVAL, when the batch is full, or when the page is hidden
+const EVENT_FLUSH_INTERVAL = 10 * 1000;
+const MAX_BATCH_EVENTS = 100; // backend limit per request
+let eventQueue = [];
+let eventFlushTimer = null;
+
+const queueEvent = (event) => {
+  eventQueue.push(event);
+  if (eventQueue.length >= MAX_BATCH_EVENTS) {
+    flushEvents();
+  } else if (!eventFlushTimer) {
+    eventFlushTimer = setTimeout(flushEvents, EVENT_FLUSH_INTERVAL);
+  }
+};
+
+export const flushEvents = async () => {
+  clearTimeout(eventFlushTimer);
+  eventFlushTimer = null;
+  while (eventQueue.length) {
+    const batch = eventQueue.splice(0, MAX_BATCH_EVENTS);
+    try {
+      await destinationsAPI.recordEvents(batch);
+    } catch (error) {
+      // keep them for the next flush unless the server rejected the batch itself
+      if (!error.response || error.response.status >= 500) {
+        eventQueue = [...batch, ...eventQueue].slice(0, MAX_BATCH_EVENTS * 5);
+        eventFlushTimer = setTimeout(flushEvents, EVENT_FLUSH_INTERVAL);
+      }
+      console.error('Failed to send events:', error);
+      return;
+    }
+  }
+};
+
+// Page is going away: axios requests may be cancelled, so hand the queue to the browser
+const flushEventsOnHide = () => {
+  clearTimeout(eventFlushTimer);
+  eventFlushTimer = null;
+  const url = new URL('/api/events/batch/', BASE_URL).toString();
+  while (eventQueue.length) {
+    const body = JSON.stringify({ events: eventQueue.splice(0, MAX_BATCH_EVENTS) });
+    const token = getToken();
+    if (token) {
+      // sendBeacon can't carry the Authorization header
+      fetch(url, {
+        method: 'POST',
+        body,
+        keepalive: true,
+        headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
+      }).catch(() => {});
+    } else {
+      navigator.sendBeacon(url, new Blob([body], { type: 'application/json' }));
+    }
+  }
+};
+
+if (typeof window !== 'undefined') {
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') flushEventsOnHide();
+  });
+  window.addEventListener('pagehide', flushEventsOnHide);
+}
+
 // Destinations API calls
 export const destinationsAPI = {
 
@@ -175,25 +239,25 @@ export const destinationsAPI = {
   },
 
 
-  // Record view
-  recordView: async (slug) => {
-    const response = await api.post(`/api/destination/${slug}/view/`);
-    return response.data;
+  // Record view (queued, sent with the next batch)
+  recordView: (slug) => {
+    queueEvent({ destination: slug, action_type: 'view' });
   },
 
-  // Record dwell time
-  recordDwell: async (slug, dwellTime) => {
-    const response = await api.post(`/api/destination/${slug}/dwell/`, {
-      dwell_time: dwellTime
-    });
-    return response.data;
+  // Record dwell time (queued)
+  recordDwell: (slug, dwellTime) => {
+    queueEvent({ destination: slug, action_type: 'dwell', dwell_time: dwellTime });
   },
 
-  // Record click
-  recordClick: async (slug, clickTarget) => {
-    const response = await api.post(`/api/destination/${slug}/click/`, {
-      click_target: clickTarget
-    });
+  // Record click (queued)
+  recordClick: (slug, clickTarget) => {
+    queueEvent({ destination: slug, action_type: 'click', click_target: clickTarget });
+  },
+
+  // Record many view/dwell/click events in one request
+  // events: [{ destination: slug, action_type: 'view' | 'dwell' | 'click', dwell_time, click_target }]
+  recordEvents: async (events) => {
+    const response = await api.post('/api/events/batch/', { events });
     return response.data;
   },
 };